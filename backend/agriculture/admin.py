@@ -1,20 +1,29 @@
 from django.contrib import admin
 from django.contrib.gis.admin import GISModelAdmin
-from .models import RiceField, YieldEstimation, SaleNotification
+from .models import AdminArea, RiceField, YieldEstimation, SaleNotification, SaleNotificationArchive, Notification, ListingAnnouncement
 
 # 1. ตั้งค่าการแสดงผลตาราง "แปลงนา"
 @admin.register(RiceField)
 class RiceFieldAdmin(GISModelAdmin):
     # เพิ่ม variety ให้เห็นพันธุ์ข้าวด้วย
-    list_display = ('name', 'owner', 'district', 'area_rai', 'variety', 'created_at') 
-    list_filter = ('district', 'variety', 'created_at') 
+    list_display = ('name', 'owner', 'province', 'amphoe', 'area_rai', 'variety', 'created_at')
+    list_filter = (
+        ('province', admin.RelatedOnlyFieldListFilter),
+        ('amphoe', admin.RelatedOnlyFieldListFilter),
+        'variety', 'created_at',
+    )
+    list_select_related = ('owner', 'province', 'amphoe')
     search_fields = ('name', 'owner__username')
+    readonly_fields = ('province', 'amphoe', 'tambon', 'district')  # คำนวณจาก boundary ตอนบันทึก
 
 # 2. ตั้งค่าการแสดงผลตาราง "การประเมินผลผลิต"
 @admin.register(YieldEstimation)
 class YieldEstimationAdmin(admin.ModelAdmin):
     list_display = ('field', 'ndvi_mean', 'estimated_yield_ton', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('field',)
+    raw_id_fields = ('field',)
+    show_full_result_count = False  # ไม่ต้อง COUNT(*) ทั้งตารางทุกครั้งที่กรอง
 
 # 3. เพิ่มตาราง "รายการแจ้งขาย" (SaleNotification)
 @admin.register(SaleNotification)
@@ -22,4 +31,38 @@ class SaleNotificationAdmin(admin.ModelAdmin):
     list_display = ('farmer', 'rice_field', 'quantity_ton', 'price_per_ton', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('farmer__username', 'rice_field__name', 'phone')
-    list_editable = ('status',)
\ No newline at end of file
+    list_editable = ('status',)
+
+# 4. รายการขายที่ย้ายไป archive แล้ว (ฤดูที่ปิดไปแล้ว)
+@admin.register(SaleNotificationArchive)
+class SaleNotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('farmer', 'field_name', 'quantity_ton', 'price_per_ton', 'season', 'sold_at')
+    list_filter = ('season', 'field_variety')
+    search_fields = ('farmer__username', 'field_name', 'phone')
+
+# 5. การแจ้งเตือนของผู้ใช้
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'kind', 'title', 'is_read', 'created_at')
+    list_filter = ('kind', 'is_read')
+    list_select_related = ('recipient',)
+    raw_id_fields = ('recipient',)
+    readonly_fields = ('is_read',)  # เปลี่ยนผ่าน mark_read เท่านั้น ตัวนับ unread จึงไม่คลาดเคลื่อน
+    show_full_result_count = False
+
+# 6. ประกาศขายใหม่ (feed ที่โรงสีทุกรายอ่านร่วมกัน)
+@admin.register(ListingAnnouncement)
+class ListingAnnouncementAdmin(admin.ModelAdmin):
+    list_display = ('farmer', 'message', 'created_at')
+    list_select_related = ('farmer',)
+    raw_id_fields = ('farmer',)
+    show_full_result_count = False
+
+# 7. เขตการปกครอง (นำเข้าด้วย load_admin_areas)
+@admin.register(AdminArea)
+class AdminAreaAdmin(GISModelAdmin):
+    list_display = ('code', 'name_th', 'name_en', 'level', 'parent')
+    list_filter = ('level',)
+    list_select_related = ('parent',)
+    search_fields = ('code', 'name_th', 'name_en')
+    raw_id_fields = ('parent',)
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class AgricultureConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'agriculture'
\ No newline at end of file
+    name = 'agriculture'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (ลงทะเบียน signal ล้าง cache)
+
+        # warm-up Earth Engine เบื้องหลัง (เปิดเฉพาะ web worker ผ่าน EE_WARMUP=true ไม่ให้กระทบ migrate/test)
+        if settings.EE_WARMUP:
+            from . import earth_engine
+            earth_engine.warm_up()
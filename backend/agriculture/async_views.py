@@ -0,0 +1,106 @@
+import json
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import RiceField, YieldEstimation
+from . import earth_engine
+from .metrics import EE_STALE_RESULTS
+
+# จำนวนแปลงสูงสุดต่อการวิเคราะห์แบบกลุ่ม 1 ครั้ง
+MAX_BATCH_FIELDS = 50
+
+
+@sync_to_async
+def _get_user(request):
+    # request.user เป็น lazy object ที่ต้อง query session/DB จึงต้องโหลดใน sync context
+    user = request.user
+    user.is_authenticated
+    return user
+
+
+def _field_queryset(user):
+    # ขอบเขตเดียวกับ RiceFieldViewSet.get_queryset
+    fields = RiceField.active.all()
+    if user.is_superuser or user.role == 'GOVT':
+        return fields
+    return fields.filter(owner=user)
+
+
+async def _analyse(rice_field):
+    """วิเคราะห์ผลผลิต 1 แปลง คืนค่า (payload, status)"""
+    try:
+        indices = await earth_engine.afetch_indices(rice_field.boundary)
+        estimate = earth_engine.estimate_yield(rice_field, indices['ndvi'], indices['ndbi'])
+        estimation = await YieldEstimation.objects.acreate(
+            field=rice_field,
+            ndvi_mean=indices['ndvi'],
+            estimated_yield_ton=estimate['yield_ton']
+        )
+        return earth_engine.yield_payload(rice_field, indices, estimate, estimation), 200
+    except earth_engine.NoImageryError:
+        return {'error': 'ไม่พบภาพดาวเทียมที่ไม่มีเมฆในช่วงนี้'}, 400
+    except earth_engine.EarthEngineBusyError as e:
+        return {'error': str(e)}, 503
+    except earth_engine.CircuitOpenError as e:
+        estimation = await YieldEstimation.objects.filter(field=rice_field).order_by('-created_at').afirst()
+        if estimation is None:
+            return {'error': str(e)}, 503
+        EE_STALE_RESULTS.inc()
+        return earth_engine.stale_payload(rice_field, estimation, timezone.now()), 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+async def _prepare(request):
+    """ตรวจ method/สิทธิ์/สถานะ EE ร่วมกันของทุก endpoint คืนค่า (user, error_response)"""
+    if request.method != 'POST':
+        return None, JsonResponse({'error': 'Method not allowed'}, status=405)
+    user = await _get_user(request)
+    if not user.is_authenticated:
+        return None, JsonResponse({'error': 'กรุณาเข้าสู่ระบบ'}, status=401)
+    if not await earth_engine.ainitialize():
+        return None, JsonResponse({
+            'error': 'Earth Engine client not initialized on server. Configure GEE credentials (see http://goo.gle/ee-auth)'
+        }, status=503)
+    return user, None
+
+
+async def calculate_yield(request, pk):
+    """calculate_yield แบบ async: ไม่ยึด worker ระหว่างรอ Earth Engine"""
+    user, error = await _prepare(request)
+    if error:
+        return error
+
+    rice_field = await _field_queryset(user).filter(pk=pk).afirst()
+    if rice_field is None:
+        return JsonResponse({'error': 'ไม่พบแปลงนา'}, status=404)
+
+    payload, status = await _analyse(rice_field)
+    return JsonResponse(payload, status=status)
+
+
+async def calculate_yield_batch(request):
+    """วิเคราะห์หลายแปลงพร้อมกันใน request เดียว (body: {"ids": [...]})"""
+    user, error = await _prepare(request)
+    if error:
+        return error
+
+    try:
+        ids = [int(pk) for pk in json.loads(request.body or b'{}').get('ids', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'รูปแบบข้อมูลไม่ถูกต้อง'}, status=400)
+    if not ids:
+        return JsonResponse({'error': 'กรุณาเลือกแปลงนา'}, status=400)
+    if len(ids) > MAX_BATCH_FIELDS:
+        return JsonResponse({'error': f'วิเคราะห์ได้ครั้งละไม่เกิน {MAX_BATCH_FIELDS} แปลง'}, status=400)
+
+    fields = [field async for field in _field_queryset(user).filter(pk__in=ids)]
+    outcomes = await asyncio.gather(*(_analyse(field) for field in fields))
+
+    results = [{'id': field.id, 'status': status, **payload} for field, (payload, status) in zip(fields, outcomes)]
+    found = {field.id for field in fields}
+    results += [{'id': pk, 'status': 404, 'error': 'ไม่พบแปลงนา'} for pk in ids if pk not in found]
+    return JsonResponse({'results': results})
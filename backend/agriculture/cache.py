@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .db_routing import routing_state
+
+# ทุกการเขียน RiceField / YieldEstimation / SaleNotification จะเลื่อน generation
+# ทำให้ key เดิมทั้งหมดหมดอายุทันทีโดยไม่ต้องไล่ลบทีละ key
+GENERATION_KEY = 'api-cache:generation'
+# เวลาที่ล้าง cache ล่าสุด: replica ที่ lag อยู่ในช่วงนี้อาจยังไม่เห็นการเขียนนั้น
+INVALIDATED_AT_KEY = 'api-cache:invalidated-at'
+
+
+def _generation():
+    # เริ่มจาก timestamp แทน 0 เพื่อไม่ให้ชนกับ generation เก่าหาก key ถูก evict
+    cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+    return cache.get(GENERATION_KEY)
+
+
+def bump_generation():
+    cache.set(INVALIDATED_AT_KEY, time.time(), None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def _may_be_stale():
+    """True ถ้าข้อมูลของ request นี้อ่านจาก replica ที่อาจยังไม่เห็นการเขียนที่เพิ่งล้าง cache"""
+    state = routing_state.get()
+    if state is None or state.alias in (None, 'default'):
+        return False
+    # replica ที่ถูกเลือกตาม lag ได้ไม่เกิน REPLICA_MAX_LAG_SECONDS (+ ช่วงที่ค่า lag ถูก cache ไว้)
+    window = settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_LAG_CHECK_INTERVAL
+    return time.time() - (cache.get(INVALIDATED_AT_KEY) or 0) < window
+
+
+def invalidate_api_cache():
+    """ล้าง cache ของ API หลัง transaction commit (กันไม่ให้ request อื่นเติมข้อมูลเก่ากลับเข้าไป)
+
+    ต่อ transaction ล้างแค่ครั้งเดียว: signal ของการลบ/บันทึกทีละแถว (เช่น QuerySet.delete ที่มี receiver)
+    เรียกซ้ำทุกแถว แต่ commit ครั้งเดียวก็พอ ; rollback แล้ว Django ทิ้ง callback ในรายการเอง
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and any(entry[1] is bump_generation for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(bump_generation)
+
+
+def user_scope(user):
+    """ขอบเขตข้อมูลที่ผู้ใช้เห็น: GOVT/superuser เห็นทั้งหมด ที่เหลือแยกตาม role และ id"""
+    role = getattr(user, 'role', 'FARMER')
+    if user.is_superuser or role == 'GOVT':
+        return 'all'
+    return f'{role.lower()}:{user.pk}'
+
+
+def cache_per_scope(prefix):
+    """Cache response.data ของ API ตามขอบเขตผู้ใช้และ query params (เฉพาะ GET ที่ตอบ 200)
+
+    ใช้ใต้ @read_replica เพื่อให้รู้ว่าข้อมูลมาจาก replica หรือไม่
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if request.method != 'GET' or not request.user.is_authenticated or not settings.API_CACHE_TIMEOUT:
+                return view_func(*args, **kwargs)
+
+            params = sorted(request.query_params.lists())
+            digest = hashlib.md5(repr(params).encode()).hexdigest()
+            key = f'api-cache:{_generation()}:{prefix}:{user_scope(request.user)}:{digest}'
+
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_func(*args, **kwargs)
+            # ไม่เติม cache ด้วยข้อมูลจาก replica ที่อาจเก่ากว่าการล้างครั้งล่าสุด (ทุก scope จะเห็นข้อมูลเก่าจนหมดอายุ)
+            if response.status_code == 200 and not _may_be_stale():
+                cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+            return response
+        return _wrapped_view
+    return decorator
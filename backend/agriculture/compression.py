@@ -0,0 +1,91 @@
+import gzip
+
+import brotli
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentation import timed
+from .metrics import RESPONSE_BYTES
+
+# บีบอัด response ของ API (JSON / GeoJSON) ตาม Accept-Encoding ของ client (br ก่อน gzip)
+# - ไม่แตะหน้า HTML (มี CSRF token ปนกับข้อมูลผู้ใช้ เสี่ยง BREACH) และไม่แตะ static (WhiteNoise ส่ง .br/.gz ที่ทำไว้แล้ว)
+# - ข้าม streaming response (export / SSE) เพราะต้องส่งทีละชิ้นทันที
+COMPRESSIBLE_TYPES = ('application/json', 'application/geo+json', 'application/vnd.geo+json')
+ENCODINGS = ('br', 'gzip')  # ลำดับที่เลือกเมื่อ client ให้ q เท่ากัน
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.API_COMPRESSION_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    return gzip.compress(body, compresslevel=settings.API_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def negotiate(accept_encoding):
+    """เลือก encoding จาก Accept-Encoding (รองรับ q-value และ *) คืนค่า None ถ้าไม่มีที่ใช้ได้"""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _should_compress(response):
+    if response.streaming or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type not in COMPRESSIBLE_TYPES:
+        return False
+    return len(response.content) >= settings.API_COMPRESSION_MIN_BYTES
+
+
+def _compress_response(request, response):
+    if not _should_compress(response):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    original = response.content
+    with timed('compress'):
+        compressed = compress(original, encoding)
+    if len(compressed) >= len(original):
+        return response
+
+    RESPONSE_BYTES.labels(encoding, 'original').inc(len(original))
+    RESPONSE_BYTES.labels(encoding, 'sent').inc(len(compressed))
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    response['Content-Encoding'] = encoding
+    # เนื้อหาเปลี่ยนแล้ว ETag เดิมต้องเป็นแบบ weak (เหมือน GZipMiddleware ของ Django)
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+
+@sync_and_async_middleware
+def compression_middleware(get_response):
+    """บีบอัด response JSON/GeoJSON ที่ใหญ่กว่า API_COMPRESSION_MIN_BYTES ด้วย br/gzip"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _compress_response(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _compress_response(request, get_response(request))
+    return middleware
@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+import logging
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpRequest
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.request import Request
+
+from .metrics import DB_REPLICA_FALLBACKS
+
+# แยกการอ่านไป read replica (DATABASE_REPLICAS) เฉพาะ view ที่ติด @read_replica
+# - นอก view เหล่านั้น (เขียนข้อมูล, management command, งาน EE) ใช้ primary เสมอ
+# - เขียนอะไรใน request เดียวกันแล้ว ทุกการอ่านหลังจากนั้นใช้ primary (read-after-write)
+# - หลัง POST/PUT/PATCH/DELETE ผู้ใช้คนนั้นอ่านจาก primary ต่ออีก REPLICA_PIN_SECONDS (cookie)
+# - replica ที่ lag เกิน REPLICA_MAX_LAG_SECONDS หรือต่อไม่ได้ จะถูกข้ามไปใช้ primary
+logger = logging.getLogger('agriculture')
+
+PIN_COOKIE = 'db_pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# เวลาที่ replica ตามหลัง primary (วินาที) ; ไม่ใช่ standby (เช่นทดสอบด้วย Postgres 2 ตัวที่ไม่ได้ replicate) = 0
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class RoutingState:
+    """สถานะการเลือกฐานข้อมูลของ request ที่อ่านจาก replica ได้"""
+
+    def __init__(self):
+        self.alias = None  # replica ที่เลือกแล้ว ใช้ตัวเดิมตลอด request ให้ข้อมูลสอดคล้องกัน
+        self.wrote = False
+
+
+# None = request นี้ไม่ได้อนุญาตให้อ่านจาก replica
+routing_state = ContextVar('routing_state', default=None)
+
+_lag_lock = threading.Lock()
+_lag_checked = {}  # alias -> (เวลาที่ตรวจ, lag วินาที หรือ None ถ้าต่อไม่ได้)
+
+
+def replica_lag(alias):
+    """lag ของ replica (cache ในแต่ละ process REPLICA_LAG_CHECK_INTERVAL วินาที) ; None = ต่อไม่ได้"""
+    now = time.monotonic()
+    with _lag_lock:
+        checked = _lag_checked.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError as e:
+        logger.warning('replica %s unavailable: %s', alias, e)
+        connections[alias].close()
+        lag = None
+    with _lag_lock:
+        _lag_checked[alias] = (now, lag)
+    return lag
+
+
+def _pick_replica():
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        lag = replica_lag(alias)
+        if lag is None:
+            DB_REPLICA_FALLBACKS.labels(alias, 'error').inc()
+        elif lag > settings.REPLICA_MAX_LAG_SECONDS:
+            DB_REPLICA_FALLBACKS.labels(alias, 'lag').inc()
+        else:
+            return alias
+    return 'default'
+
+
+def replica_status():
+    """lag ของทุก replica สำหรับ health check"""
+    return {
+        alias: 'unavailable' if (lag := replica_lag(alias)) is None else round(lag, 2)
+        for alias in settings.DATABASE_REPLICAS
+    }
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state.wrote or not settings.DATABASE_REPLICAS:
+            return 'default'
+        if state.alias is None:
+            state.alias = _pick_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # ทุก alias เป็นข้อมูลชุดเดียวกัน
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def read_replica(view_func):
+    """ให้ view (หรือ method ของ ViewSet) อ่านจาก replica ได้ เมื่อเป็น GET และผู้ใช้ไม่ได้เพิ่งเขียนข้อมูล"""
+    @wraps(view_func)
+    def _wrapped_view(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, (HttpRequest, Request)))
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES or not settings.DATABASE_REPLICAS:
+            return view_func(*args, **kwargs)
+        token = routing_state.set(RoutingState())
+        try:
+            return view_func(*args, **kwargs)
+        finally:
+            routing_state.reset(token)
+    return _wrapped_view
+
+
+def _pin_primary(request, response):
+    if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+        response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """หลัง request ที่เขียนข้อมูล ตั้ง cookie ให้ผู้ใช้อ่านจาก primary ชั่วคราว (เห็นข้อมูลที่เพิ่งบันทึกทันที)"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _pin_primary(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _pin_primary(request, get_response(request))
+    return middleware
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import asyncio
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+from asgiref.sync import sync_to_async
+from google.oauth2 import service_account
+from django.conf import settings
+
+from .instrumentation import instrument_ee
+from .ee_limiter import limited, EarthEngineBusyError, EarthEngineQueueTimeout
+from . import ee_breaker
+from .ee_breaker import CircuitOpenError
+
+# --- GEE Init ---
+# เริ่มต้นแบบ lazy ครั้งแรกที่ต้องใช้ (หรือผ่าน warm-up) แทนการยิง Google ตอน import
+# เพื่อให้ migrate / test / worker boot ไม่ต้องรอหรือพังเพราะ Earth Engine
+logger = logging.getLogger('agriculture')
+
+_init_lock = threading.Lock()
+_state = {'status': 'pending', 'source': None, 'error': None, 'checked_at': None}
+
+
+def initialize():
+    """เริ่มต้น Earth Engine (thread-safe, ทำครั้งเดียวต่อ process) คืนค่า True ถ้าพร้อมใช้งาน"""
+    if _state['status'] == 'ready':
+        return True
+    with _init_lock:
+        if _state['status'] == 'ready':
+            return True
+        # ถ้าเพิ่งล้มเหลว ไม่ต้องลองใหม่ทุก request
+        if _state['status'] == 'failed' and time.monotonic() - _state['checked_at'] < settings.EE_INIT_RETRY_SECONDS:
+            return False
+
+        _state['status'] = 'initializing'
+        try:
+            KEY_PATH = os.path.join(settings.BASE_DIR, 'gee-key.json')
+            if os.path.exists(KEY_PATH):
+                SCOPES = ['https://www.googleapis.com/auth/earthengine']
+                credentials = service_account.Credentials.from_service_account_file(KEY_PATH, scopes=SCOPES)
+                ee.Initialize(credentials=credentials)
+                _state.update(status='ready', source='service_account', error=None)
+                logger.info('Google Earth Engine initialized using service account key.')
+            else:
+                ee.Initialize()
+                _state.update(status='ready', source='default', error=None)
+                logger.info('Google Earth Engine initialized using default credentials.')
+        except Exception as e:
+            _state.update(status='failed', error=str(e))
+            logger.error('GEE Init Error: %s', e)
+        _state['checked_at'] = time.monotonic()
+        return _state['status'] == 'ready'
+
+
+async def ainitialize():
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EE_EXECUTOR, initialize)
+
+
+def warm_up(background=True):
+    """เรียกตอน worker เริ่มทำงาน เพื่อให้ request แรกไม่ต้องรอ ee.Initialize()"""
+    if not background:
+        return initialize()
+    threading.Thread(target=initialize, name='ee-warmup', daemon=True).start()
+
+
+def status():
+    """สถานะของ Earth Engine client สำหรับ health check"""
+    return {'status': _state['status'], 'source': _state['source'], 'error': _state['error'], 'circuit': ee_breaker.state()}
+
+# getInfo() เป็น blocking HTTP call จึงส่งไปทำใน thread pool ที่จำกัดขนาด
+# ทั้ง view แบบ sync และ async ใช้ pool เดียวกัน เพื่อไม่ให้ยิง Google พร้อมกันเกินจำนวนนี้ต่อ process
+EE_EXECUTOR = ThreadPoolExecutor(max_workers=settings.EE_MAX_WORKERS, thread_name_prefix='ee')
+
+
+class NoImageryError(Exception):
+    """ไม่มีภาพดาวเทียมที่ใช้ได้ในช่วงเวลาที่วิเคราะห์"""
+
+
+def _analysis_requests(boundary):
+    """สร้าง EE graph ของการวิเคราะห์ (ยังไม่ยิง network) คืนค่า dict ของงานที่ getInfo แยกกันได้"""
+    geom_json = json.loads(boundary.json)
+    ee_geometry = ee.Geometry.Polygon(geom_json['coordinates'])
+
+    end_date = datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=60)
+
+    def mask_s2_scl(image):
+        scl = image.select('SCL')
+        mask = scl.neq(3).And(scl.neq(8)).And(scl.neq(9)).And(scl.neq(10)).And(scl.neq(11))
+        return image.updateMask(mask).divide(10000)
+
+    dataset = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+               .filterBounds(ee_geometry)
+               .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+               .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 80)) # ลดเมฆต่ำกว่า 80%
+               .map(mask_s2_scl))
+
+    image = dataset.median()
+    vis_params = {'min': 0.0, 'max': 0.3, 'bands': ['B4', 'B3', 'B2'], 'gamma': 1.3}
+
+    ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+    ndbi = image.normalizedDifference(['B11', 'B8']).rename('NDBI')
+    combined = ndvi.addBands(ndbi)
+
+    return {
+        'scene_count': lambda: dataset.size().getInfo(),
+        # ดึงค่าเมฆเฉลี่ยจากชุดข้อมูล
+        'cloud_score': lambda: dataset.aggregate_mean('CLOUDY_PIXEL_PERCENTAGE').getInfo(),
+        'tile_url': lambda: image.getMapId(vis_params)['tile_fetcher'].url_format,
+        'stats': lambda: combined.reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=ee_geometry,
+            scale=10,
+            maxPixels=1e9
+        ).getInfo(),
+    }
+
+
+def _collect(results):
+    """รวมผลจากงานที่ยิงพร้อมกัน (ค่า หรือ Exception) ให้เป็นดัชนีที่ใช้ประเมินผลผลิต"""
+    if isinstance(results['scene_count'], Exception):
+        raise results['scene_count']
+    if results['scene_count'] == 0:
+        # งานอื่นจะ error เพราะไม่มีภาพ จึงต้องเช็คจำนวนภาพก่อน
+        raise NoImageryError()
+    for value in results.values():
+        if isinstance(value, Exception):
+            raise value
+
+    stats = results['stats'] or {}
+    return {
+        'ndvi': stats.get('NDVI') or 0,
+        'ndbi': stats.get('NDBI') or 0,
+        'tile_url': results['tile_url'],
+        'cloud_score': results['cloud_score'] or 0,
+    }
+
+
+def _job(name, job):
+    # รอคิว/ลองใหม่ที่ชั้นนอก ส่วน metrics วัดเฉพาะเวลาเรียก EE จริงของแต่ละครั้ง
+    return limited(name, instrument_ee(name, job))
+
+
+def _check_circuit():
+    if not ee_breaker.allow_request():
+        raise CircuitOpenError('ระบบภาพดาวเทียมขัดข้องชั่วคราว กรุณาลองใหม่ภายหลัง')
+
+
+def _guarded_collect(results):
+    """รวมผลและแจ้ง circuit breaker (ไม่มีภาพในช่วงนี้ถือว่า EE ตอบปกติ)"""
+    try:
+        indices = _collect(results)
+    except NoImageryError:
+        ee_breaker.record_success()
+        raise
+    except EarthEngineBusyError as e:
+        if isinstance(e, EarthEngineQueueTimeout):
+            # คิวในระบบเราเองเต็ม (ยังไม่ได้ยิง EE) ไม่ใช่ EE ขัดข้อง: ไม่นับใน breaker แค่คืนสิทธิ์ probe
+            ee_breaker.release_probe()
+        else:
+            ee_breaker.record_failure()  # ลองใหม่ครบแล้วยังติดโควตา
+        raise
+    except Exception:
+        ee_breaker.record_failure()
+        raise
+    ee_breaker.record_success()
+    return indices
+
+
+def fetch_indices(boundary):
+    """ดึง NDVI/NDBI, ภาพ และค่าเมฆของแปลง (sync) โดยยิง EE ทั้ง 4 งานพร้อมกัน"""
+    _check_circuit()
+    futures = {name: EE_EXECUTOR.submit(_job(name, job)) for name, job in _analysis_requests(boundary).items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            results[name] = e
+    return _guarded_collect(results)
+
+
+async def afetch_indices(boundary):
+    """เวอร์ชัน async ของ fetch_indices: รอผลทั้ง 4 งานพร้อมกันโดยไม่บล็อก event loop"""
+    # สถานะ breaker อยู่ในฐานข้อมูล จึงต้องเรียกนอก event loop
+    await sync_to_async(_check_circuit)()
+    loop = asyncio.get_running_loop()
+    jobs = _analysis_requests(boundary)
+    values = await asyncio.gather(
+        *(loop.run_in_executor(EE_EXECUTOR, _job(name, job)) for name, job in jobs.items()),
+        return_exceptions=True,
+    )
+    return await sync_to_async(_guarded_collect)(dict(zip(jobs, values)))
+
+
+def estimated_price(rice_field):
+    """ราคาประเมินต่อตันตามพันธุ์ข้าว"""
+    return 14000 if rice_field.variety == 'KDML105' else 12000
+
+
+def estimate_yield(rice_field, val_ndvi, val_ndbi):
+    """จำแนกพื้นที่จาก NDVI/NDBI และประเมินผลผลิต"""
+    yield_ton = 0
+    revenue = 0
+    result_type = 'rice'
+    note = "พื้นที่เพาะปลูกข้าว"
+
+    # 1. แหล่งน้ำ: NDVI ติดลบ
+    if val_ndvi < 0:
+        result_type = 'water'
+        note = 'แหล่งน้ำ (Water Body)'
+        yield_ton = 0
+
+    # 2. สิ่งปลูกสร้าง: NDBI เป็นบวก และมากกว่า NDVI (ลักษณะเฉพาะของคอนกรีต)
+    elif val_ndbi > 0 and val_ndbi > val_ndvi:
+        result_type = 'building'
+        note = 'อาคารหรือสิ่งปลูกสร้าง'
+        yield_ton = 0
+
+    # 3. ดินโล่ง/ถนน: NDVI ต่ำ (0 - 0.3)
+    elif 0 <= val_ndvi < 0.3:
+        result_type = 'road'
+        note = 'ดินโล่ง/ถนน'
+        yield_ton = 0
+
+    # 4. ข้าวระยะเริ่มต้น: NDVI ปานกลาง (0.3 - 0.45)
+    elif 0.3 <= val_ndvi < 0.45:
+        result_type = 'young_rice'
+        note = 'ข้าวระยะแตกกอ (ยังไม่สามารถประเมินผลผลิตได้แม่นยำ)'
+        # อาจจะยังไม่คำนวณผลผลิต หรือคำนวณแบบขั้นต่ำ
+        yield_ton = 0
+    else:
+        a = 6.5
+        b = -1.2
+        divider = 6.25
+
+        predicted_yield_per_rai = (a * val_ndvi + b) / divider
+
+        if predicted_yield_per_rai < 0:
+            predicted_yield_per_rai = 0
+
+        yield_ton = predicted_yield_per_rai * rice_field.area_rai
+        revenue = yield_ton * estimated_price(rice_field)
+
+    return {'result_type': result_type, 'note': note, 'yield_ton': yield_ton, 'revenue': revenue}
+
+
+def yield_payload(rice_field, indices, estimate, estimation):
+    """ข้อมูลที่ส่งกลับให้หน้าบ้านหลังวิเคราะห์ผลผลิต"""
+    return {
+        'ndvi': round(indices['ndvi'], 3),
+        'ndbi': round(indices['ndbi'], 3),
+        'yield_ton': round(estimate['yield_ton'], 2),
+        'revenue': round(estimate['revenue'], 2),
+        'note': estimate['note'],
+        'result_type': estimate['result_type'],
+        'area': rice_field.area_rai,
+        'satellite_image': indices['tile_url'],
+        'cloud_cover': round(indices['cloud_score'], 1),
+        'created_at': estimation.created_at.isoformat()
+    }
+
+
+def stale_payload(rice_field, estimation, now):
+    """ผลประเมินล่าสุดที่บันทึกไว้ ใช้ตอบแทนเมื่อ circuit breaker เปิดอยู่ (ไม่มีภาพ/NDBI ใหม่)"""
+    # ไม่มี NDBI ที่บันทึกไว้ จึงจำแนกพื้นที่จาก NDVI อย่างเดียว
+    estimate = estimate_yield(rice_field, estimation.ndvi_mean, 0)
+    age = (now - estimation.created_at).total_seconds()
+    return {
+        'ndvi': round(estimation.ndvi_mean, 3),
+        'ndbi': None,
+        'yield_ton': round(estimation.estimated_yield_ton, 2),
+        'revenue': round(estimation.estimated_yield_ton * estimated_price(rice_field), 2),
+        'note': estimate['note'],
+        'result_type': estimate['result_type'],
+        'area': rice_field.area_rai,
+        'satellite_image': None,
+        'cloud_cover': None,
+        'created_at': estimation.created_at.isoformat(),
+        'stale': True,
+        'stale_age_seconds': round(age),
+    }
@@ -0,0 +1,136 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import EE_CIRCUIT_OPENED
+
+# Circuit breaker ของการเรียกภาพดาวเทียม เก็บสถานะในตาราง EarthEngineCircuit ร่วมกันทุก worker/process
+# ทุกการเปลี่ยนสถานะเป็น UPDATE แบบมีเงื่อนไขคำสั่งเดียว (เหมือน token bucket ใน ee_limiter) ไม่มี race ระหว่างอ่าน-เขียน
+# closed -> ล้มเหลว EE_BREAKER_THRESHOLD ครั้งใน EE_BREAKER_WINDOW วินาที -> open (ตอบทันทีไม่รอ EE)
+# open -> ครบ EE_BREAKER_COOLDOWN วินาที -> half-open ปล่อย request เดียวไปลอง -> สำเร็จ closed / ล้มเหลว open ใหม่
+logger = logging.getLogger('agriculture')
+
+CIRCUIT = 'default'
+
+SEED_SQL = """
+INSERT INTO agriculture_earthenginecircuit (name, failures) VALUES (%s, 0) ON CONFLICT (name) DO NOTHING
+"""
+
+# half-open: จองสิทธิ์ probe ได้เฉพาะเมื่อครบ cooldown แล้วและยังไม่มี probe อื่นค้างอยู่
+PROBE_SQL = """
+UPDATE agriculture_earthenginecircuit
+SET probe_until = clock_timestamp() + make_interval(secs => %(hold)s)
+WHERE name = %(name)s AND open_until <= clock_timestamp()
+  AND (probe_until IS NULL OR probe_until <= clock_timestamp())
+RETURNING name
+"""
+
+# นับความล้มเหลวใน window ปัจจุบัน (window หมดอายุเริ่มนับ 1 ใหม่) เฉพาะตอน closed
+FAILURE_SQL = """
+UPDATE agriculture_earthenginecircuit
+SET failures = CASE WHEN window_started_at > clock_timestamp() - make_interval(secs => %(window)s) THEN failures + 1 ELSE 1 END,
+    window_started_at = CASE WHEN window_started_at > clock_timestamp() - make_interval(secs => %(window)s)
+                             THEN window_started_at ELSE clock_timestamp() END
+WHERE name = %(name)s AND open_until IS NULL
+RETURNING failures
+"""
+
+# เปิดจาก closed (ครบ threshold) หรือจาก half-open (probe ล้มเหลว) ; ถ้า worker อื่นเปิดไปแล้วไม่คืนแถว
+OPEN_SQL = """
+UPDATE agriculture_earthenginecircuit
+SET open_until = clock_timestamp() + make_interval(secs => %(cooldown)s),
+    failures = 0, window_started_at = NULL, probe_until = NULL
+WHERE name = %(name)s AND (open_until IS NULL OR open_until <= clock_timestamp())
+RETURNING name
+"""
+
+# เขียนเฉพาะเมื่อมีอะไรต้องล้าง: request ที่สำเร็จตอน closed ปกติไม่แตะแถว
+CLOSE_SQL = """
+UPDATE agriculture_earthenginecircuit
+SET failures = 0, window_started_at = NULL, open_until = NULL, probe_until = NULL
+WHERE name = %s AND open_until IS NOT NULL
+RETURNING name
+"""
+RESET_FAILURES_SQL = """
+UPDATE agriculture_earthenginecircuit SET failures = 0, window_started_at = NULL WHERE name = %s AND failures > 0
+"""
+
+STATE_SQL = """
+SELECT failures, window_started_at > clock_timestamp() - make_interval(secs => %s),
+       EXTRACT(EPOCH FROM open_until - clock_timestamp())::float8
+FROM agriculture_earthenginecircuit WHERE name = %s
+"""
+
+_seeded = False
+
+
+class CircuitOpenError(Exception):
+    """Earth Engine ขัดข้องต่อเนื่อง ระบบงดเรียกชั่วคราว"""
+
+
+def _cursor():
+    global _seeded
+    cursor = connection.cursor()
+    if not _seeded:
+        cursor.execute(SEED_SQL, [CIRCUIT])
+        _seeded = True
+    return cursor
+
+
+def allow_request():
+    """True ถ้าเรียก EE ได้ (closed หรือได้สิทธิ์เป็น probe ของ half-open)"""
+    retry_in = _state_row()[2]
+    if retry_in is None:
+        return True
+    if retry_in > 0:
+        return False
+    # half-open: ให้ผ่านแค่ request แรกที่จองได้ ที่เหลือยังตอบแบบ open
+    with _cursor() as cursor:
+        cursor.execute(PROBE_SQL, {'name': CIRCUIT, 'hold': settings.EE_LIMIT_MAX_WAIT + settings.EE_BREAKER_COOLDOWN})
+        return cursor.fetchone() is not None
+
+
+def record_success():
+    with _cursor() as cursor:
+        cursor.execute(CLOSE_SQL, [CIRCUIT])
+        if cursor.fetchone():
+            logger.info('ee_breaker closed')
+            return
+        cursor.execute(RESET_FAILURES_SQL, [CIRCUIT])
+
+
+def record_failure():
+    with _cursor() as cursor:
+        cursor.execute(FAILURE_SQL, {'name': CIRCUIT, 'window': settings.EE_BREAKER_WINDOW})
+        row = cursor.fetchone()
+        # ไม่คืนแถว = เปิดอยู่แล้ว: ถ้าเป็น probe ของ half-open ที่ล้มเหลว OPEN_SQL จะเปิดต่ออีกรอบ
+        if row is not None and row[0] < settings.EE_BREAKER_THRESHOLD:
+            return
+        cursor.execute(OPEN_SQL, {'name': CIRCUIT, 'cooldown': settings.EE_BREAKER_COOLDOWN})
+        if cursor.fetchone():
+            EE_CIRCUIT_OPENED.inc()
+            logger.warning('ee_breaker open for %ss', settings.EE_BREAKER_COOLDOWN)
+
+
+def release_probe():
+    """probe ของ half-open ไม่ได้ยิง EE จริง (เช่นรอคิวในระบบนานเกิน): ให้ request ถัดไปลองแทน"""
+    with _cursor() as cursor:
+        cursor.execute('UPDATE agriculture_earthenginecircuit SET probe_until = NULL WHERE name = %s', [CIRCUIT])
+
+
+def _state_row():
+    """(failures, window ยังไม่หมดอายุ, วินาทีที่เหลือก่อน half-open หรือ None ถ้า closed)"""
+    with _cursor() as cursor:
+        cursor.execute(STATE_SQL, [settings.EE_BREAKER_WINDOW, CIRCUIT])
+        return cursor.fetchone() or (0, None, None)
+
+
+def state():
+    """สถานะสำหรับ health check"""
+    failures, in_window, retry_in = _state_row()
+    if retry_in is None:
+        return {'state': 'closed', 'failures': failures if in_window else 0}
+    if retry_in > 0:
+        return {'state': 'open', 'retry_in': round(retry_in, 1)}
+    return {'state': 'half-open'}
@@ -0,0 +1,149 @@
+import time
+import random
+import socket
+import logging
+
+import ee
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from .instrumentation import current_timings
+from .metrics import EE_CALL_RETRIES, EE_LIMITER_WAIT
+
+# จำกัดการเรียก Earth Engine ร่วมกันทุก worker/process ผ่าน PostgreSQL (ไม่ต้องมี service เพิ่ม)
+# - จำนวนงานที่ยิงพร้อมกัน: advisory lock EE_MAX_IN_FLIGHT ช่อง (process ตาย lock ก็หลุดเอง)
+# - อัตราการยิง: token bucket ในตาราง EarthEngineQuota เติม EE_RATE_PER_SECOND token/วินาที สูงสุด EE_RATE_BURST
+logger = logging.getLogger('agriculture')
+
+LOCK_CLASS = 0x4545  # namespace ของ advisory lock ('EE')
+BUCKET = 'default'
+
+SEED_SQL = """
+INSERT INTO agriculture_earthenginequota (name, tokens, updated_at)
+VALUES (%s, %s, clock_timestamp()) ON CONFLICT (name) DO NOTHING
+"""
+
+# เติม token ตามเวลาที่ผ่านไปแล้วหยิบ 1 token ในคำสั่งเดียว (ไม่คืนแถว = token ไม่พอ)
+TAKE_TOKEN_SQL = """
+UPDATE agriculture_earthenginequota
+SET tokens = LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at)::float8 * %(rate)s) - 1,
+    updated_at = clock_timestamp()
+WHERE name = %(name)s
+  AND LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at)::float8 * %(rate)s) >= 1
+RETURNING tokens
+"""
+
+# ข้อความ error ของ EE ที่ลองใหม่แล้วมีโอกาสสำเร็จ (โควตา / server ขัดข้องชั่วคราว)
+RETRYABLE_MESSAGES = (
+    'quota', 'rate limit', 'too many', '429', 'deadline exceeded', 'timed out',
+    'service unavailable', '503', 'internal error', 'backend error',
+)
+
+# เวลารอแบบ blocking บน slot ที่สุ่มไว้ ก่อนกลับไปลองทุก slot อีกรอบ (วินาที)
+SLOT_BLOCK_SECONDS = 1.0
+
+_seeded = False
+
+
+class EarthEngineBusyError(Exception):
+    """Earth Engine เต็มโควตา: รอคิวนานเกินกำหนด หรือลองใหม่ครบแล้วยังถูกจำกัด"""
+
+
+class EarthEngineQueueTimeout(EarthEngineBusyError):
+    """รอคิวของระบบเราเอง (slot / token) นานเกิน EE_LIMIT_MAX_WAIT โดยยังไม่ได้ยิง EE"""
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+        return True
+    return isinstance(error, ee.EEException) and any(m in str(error).lower() for m in RETRYABLE_MESSAGES)
+
+
+def backoff(attempt):
+    """exponential backoff แบบ full jitter: สุ่ม 0..min(max, base*2^attempt) กัน worker ลองใหม่พร้อมกัน"""
+    return random.uniform(0, min(settings.EE_BACKOFF_MAX, settings.EE_BACKOFF_BASE * 2 ** attempt))
+
+
+def _wait(deadline, interval):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise EarthEngineQueueTimeout('Earth Engine มีคิวการวิเคราะห์มาก กรุณาลองใหม่อีกครั้ง')
+    time.sleep(min(remaining, interval * random.uniform(0.5, 1.5)))
+
+
+def _acquire_slot(cursor, deadline):
+    slots = range(settings.EE_MAX_IN_FLIGHT)
+    while True:
+        for slot in random.sample(slots, len(slots)):
+            cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [LOCK_CLASS, slot])
+            if cursor.fetchone()[0]:
+                return slot
+
+        # ทุก slot เต็ม: รอแบบ blocking บน slot สุ่ม (ได้ทันทีที่ slot นั้นว่าง) ภายใต้ lock_timeout
+        # แทนการวนถาม primary ถี่ๆ ; ครบเวลาแล้วค่อยกลับไปลองทุก slot อีกรอบ
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise EarthEngineQueueTimeout('Earth Engine มีคิวการวิเคราะห์มาก กรุณาลองใหม่อีกครั้ง')
+        slot = random.choice(slots)
+        timeout_ms = max(1, int(min(remaining, SLOT_BLOCK_SECONDS * random.uniform(0.5, 1.5)) * 1000))
+        cursor.execute(f'SET lock_timeout = {timeout_ms}')
+        try:
+            cursor.execute('SELECT pg_advisory_lock(%s, %s)', [LOCK_CLASS, slot])
+            return slot
+        except OperationalError:  # lock_timeout (55P03)
+            pass
+        finally:
+            cursor.execute('RESET lock_timeout')
+
+
+def _take_token(cursor, deadline):
+    global _seeded
+    if not _seeded:
+        cursor.execute(SEED_SQL, [BUCKET, settings.EE_RATE_BURST])
+        _seeded = True
+    params = {'name': BUCKET, 'rate': settings.EE_RATE_PER_SECOND, 'burst': settings.EE_RATE_BURST}
+    while True:
+        cursor.execute(TAKE_TOKEN_SQL, params)
+        if cursor.fetchone():
+            return
+        _wait(deadline, 1 / settings.EE_RATE_PER_SECOND)
+
+
+def limited(name, job):
+    """ห่องาน Earth Engine ให้รอคิวร่วม (slot + token) และลองใหม่เมื่อติดโควตา/ขัดข้องชั่วคราว"""
+    timings = current_timings.get()  # อ่านใน request thread ก่อนงานถูกส่งไป thread pool
+
+    def _limited_job():
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            deadline = started + settings.EE_LIMIT_MAX_WAIT
+            # งานรันใน thread ของ EE_EXECUTOR ซึ่งมี DB connection ของตัวเอง (autocommit) lock จึงผูกกับ thread นี้
+            # thread นี้ไม่ผ่าน request_started/finished จึงต้องทิ้ง connection ที่เสียหรือหมดอายุเอง
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                slot = _acquire_slot(cursor, deadline)
+                try:
+                    _take_token(cursor, deadline)
+                    waited = time.monotonic() - started
+                    EE_LIMITER_WAIT.labels(name).observe(waited)
+                    if timings is not None:
+                        timings.add('ee_wait', waited)
+                    try:
+                        return job()
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        if attempt >= settings.EE_MAX_RETRIES:
+                            raise EarthEngineBusyError('Earth Engine ไม่ว่างหรือเต็มโควตา กรุณาลองใหม่อีกครั้ง') from e
+                        error = e
+                finally:
+                    cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [LOCK_CLASS, slot])
+
+            # รอนอก slot เพื่อให้งานอื่นได้ใช้ระหว่าง backoff
+            delay = backoff(attempt)
+            attempt += 1
+            EE_CALL_RETRIES.labels(name).inc()
+            logger.warning('ee_retry %s attempt=%d delay=%.2fs error=%s', name, attempt, delay, error)
+            time.sleep(delay)
+    return _limited_job
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection
+
+# ทำความสะอาดรูปแปลงใน PostGIS ครั้งเดียวทั้งชุด:
+# แก้ self-intersection -> ปัดพิกัดเข้ากริด -> ลบจุดซ้ำ -> เหลือ polygon ชิ้นที่ใหญ่ที่สุด
+NORMALIZE_SQL = """
+WITH input AS (
+    SELECT ord, ST_GeomFromEWKB(wkb) AS geom FROM unnest(%s::bytea[]) WITH ORDINALITY AS t(wkb, ord)
+)
+SELECT (
+    SELECT ST_AsEWKB(part.geom)
+    FROM ST_Dump(ST_CollectionExtract(ST_MakeValid(
+        ST_RemoveRepeatedPoints(ST_ReducePrecision(ST_MakeValid(input.geom), %s))
+    ), 3)) AS part
+    ORDER BY ST_Area(part.geom) DESC
+    LIMIT 1
+)
+FROM input
+ORDER BY ord
+"""
+
+
+class InvalidGeometryError(ValueError):
+    """รูปแปลงใช้ไม่ได้หลังทำความสะอาด (เช่น ไม่มีพื้นที่ หรือไม่ใช่ polygon)"""
+
+
+def cap_vertices(polygon, max_vertices):
+    """ลดจำนวนจุดให้ไม่เกิน max_vertices ด้วย simplify ที่ค่อยๆ เพิ่ม tolerance (0 = ไม่จำกัด)"""
+    if not max_vertices or polygon.num_points <= max_vertices:
+        return polygon
+    tolerance = settings.GEOMETRY_PRECISION
+    simplified = polygon
+    while simplified.num_points > max_vertices and tolerance < 1:
+        tolerance *= 2
+        simplified = polygon.simplify(tolerance, preserve_topology=True)
+    return simplified
+
+
+def normalize_polygons(polygons):
+    """ทำความสะอาดรูปแปลงหลายรูปใน query เดียว คืนค่า list ตามลำดับเดิม"""
+    if not polygons:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(NORMALIZE_SQL, [[bytes(p.ewkb) for p in polygons], settings.GEOMETRY_PRECISION])
+        rows = cursor.fetchall()
+
+    normalized = []
+    for (wkb,) in rows:
+        if wkb is None:
+            raise InvalidGeometryError('รูปแปลงไม่ถูกต้อง (ต้องเป็นพื้นที่ปิดที่ไม่ซ้อนทับตัวเอง)')
+        polygon = cap_vertices(GEOSGeometry(bytes(wkb)), settings.GEOMETRY_MAX_VERTICES)
+        if polygon.geom_type != 'Polygon' or polygon.empty:
+            raise InvalidGeometryError('รูปแปลงไม่ถูกต้อง (ต้องเป็นพื้นที่ปิดที่ไม่ซ้อนทับตัวเอง)')
+        normalized.append(polygon)
+    return normalized
+
+
+def normalize_polygon(polygon):
+    return normalize_polygons([polygon])[0]
+
+
+def area_rai(polygon):
+    """พื้นที่เป็นไร่ (คำนวณบน UTM 47N ซึ่งครอบคลุมภาคเหนือ)"""
+    return round(polygon.transform(32647, clone=True).area / 1600, 2)
@@ -0,0 +1,121 @@
+import json
+import random
+import logging
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import EE_CALL_LATENCY, EE_CALL_ERRORS
+
+logger = logging.getLogger('agriculture')
+
+# เวลาของ request ปัจจุบัน (None = request นี้ไม่ได้ถูกสุ่มมาวัด)
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """สะสมเวลาแยกตามหมวด (db / serialize / ee) ของ 1 request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # งาน EE บันทึกเวลาจากหลาย thread พร้อมกัน
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def as_header(self, total):
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]}x"' for name, seconds in self.durations.items()]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(name):
+    """วัดเวลาของ block นี้เข้าหมวด name (ไม่ทำอะไรถ้า request ไม่ถูกสุ่มมาวัด)"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+def record_sql(execute, sql, params, many, context):
+    """execute_wrapper ที่ติดตั้งกับทุก DB connection (ดู signals.install_sql_timer)"""
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def instrument_ee(name, job):
+    """ห่องาน Earth Engine ให้บันทึก metrics และเวลาเข้า request ที่สร้างงาน แม้จะไปรันใน thread pool"""
+    timings = current_timings.get()
+
+    def _timed_job():
+        start = perf_counter()
+        try:
+            return job()
+        except Exception:
+            EE_CALL_ERRORS.labels(name).inc()
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            EE_CALL_LATENCY.labels(name).observe(elapsed)
+            if timings is not None:
+                timings.add('ee', elapsed)
+    return _timed_job
+
+
+def _start():
+    timings = RequestTimings() if random.random() < settings.REQUEST_TIMING_SAMPLE_RATE else None
+    return timings, current_timings.set(timings), perf_counter()
+
+
+def _finish(request, response, state):
+    timings, token, start = state
+    total = perf_counter() - start
+    current_timings.reset(token)
+
+    slow = total * 1000 >= settings.REQUEST_TIMING_SLOW_MS
+    if timings is None and not slow:
+        return response
+
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 1),
+    }
+    if timings is not None:
+        response['Server-Timing'] = timings.as_header(total)
+        for name, seconds in timings.durations.items():
+            record[f'{name}_ms'] = round(seconds * 1000, 1)
+            record[f'{name}_count'] = timings.counts[name]
+    (logger.warning if slow else logger.info)('request_timing %s', json.dumps(record))
+    return response
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """ใส่ Server-Timing header และ log เวลาของ DB / serializer / Earth Engine ต่อ request"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = _start()
+            response = await get_response(request)
+            return _finish(request, response, state)
+    else:
+        def middleware(request):
+            state = _start()
+            response = get_response(request)
+            return _finish(request, response, state)
+    return middleware
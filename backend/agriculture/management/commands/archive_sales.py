@@ -0,0 +1,47 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from agriculture.cache import invalidate_api_cache
+from agriculture.models import SaleNotification, SaleNotificationArchive, sale_season
+
+
+class Command(BaseCommand):
+    help = 'ย้ายรายการที่ขายแล้วของฤดูที่ปิดไปแล้วออกจากตารางหลักไปเก็บใน archive (ประวัติยังดูได้ผ่าน SaleHistory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-seasons', type=int, default=1,
+                            help='จำนวนฤดูล่าสุดที่ยังเก็บไว้ในตารางหลัก (1 = เฉพาะฤดูปัจจุบัน)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='แสดงจำนวนที่จะย้ายโดยไม่ย้ายจริง')
+
+    def handle(self, *args, **options):
+        oldest_kept = sale_season(timezone.now()) - max(options['keep_seasons'], 1) + 1
+        cutoff = datetime.datetime(oldest_kept, settings.SALE_SEASON_START_MONTH, 1)
+        if settings.USE_TZ:
+            cutoff = timezone.make_aware(cutoff)
+
+        closed = SaleNotification.objects.filter(status='SOLD', sold_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f'🔎 รายการที่จะย้าย: {closed.count():,} รายการ (ขายก่อน {cutoff:%Y-%m-%d})')
+            return
+
+        total = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    closed.select_related('rice_field').select_for_update(of=('self',))
+                    .order_by('sold_at')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                SaleNotificationArchive.archive(batch)
+            total += len(batch)
+            self.stdout.write(f'  ... ย้ายแล้ว {total:,} รายการ')
+
+        if total:
+            invalidate_api_cache()
+        self.stdout.write(self.style.SUCCESS(f'🎉 ย้ายรายการขายของฤดูก่อน {oldest_kept} ไป archive แล้ว {total:,} รายการ'))
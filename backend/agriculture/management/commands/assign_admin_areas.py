@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from agriculture.cache import invalidate_api_cache
+from agriculture.models import AdminArea, RiceField
+
+# หาเขตที่ครอบจุดกึ่งกลางแปลงในฐานข้อมูลทั้งชุด (ST_Intersects ใช้ GiST index ของ AdminArea.boundary)
+# เขตซ้อนกันตรงรอยต่อเลือกรหัสน้อยสุด ให้ผลตรงกับ RiceField.assign_admin_areas
+AREA_SQL = """(
+    SELECT a.id FROM agriculture_adminarea a
+    WHERE a.level = '{level}' AND ST_Intersects(a.boundary, COALESCE(f.centroid, ST_PointOnSurface(f.boundary)))
+    ORDER BY a.code LIMIT 1
+)"""
+
+ASSIGN_SQL = f"""
+WITH batch AS (
+    SELECT id FROM agriculture_ricefield
+    WHERE id > %s {{only_missing}}
+    ORDER BY id LIMIT %s
+), assigned AS (
+    SELECT f.id,
+        {AREA_SQL.format(level='PROVINCE')} AS province_id,
+        {AREA_SQL.format(level='AMPHOE')} AS amphoe_id,
+        {AREA_SQL.format(level='TAMBON')} AS tambon_id
+    FROM agriculture_ricefield f JOIN batch USING (id)
+), updated AS (
+    UPDATE agriculture_ricefield f
+    SET province_id = assigned.province_id,
+        amphoe_id = assigned.amphoe_id,
+        tambon_id = assigned.tambon_id,
+        district = COALESCE((SELECT name_th FROM agriculture_adminarea WHERE id = assigned.amphoe_id), f.district)
+    FROM assigned
+    WHERE f.id = assigned.id
+      AND (f.province_id, f.amphoe_id, f.tambon_id) IS DISTINCT FROM
+          (assigned.province_id, assigned.amphoe_id, assigned.tambon_id)
+    RETURNING f.id
+)
+SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated)
+"""
+
+
+class Command(BaseCommand):
+    help = 'ผูกแปลงนาที่มีอยู่แล้วกับจังหวัด/อำเภอ/ตำบล (รันหลัง load_admin_areas) ทีละชุดในฐานข้อมูล'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--only-missing', action='store_true', help='เฉพาะแปลงที่ยังไม่มีอำเภอ')
+
+    def handle(self, *args, **options):
+        if not AdminArea.objects.exists():
+            self.stdout.write(self.style.WARNING('⚠️ ยังไม่มีข้อมูลเขตการปกครอง รัน load_admin_areas ก่อน'))
+            return
+
+        sql = ASSIGN_SQL.format(only_missing='AND amphoe_id IS NULL' if options['only_missing'] else '')
+        last_id, changed = 0, 0
+        while True:
+            # ไล่ตาม id (keyset) ครอบคลุมแปลงในถังขยะด้วย เผื่อถูกกู้คืนภายหลัง
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [last_id, options['batch_size']])
+                batch_last_id, updated = cursor.fetchone()
+            if batch_last_id is None:
+                break
+            last_id = batch_last_id
+            changed += updated
+            self.stdout.write(f'  ... ถึงแปลง id {last_id:,} / เปลี่ยน {changed:,} แปลง')
+
+        if changed:
+            invalidate_api_cache()  # UPDATE ตรงไม่ส่ง post_save
+        unassigned = RiceField.objects.filter(amphoe__isnull=True).count()
+        if unassigned:
+            self.stdout.write(self.style.WARNING(f'⚠️ แปลงที่อยู่นอกเขตที่นำเข้า {unassigned:,} แปลง (ยังใช้ district เดิม)'))
+        self.stdout.write(self.style.SUCCESS(f'🎉 ผูกเขตการปกครองเรียบร้อย {changed:,} แปลง'))
@@ -0,0 +1,299 @@
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from agriculture import earth_engine
+from agriculture.cache import bump_generation
+from agriculture.compression import compress
+from agriculture.models import Notification, RiceField, SaleNotification
+from agriculture.notifications import mark_read
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench-'
+PAGE_SIZES = (20, 50, 100)
+# ระดับการบีบอัดที่เทียบกัน (encoding, setting, ค่า)
+COMPRESSION_LEVELS = (
+    ('gzip', 'API_COMPRESSION_GZIP_LEVEL', 1), ('gzip', 'API_COMPRESSION_GZIP_LEVEL', 6),
+    ('gzip', 'API_COMPRESSION_GZIP_LEVEL', 9), ('br', 'API_COMPRESSION_BROTLI_QUALITY', 1),
+    ('br', 'API_COMPRESSION_BROTLI_QUALITY', 5), ('br', 'API_COMPRESSION_BROTLI_QUALITY', 11),
+)
+MOBILE_KBPS = 1000  # ความเร็วเน็ตมือถือต่างจังหวัดโดยประมาณ สำหรับแปลงจำนวน byte เป็นเวลาส่ง
+
+
+def percentile(values, pct):
+    """nearest-rank percentile (values ต้องเรียงแล้ว)"""
+    if not values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def circle_polygon(lng, lat, vertices, radius_deg=0.0008):
+    """GeoJSON polygon รูปวงกลมจำนวนจุดตามที่กำหนด (จำลองแปลงที่วาดมือแบบละเอียด)"""
+    ring = [
+        [lng + radius_deg * math.cos(2 * math.pi * i / vertices), lat + radius_deg * math.sin(2 * math.pi * i / vertices)]
+        for i in range(vertices)
+    ]
+    ring.append(ring[0])
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+def stub_analysis_requests(latency):
+    """แทน Earth Engine ด้วยงานที่หน่วงเวลาคงที่ เพื่อวัด overhead ของฝั่งเราเอง"""
+    def _requests(boundary):
+        def job(value):
+            def _run():
+                time.sleep(latency)
+                return value
+            return _run
+        return {
+            'scene_count': job(5),
+            'cloud_score': job(12.5),
+            'tile_url': job('https://example.invalid/tiles/{z}/{x}/{y}'),
+            'stats': job({'NDVI': 0.62, 'NDBI': -0.15}),
+        }
+    return _requests
+
+
+class Command(BaseCommand):
+    help = 'วัดประสิทธิภาพ API หลัก (p50/p95/p99, query ต่อ request, throughput) บนข้อมูลจำลอง แล้วออกผลเป็น JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='จำนวน request ต่อ scenario')
+        parser.add_argument('--concurrency', type=int, default=8, help='จำนวน thread สำหรับ scenario แบบพร้อมกัน')
+        parser.add_argument('--ee-latency', type=float, default=0.2, help='เวลาหน่วงของ Earth Engine จำลอง (วินาที/call)')
+        parser.add_argument('--warm-cache', action='store_true', help='ไม่ล้าง API cache ก่อนแต่ละ request')
+        parser.add_argument('--only', nargs='*', help='รันเฉพาะ scenario ที่ชื่อขึ้นต้นด้วยค่าที่ระบุ')
+        parser.add_argument('--output', help='บันทึกผล JSON ลงไฟล์ (ใช้เป็น baseline ได้)')
+        parser.add_argument('--compare', help='ไฟล์ baseline JSON สำหรับเปรียบเทียบ')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='p95 ช้าลงได้ไม่เกินสัดส่วนนี้ (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.farmer, self.miller, self.govt = self._pick_users()
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            try:
+                for name, scenario in self._scenarios():
+                    if options['only'] and not any(name.startswith(prefix) for prefix in options['only']):
+                        continue
+                    self.stderr.write(f'⏱️  {name} ...')
+                    results[name] = scenario()
+            finally:
+                self._cleanup()
+
+        report = {'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'options': {
+            k: options[k] for k in ('iterations', 'concurrency', 'ee_latency', 'warm_cache')
+        }, 'scenarios': results}
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+        if options['compare']:
+            self._compare(results, options['compare'], options['tolerance'])
+
+    # --- เตรียมข้อมูล ---
+    def _pick_users(self):
+        farmer = (User.objects.filter(role='FARMER', rice_fields__is_active=True)
+                  .order_by('-rice_fields__created_at').first())
+        miller = User.objects.filter(role='MILLER').first()
+        if not farmer or not miller:
+            raise CommandError('ไม่พบข้อมูลเกษตรกร/โรงสี ให้รัน generate_synthetic_data ก่อน')
+        govt, _ = User.objects.get_or_create(username=f'{BENCH_PREFIX}govt', defaults={'role': 'GOVT'})
+        return farmer, miller, govt
+
+    def _client(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def _cleanup(self):
+        # แจ้งเตือนจากรายการขายของ benchmark (ถึงเกษตรกรจริง) ลบออกพร้อมคืนตัวนับ unread
+        sale_ids = list(SaleNotification.objects.filter(
+            rice_field__name__startswith=BENCH_PREFIX).values_list('pk', flat=True))
+        for recipient in User.objects.filter(notifications__sale_id__in=sale_ids).distinct():
+            mark_read(recipient, list(recipient.notifications.filter(sale_id__in=sale_ids).values_list('pk', flat=True)))
+        Notification.objects.filter(sale_id__in=sale_ids).delete()
+        RiceField.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def _bench_field(self, suffix):
+        centroid = RiceField.objects.filter(owner=self.farmer, centroid__isnull=False).values_list('centroid', flat=True).first()
+        lng, lat = (centroid.x, centroid.y) if centroid else (99.90, 19.17)
+        res = self._client(self.farmer).post('/api/rice-fields/', {
+            'name': f'{BENCH_PREFIX}{suffix}', 'variety': 'KDML105', 'geometry': circle_polygon(lng, lat, 16),
+        }, content_type='application/json')
+        return RiceField.objects.get(pk=res.json()['id'])
+
+    # --- การวัด ---
+    def _measure(self, requests, concurrency=1):
+        """requests: list ของ (client, fn) ; คืนค่าสถิติ latency/query/throughput"""
+        def run(item):
+            client, fn = item
+            if not self.options['warm_cache']:
+                bump_generation()
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = fn(client)
+                elapsed = perf_counter() - start
+            if concurrency > 1:
+                connection.close()
+            return elapsed, len(queries), response.status_code
+
+        started = perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(run, requests))
+        else:
+            samples = [run(item) for item in requests]
+        wall = perf_counter() - started
+
+        latencies = sorted(s[0] * 1000 for s in samples)
+        statuses = {}
+        for _, _, code in samples:
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+        return {
+            'requests': len(samples),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_per_request': round(sum(s[1] for s in samples) / len(samples), 2),
+            'throughput_rps': round(len(samples) / wall, 2),
+            'status_codes': statuses,
+        }
+
+    def _repeat(self, user, fn):
+        client = self._client(user)
+        return self._measure([(client, fn)] * self.options['iterations'])
+
+    # --- scenarios ---
+    def _scenarios(self):
+        yield 'dashboard_stats', lambda: self._repeat(self.govt, lambda c: c.get('/api/stats/'))
+        yield 'bootstrap.govt', lambda: self._repeat(self.govt, lambda c: c.get('/api/bootstrap/'))
+        yield 'bootstrap.farmer', lambda: self._repeat(self.farmer, lambda c: c.get('/api/bootstrap/'))
+        yield 'notifications.unread_count', lambda: self._repeat(
+            self.farmer, lambda c: c.get('/api/notifications/unread_count/'))
+        for size in PAGE_SIZES:
+            yield f'rice_fields_list.govt.{size}', lambda size=size: self._repeat(
+                self.govt, lambda c: c.get('/api/rice-fields/', {'page_size': size}))
+            yield f'rice_fields_list.farmer.{size}', lambda size=size: self._repeat(
+                self.farmer, lambda c: c.get('/api/rice-fields/', {'page_size': size}))
+            yield f'sales_list.govt.{size}', lambda size=size: self._repeat(
+                self.govt, lambda c: c.get('/api/sales/', {'page_size': size}))
+            yield f'sales_list.miller.{size}', lambda size=size: self._repeat(
+                self.miller, lambda c: c.get('/api/sales/', {'page_size': size}))
+        yield 'request_buy.concurrent', self._request_buy_concurrent
+        yield 'approve_sell.concurrent', self._approve_sell_concurrent
+        for vertices in (100, 1000, 5000):
+            yield f'rice_fields_create.{vertices}_vertices', lambda vertices=vertices: self._create_large(vertices)
+        yield 'calculate_yield.stubbed', self._calculate_yield
+        for name, user, path in (
+            ('rice_fields_list.govt.100', self.govt, '/api/rice-fields/?page_size=100'),
+            ('sales_list.govt.100', self.govt, '/api/sales/?page_size=100'),
+            ('bootstrap.govt', self.govt, '/api/bootstrap/'),
+        ):
+            yield f'compression.{name}', lambda user=user, path=path: self._compression(user, path)
+
+    def _open_sale(self, field):
+        return SaleNotification.objects.create(
+            farmer=self.farmer, rice_field=field, quantity_ton=5, price_per_ton=12000, phone='0811111111'
+        )
+
+    def _request_buy_concurrent(self):
+        # โรงสีหลายรายแย่งรายการเดียวกัน: ต้องสำเร็จ 1 ราย ที่เหลือได้ 409
+        field = self._bench_field('buy')
+        sale = self._open_sale(field)
+        millers = User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}miller{i}', role='MILLER', phone='0822222222')
+            for i in range(self.options['concurrency'])
+        ])
+        requests = [
+            (self._client(m), lambda c: c.post(f'/api/sales/{sale.pk}/request_buy/', {'contact': '0822222222'}))
+            for m in millers
+        ]
+        result = self._measure(requests, concurrency=self.options['concurrency'])
+        result['winners'] = result['status_codes'].get('200', 0)
+        if result['winners'] > 1:
+            raise CommandError(f"request_buy.concurrent: ขอซื้อสำเร็จ {result['winners']} ราย (ต้องมีแค่ 1) {result['status_codes']}")
+        return result
+
+    def _approve_sell_concurrent(self):
+        field = self._bench_field('approve')
+        sales = [self._open_sale(field) for _ in range(self.options['iterations'])]
+        SaleNotification.objects.filter(pk__in=[s.pk for s in sales]).update(
+            status='REQUESTED', buyer=self.miller, buyer_contact='0822222222'
+        )
+        requests = [
+            (self._client(self.farmer), lambda c, pk=s.pk: c.post(f'/api/sales/{pk}/approve_sell/'))
+            for s in sales
+        ]
+        return self._measure(requests, concurrency=self.options['concurrency'])
+
+    def _create_large(self, vertices):
+        client = self._client(self.farmer)
+        counter = iter(range(self.options['iterations']))
+
+        def create(c):
+            return c.post('/api/rice-fields/', {
+                'name': f'{BENCH_PREFIX}poly{vertices}-{next(counter)}', 'variety': 'RD6',
+                'geometry': circle_polygon(99.90, 19.17, vertices),
+            }, content_type='application/json')
+        return self._measure([(client, create)] * self.options['iterations'])
+
+    def _calculate_yield(self):
+        field = self._bench_field('yield')
+        with mock.patch.object(earth_engine, 'initialize', return_value=True), \
+                mock.patch.object(earth_engine, '_analysis_requests', stub_analysis_requests(self.options['ee_latency'])):
+            return self._repeat(self.farmer, lambda c: c.post(f'/api/rice-fields/{field.pk}/calculate_yield/'))
+
+    def _compression(self, user, path):
+        """เทียบ CPU ที่ใช้บีบอัดกับจำนวน byte ที่ลดได้ ของ payload จริงจากข้อมูลจำลอง"""
+        body = self._client(user).get(path).content  # ไม่ส่ง Accept-Encoding จึงได้ตัวเต็ม
+        result = {'raw_bytes': len(body), 'raw_transfer_ms': round(len(body) * 8 / MOBILE_KBPS, 1), 'levels': {}}
+        for encoding, setting, level in COMPRESSION_LEVELS:
+            with override_settings(**{setting: level}):
+                start = time.process_time()
+                for _ in range(self.options['iterations']):
+                    compressed = compress(body, encoding)
+                cpu_ms = (time.process_time() - start) * 1000 / self.options['iterations']
+            result['levels'][f'{encoding}-{level}'] = {
+                'bytes': len(compressed),
+                'ratio': round(len(body) / max(len(compressed), 1), 2),
+                'cpu_ms': round(cpu_ms, 3),
+                'transfer_ms': round(len(compressed) * 8 / MOBILE_KBPS, 1),
+            }
+        return result
+
+    # --- เปรียบเทียบกับ baseline ---
+    def _compare(self, results, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)['scenarios']
+
+        regressions = []
+        for name, current in results.items():
+            before = baseline.get(name)
+            if not before or 'p95_ms' not in before:  # scenario compression ไม่มี latency ให้เทียบ
+                continue
+            limit = before['p95_ms'] * (1 + tolerance)
+            line = f'{name}: p95 {before["p95_ms"]} -> {current["p95_ms"]} ms, queries {before["queries_per_request"]} -> {current["queries_per_request"]}'
+            if current['p95_ms'] > limit or current['queries_per_request'] > before['queries_per_request']:
+                regressions.append(line)
+                self.stderr.write(self.style.ERROR(f'❌ {line}'))
+            else:
+                self.stderr.write(self.style.SUCCESS(f'✅ {line}'))
+
+        if regressions:
+            raise CommandError(f'พบ regression {len(regressions)} scenario')
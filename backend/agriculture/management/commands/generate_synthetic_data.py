@@ -0,0 +1,246 @@
+import math
+import random
+import datetime
+from contextlib import contextmanager
+from decimal import Decimal
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from agriculture.cache import invalidate_api_cache
+from agriculture.earth_engine import estimate_yield
+from agriculture.geometry import normalize_polygons
+from agriculture.models import RiceField, YieldEstimation, SaleNotification
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'synth_'
+
+# อำเภอในจังหวัดพะเยา (จุดศูนย์กลางโดยประมาณ: lng, lat)
+PHAYAO_DISTRICTS = [
+    ('เมืองพะเยา', 99.90, 19.17),
+    ('จุน', 100.13, 19.33),
+    ('เชียงคำ', 100.30, 19.52),
+    ('เชียงม่วน', 100.29, 18.88),
+    ('ดอกคำใต้', 100.00, 19.16),
+    ('ปง', 100.27, 19.15),
+    ('แม่ใจ', 99.81, 19.35),
+    ('ภูซาง', 100.36, 19.60),
+    ('ภูกามยาว', 99.97, 19.27),
+]
+
+# ขอบเขตจังหวัดพะเยาโดยประมาณ (min_lng, min_lat, max_lng, max_lat)
+PHAYAO_BBOX = (99.70, 18.85, 100.50, 19.70)
+
+# ช่องกริดละ ~220 ม. แต่ละแปลงอยู่ในช่องของตัวเองเสมอ จึงไม่มีทางทับกัน
+CELL_DEG = 0.002
+METERS_PER_DEG_LAT = 111_320
+
+# สัดส่วนสถานะของรายการขาย
+SALE_STATUS_WEIGHTS = [('OPEN', 0.5), ('REQUESTED', 0.15), ('SOLD', 0.35)]
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    """ปิด auto_now/auto_now_add ชั่วคราว เพื่อให้ bulk_create ใส่วันที่ย้อนหลังได้"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'สร้างข้อมูลจำลองระดับจังหวัด (ผู้ใช้ แปลงนา ประวัติผลผลิต รายการขาย) สำหรับทดสอบโหลด'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=1000, help='จำนวนเกษตรกร')
+        parser.add_argument('--millers', type=int, default=50, help='จำนวนโรงสี')
+        parser.add_argument('--fields', type=int, default=10000, help='จำนวนแปลงนา')
+        parser.add_argument('--yields-per-field', type=int, default=3, help='จำนวนประวัติการประเมินผลผลิตต่อแปลง')
+        parser.add_argument('--sale-ratio', type=float, default=0.6, help='สัดส่วนแปลงที่มีรายการขาย (0-1)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--password', default='synthetic-pass', help='รหัสผ่านของผู้ใช้จำลองทุกคน')
+        parser.add_argument('--clear', action='store_true', help=f'ลบข้อมูลจำลองเดิม (ผู้ใช้ที่ขึ้นต้นด้วย {USERNAME_PREFIX}) ก่อน')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        batch_size = options['batch_size']
+        started = perf_counter()
+
+        synthetic_users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        if options['clear']:
+            deleted, _ = synthetic_users.delete()
+            self.stdout.write(self.style.WARNING(f'🗑️ ลบข้อมูลจำลองเดิม {deleted} แถว'))
+        elif synthetic_users.exists():
+            # กริดของรอบใหม่จะทับกับแปลงของรอบเดิม
+            raise CommandError('มีข้อมูลจำลองอยู่แล้ว ใช้ --clear เพื่อลบและสร้างใหม่')
+
+        farmers, millers = self._create_users(options['farmers'], options['millers'], options['password'], batch_size)
+
+        totals = {'fields': 0, 'yields': 0, 'sales': 0}
+        cells = self._cell_iterator(options['fields'])
+        remaining = options['fields']
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            with transaction.atomic(), preserve_timestamps(RiceField, YieldEstimation, SaleNotification):
+                fields = [self._build_field(farmers, totals['fields'] + i, next(cells)) for i in range(count)]
+                # bulk_create ไม่ผ่าน save() จึงทำความสะอาดรูปแปลงทั้งชุดใน query เดียวเอง
+                for field, boundary in zip(fields, normalize_polygons([f.boundary for f in fields])):
+                    field.boundary = boundary
+                    field.centroid = boundary.centroid
+                fields = RiceField.objects.bulk_create(fields, batch_size=batch_size)
+                yields = YieldEstimation.objects.bulk_create(
+                    [y for field in fields for y in self._build_yields(field, options['yields_per_field'])],
+                    batch_size=batch_size,
+                )
+                sales = SaleNotification.objects.bulk_create(
+                    [self._build_sale(field, millers) for field in fields if self.rng.random() < options['sale_ratio']],
+                    batch_size=batch_size,
+                )
+            totals['fields'] += len(fields)
+            totals['yields'] += len(yields)
+            totals['sales'] += len(sales)
+            remaining -= count
+            self.stdout.write(f'  ... แปลงนา {totals["fields"]:,}/{options["fields"]:,}')
+
+        # bulk_create ไม่ส่ง post_save
+        invalidate_api_cache()
+
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 สร้างข้อมูลจำลองเรียบร้อย ({elapsed:.1f} วินาที): '
+            f'เกษตรกร {len(farmers):,} / โรงสี {len(millers):,} / แปลงนา {totals["fields"]:,} / '
+            f'ประวัติผลผลิต {totals["yields"]:,} / รายการขาย {totals["sales"]:,}'
+        ))
+
+    # --- ผู้ใช้ ---
+    def _create_users(self, n_farmers, n_millers, password, batch_size):
+        # hash ครั้งเดียวแล้วใช้ซ้ำ (PBKDF2 ทีละคนจะช้ามากเมื่อมีหลายพันคน)
+        password_hash = make_password(password)
+
+        def build(role, i):
+            return User(
+                username=f'{USERNAME_PREFIX}{role.lower()}_{i:06d}',
+                password=password_hash,
+                role=role,
+                first_name=role.title(),
+                last_name=f'{i:06d}',
+                email=f'{role.lower()}{i}@synthetic.local',
+                phone=f'08{self.rng.randint(0, 99_999_999):08d}',
+            )
+
+        farmers = User.objects.bulk_create([build('FARMER', i) for i in range(n_farmers)], batch_size=batch_size)
+        millers = User.objects.bulk_create(
+            [build('MILLER', n_farmers + i) for i in range(n_millers)], batch_size=batch_size
+        )
+        return farmers, millers
+
+    # --- แปลงนา ---
+    def _cell_iterator(self, n_fields):
+        """เลือกช่องกริดห่างเท่าๆ กันทั่วจังหวัด แล้วกำหนดอำเภอจากศูนย์กลางที่ใกล้ที่สุด"""
+        min_x, min_y, max_x, max_y = PHAYAO_BBOX
+        cols = int((max_x - min_x) / CELL_DEG)
+        total_cells = cols * int((max_y - min_y) / CELL_DEG)
+        # ถ้าแปลงมากกว่าจำนวนช่องในจังหวัด กริดจะต่อแถวขึ้นไปทางเหนือ
+        step = max(total_cells // max(n_fields, 1), 1)
+        for index in range(0, n_fields * step, step):
+            row, col = divmod(index, cols)
+            x, y = min_x + col * CELL_DEG, min_y + row * CELL_DEG
+            district = min(PHAYAO_DISTRICTS, key=lambda d: (d[1] - x) ** 2 + (d[2] - y) ** 2)[0]
+            yield district, x, y
+
+    def _build_field(self, farmers, index, cell):
+        district, min_x, min_y = cell
+        lat_scale = METERS_PER_DEG_LAT
+        lng_scale = METERS_PER_DEG_LAT * math.cos(math.radians(min_y))
+
+        # แปลงนาทั่วไป 1-16 ไร่ (กว้าง/ยาว 40-160 ม.) วางแบบสุ่มภายในช่อง เว้นขอบ 8% กันจุดที่ขยับออกนอกช่อง
+        width = self.rng.uniform(40, 160) / lng_scale
+        height = self.rng.uniform(40, 160) / lat_scale
+        margin = CELL_DEG * 0.08
+        x0 = min_x + margin + self.rng.uniform(0, max(CELL_DEG - 2 * margin - width, 0))
+        y0 = min_y + margin + self.rng.uniform(0, max(CELL_DEG - 2 * margin - height, 0))
+
+        def jitter(value, span):
+            return value + self.rng.uniform(-0.05, 0.05) * span
+
+        ring = [
+            (jitter(x0, width), jitter(y0, height)),
+            (jitter(x0 + width, width), jitter(y0, height)),
+            (jitter(x0 + width, width), jitter(y0 + height, height)),
+            (jitter(x0, width), jitter(y0 + height, height)),
+        ]
+        ring.append(ring[0])
+        boundary = Polygon(ring, srid=4326)
+
+        # พื้นที่จาก shoelace ในหน่วยเมตร (เร็วกว่าการ transform ทีละแปลง)
+        area_sqm = abs(sum(
+            (x1 * lng_scale) * (y2 * lat_scale) - (x2 * lng_scale) * (y1 * lat_scale)
+            for (x1, y1), (x2, y2) in zip(ring, ring[1:])
+        )) / 2
+
+        created_at = self.now - datetime.timedelta(days=self.rng.uniform(0, 3 * 365))
+        return RiceField(
+            owner=farmers[index % len(farmers)],
+            name=f'แปลงจำลอง {index + 1}',
+            boundary=boundary,
+            area_rai=round(area_sqm / 1600, 2),
+            district=district,
+            variety=self.rng.choice(RiceField.VARIETY_CHOICES)[0],
+            created_at=created_at,
+            updated_at=created_at,
+        )
+
+    def _build_yields(self, field, count):
+        for _ in range(count):
+            ndvi = round(self.rng.uniform(0.2, 0.85), 3)
+            yield YieldEstimation(
+                field=field,
+                ndvi_mean=ndvi,
+                estimated_yield_ton=round(estimate_yield(field, ndvi, -0.2)['yield_ton'], 2),
+                created_at=field.created_at + (self.now - field.created_at) * self.rng.random(),
+            )
+
+    # --- รายการขาย ---
+    def _build_sale(self, field, millers):
+        status = self.rng.choices(
+            [s for s, _ in SALE_STATUS_WEIGHTS], weights=[w for _, w in SALE_STATUS_WEIGHTS]
+        )[0]
+        created_at = field.created_at + (self.now - field.created_at) * self.rng.random()
+        price = Decimal(self.rng.randrange(9000, 16000, 100))
+        sale = SaleNotification(
+            farmer_id=field.owner_id,
+            rice_field=field,
+            quantity_ton=round(max(field.area_rai * self.rng.uniform(0.3, 0.8), 0.1), 2),
+            price_per_ton=price,
+            phone=field.owner.phone,
+            status=status,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        if status in ('REQUESTED', 'SOLD') and millers:
+            buyer = self.rng.choice(millers)
+            sale.buyer = buyer
+            sale.buyer_contact = buyer.phone
+            if self.rng.random() < 0.5:
+                sale.negotiated_price = price - Decimal(self.rng.randrange(0, 1000, 100))
+        if status == 'SOLD':
+            sale.sold_at = min(created_at + datetime.timedelta(days=self.rng.uniform(0.5, 14)), self.now)
+            if sale.negotiated_price:
+                sale.price_per_ton = sale.negotiated_price
+            sale.updated_at = sale.sold_at
+        return sale
@@ -0,0 +1,104 @@
+from django.contrib.gis.gdal import DataSource, GDALException
+from django.contrib.gis.geos import GeometryCollection, MultiPolygon, Polygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from agriculture.models import AdminArea
+
+# ชื่อคอลัมน์ตามชุดข้อมูลขอบเขตการปกครองของไทย (HDX COD-AB: ADM1=จังหวัด, ADM2=อำเภอ, ADM3=ตำบล)
+LEVEL_NUMBERS = {'PROVINCE': 1, 'AMPHOE': 2, 'TAMBON': 3}
+PARENT_LEVELS = {'AMPHOE': 'PROVINCE', 'TAMBON': 'AMPHOE'}
+
+
+def as_multipolygon(geometry):
+    """แก้รูปเสียและแปลงเป็น MultiPolygon (shapefile มีทั้ง Polygon/MultiPolygon ปนกัน)"""
+    if not geometry.valid:
+        geometry = geometry.make_valid()
+    if isinstance(geometry, Polygon):
+        return MultiPolygon(geometry, srid=geometry.srid)
+    if isinstance(geometry, MultiPolygon):
+        return geometry
+    if isinstance(geometry, GeometryCollection):
+        polygons = [part for part in geometry if isinstance(part, Polygon)]
+        for part in geometry:
+            if isinstance(part, MultiPolygon):
+                polygons.extend(part)
+        if polygons:
+            return MultiPolygon(polygons, srid=geometry.srid)
+    return None
+
+
+class Command(BaseCommand):
+    help = 'นำเข้าขอบเขตการปกครอง (จังหวัด/อำเภอ/ตำบล) จาก shapefile ในเครื่อง (โหลดระดับบนก่อนเพื่อผูก parent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ไฟล์ .shp (หรือรูปแบบอื่นที่ GDAL อ่านได้)')
+        parser.add_argument('--level', required=True, choices=list(LEVEL_NUMBERS))
+        parser.add_argument('--code-field', help='คอลัมน์รหัสพื้นที่ (ค่าเริ่มต้น ADM<n>_PCODE)')
+        parser.add_argument('--name-field', help='คอลัมน์ชื่อภาษาไทย (ค่าเริ่มต้น ADM<n>_TH)')
+        parser.add_argument('--name-en-field', help='คอลัมน์ชื่อภาษาอังกฤษ (ค่าเริ่มต้น ADM<n>_EN)')
+        parser.add_argument('--parent-field', help='คอลัมน์รหัสพื้นที่ระดับบน (ค่าเริ่มต้น ADM<n-1>_PCODE)')
+        parser.add_argument('--encoding', default='utf-8', help='encoding ของ .dbf (shapefile ไทยรุ่นเก่ามักเป็น cp874)')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        level = options['level']
+        n = LEVEL_NUMBERS[level]
+        code_field = options['code_field'] or f'ADM{n}_PCODE'
+        name_field = options['name_field'] or f'ADM{n}_TH'
+        name_en_field = options['name_en_field'] or f'ADM{n}_EN'
+        parent_field = options['parent_field'] or (f'ADM{n - 1}_PCODE' if level in PARENT_LEVELS else None)
+
+        try:
+            layer = DataSource(options['path'], encoding=options['encoding'])[0]
+        except (GDALException, IndexError) as e:
+            raise CommandError(f'เปิดไฟล์ไม่ได้: {e}')
+        missing = [f for f in (code_field, name_field) if f not in layer.fields]
+        if missing:
+            raise CommandError(f'ไม่พบคอลัมน์ {missing} (มี {layer.fields})')
+
+        parents = {}
+        if parent_field in layer.fields:
+            parents = dict(AdminArea.objects.filter(level=PARENT_LEVELS[level]).values_list('code', 'id'))
+
+        batch, loaded, skipped = [], 0, []
+        for feature in layer:
+            code = str(feature.get(code_field)).strip()
+            geometry = feature.geom
+            if geometry.srs is None:  # ไม่มีไฟล์ .prj ถือว่าเป็น WGS84 อยู่แล้ว
+                geometry.srid = 4326
+            else:
+                geometry = geometry.transform(4326, clone=True)  # เก็บเป็น WGS84 เหมือนแปลงนา
+            boundary = as_multipolygon(geometry.geos)
+            if boundary is None:
+                skipped.append(code)
+                continue
+            batch.append(AdminArea(
+                level=level,
+                code=code,
+                name_th=str(feature.get(name_field)).strip(),
+                name_en=str(feature.get(name_en_field)).strip() if name_en_field in layer.fields else '',
+                parent_id=parents.get(str(feature.get(parent_field)).strip()) if parents else None,
+                boundary=boundary,
+            ))
+            if len(batch) >= options['batch_size']:
+                loaded += self._save(batch)
+                batch = []
+        loaded += self._save(batch)
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'⚠️ ข้าม {len(skipped)} พื้นที่ที่ไม่มีรูป polygon: {skipped[:20]}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'🎉 นำเข้า{dict(AdminArea.LEVEL_CHOICES)[level]} {loaded:,} พื้นที่ (รันซ้ำได้ รหัสเดิมจะถูกอัปเดต) '
+            f'จากนั้นรัน assign_admin_areas เพื่อผูกแปลงนาเดิม'
+        ))
+
+    def _save(self, batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            AdminArea.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['code'],
+                update_fields=['level', 'name_th', 'name_en', 'parent', 'boundary'],
+            )
+        return len(batch)
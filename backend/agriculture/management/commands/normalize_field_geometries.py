@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from agriculture.cache import invalidate_api_cache
+from agriculture.geometry import InvalidGeometryError, area_rai, normalize_polygons
+from agriculture.models import ADMIN_AREA_FIELDS, RiceField
+
+
+class Command(BaseCommand):
+    help = 'ทำความสะอาดรูปแปลงนาที่บันทึกไว้แล้ว (แก้รูปเสีย ปัดพิกัด ลบจุดซ้ำ จำกัดจำนวนจุด) ทีละชุด'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='แสดงจำนวนแปลงที่จะเปลี่ยนโดยไม่บันทึก')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        scanned = changed = vertices_before = vertices_after = 0
+        invalid = []
+        while True:
+            # ไล่ตาม id (keyset) ครอบคลุมแปลงในถังขยะด้วย เผื่อถูกกู้คืนภายหลัง
+            batch = list(
+                RiceField.objects.filter(pk__gt=last_id).order_by('pk')
+                .only('id', 'boundary', 'area_rai', 'centroid', *ADMIN_AREA_FIELDS)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            scanned += len(batch)
+
+            # ทำทั้งชุดใน query เดียว ถ้ามีรูปเสียในชุดค่อยถอยไปทีละแปลง
+            try:
+                normalized = normalize_polygons([f.boundary for f in batch])
+            except InvalidGeometryError:
+                normalized = []
+                for field in batch:
+                    try:
+                        normalized.append(normalize_polygons([field.boundary])[0])
+                    except InvalidGeometryError:
+                        invalid.append(field.pk)
+                        normalized.append(None)
+
+            updated = []
+            for field, boundary in zip(batch, normalized):
+                if boundary is None or boundary.ewkb == field.boundary.ewkb:
+                    continue
+                vertices_before += field.boundary.num_points
+                vertices_after += boundary.num_points
+                field.boundary = boundary
+                field.area_rai = area_rai(boundary)
+                field.centroid = boundary.centroid
+                field.assign_admin_areas()  # centroid ย้าย อาจข้ามเขต เหมือนตอน save()
+                updated.append(field)
+
+            changed += len(updated)
+            if updated and not options['dry_run']:
+                with transaction.atomic():
+                    RiceField.objects.bulk_update(updated, ['boundary', 'area_rai', 'centroid', *ADMIN_AREA_FIELDS])
+            self.stdout.write(f'  ... ตรวจแล้ว {scanned:,} แปลง / เปลี่ยน {changed:,} แปลง')
+
+        if invalid:
+            self.stdout.write(self.style.WARNING(f'⚠️ รูปแปลงเสียที่แก้อัตโนมัติไม่ได้ {len(invalid)} แปลง: {invalid[:20]}'))
+        if options['dry_run']:
+            self.stdout.write(f'🔎 จะเปลี่ยน {changed:,} จาก {scanned:,} แปลง (จำนวนจุด {vertices_before:,} -> {vertices_after:,})')
+            return
+        if changed:
+            invalidate_api_cache()  # bulk_update ไม่ส่ง post_save
+        self.stdout.write(self.style.SUCCESS(
+            f'🎉 ทำความสะอาดรูปแปลงเรียบร้อย {changed:,} แปลง (จำนวนจุด {vertices_before:,} -> {vertices_after:,})'
+        ))
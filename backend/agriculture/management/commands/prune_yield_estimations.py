@@ -0,0 +1,96 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber, Trunc
+from django.utils import timezone
+
+from agriculture.models import YieldEstimation, sale_season
+
+
+class Command(BaseCommand):
+    help = 'ลดความละเอียดประวัติผลประเมินผลผลิตที่เก่า (เหลือรายวัน/รายสัปดาห์/รายฤดู ต่อแปลง) แล้วลบส่วนเกินทีละชุด'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-all-days', type=int, default=settings.YIELD_KEEP_ALL_DAYS,
+                            help='เก็บทุกรายการที่ใหม่กว่ากี่วัน')
+        parser.add_argument('--daily-days', type=int, default=settings.YIELD_KEEP_DAILY_DAYS,
+                            help='ถึงอายุกี่วันที่เก็บวันละ 1 รายการต่อแปลง')
+        parser.add_argument('--weekly-days', type=int, default=settings.YIELD_KEEP_WEEKLY_DAYS,
+                            help='ถึงอายุกี่วันที่เก็บสัปดาห์ละ 1 รายการต่อแปลง (เก่ากว่านั้นเหลือฤดูละ 1 รายการ)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='จำนวนรายการที่ลบต่อ transaction')
+        parser.add_argument('--fields-per-batch', type=int, default=200, help='จำนวนแปลงที่คำนวณอันดับต่อรอบ')
+        parser.add_argument('--dry-run', action='store_true', help='แสดงจำนวนที่จะลบโดยไม่ลบจริง')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['keep_all_days'] <= options['daily_days'] <= options['weekly_days']:
+            raise CommandError('ต้องเป็น --keep-all-days <= --daily-days <= --weekly-days')
+
+        total = 0
+        for label, start, end, kind in self._tiers(options):
+            redundant = self._redundant(start, end, kind)
+            if options['dry_run']:
+                self.stdout.write(f'🔎 {label}: จะลบ {redundant.count():,} รายการ')
+                continue
+
+            deleted, last_field = 0, 0
+            while True:
+                # ไล่ทีละกลุ่มแปลงตาม field_id (keyset) คำนวณอันดับครั้งเดียวต่อกลุ่ม ไม่ต้องนับทั้งช่วงใหม่ทุกชุด
+                fields = list(
+                    YieldEstimation.objects.filter(created_at__gte=start, created_at__lt=end, field_id__gt=last_field)
+                    .order_by('field_id').values_list('field_id', flat=True).distinct()[:options['fields_per_batch']]
+                )
+                if not fields:
+                    break
+                last_field = fields[-1]
+                ids = list(redundant.filter(field_id__in=fields).values_list('pk', flat=True))
+                for i in range(0, len(ids), options['batch_size']):
+                    deleted += self._delete(ids[i:i + options['batch_size']])
+            total += deleted
+            self.stdout.write(f'  ... {label}: ลบ {deleted:,} รายการ')
+
+        # รายการล่าสุดของทุกแปลงอยู่ในช่วง "เก็บทั้งหมด" หรือเป็นตัวแทนของช่วงของมันเสมอ
+        # latest_yield ที่ cache ไว้จึงไม่เปลี่ยน ไม่ต้องล้าง API cache
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'🎉 ลดความละเอียดประวัติผลประเมินเรียบร้อย ลบทั้งหมด {total:,} รายการ'))
+
+    def _delete(self, ids):
+        # ลบด้วยคำสั่งเดียวต่อชุด: ไม่มีตารางใดอ้างถึง YieldEstimation และไม่ต้องใช้ signal ต่อแถว
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {YieldEstimation._meta.db_table} WHERE id = ANY(%s)', [ids])
+            return cursor.rowcount
+
+    def _tiers(self, options):
+        """ช่วงเวลา (ชื่อ, เริ่ม, สิ้นสุด, หน่วยที่เก็บ 1 รายการ) ; kind=None = 1 รายการต่อทั้งช่วง"""
+        now = timezone.now()
+        keep_all = now - datetime.timedelta(days=options['keep_all_days'])
+        daily = now - datetime.timedelta(days=options['daily_days'])
+        weekly = now - datetime.timedelta(days=options['weekly_days'])
+        yield 'รายวัน', daily, keep_all, 'day'
+        yield 'รายสัปดาห์', weekly, daily, 'week'
+
+        oldest = YieldEstimation.objects.filter(created_at__lt=weekly).order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is None:
+            return
+        for season in range(sale_season(oldest), sale_season(weekly) + 1):
+            start = self._season_start(season)
+            end = self._season_start(season + 1)
+            # ฤดูที่คาบเกี่ยวกับช่วงรายสัปดาห์ ตัดเฉพาะส่วนที่เก่ากว่า
+            yield f'ฤดู {season}', start, min(end, weekly), None
+
+    def _season_start(self, season):
+        start = datetime.datetime(season, settings.SALE_SEASON_START_MONTH, 1)
+        return timezone.make_aware(start) if settings.USE_TZ else start
+
+    def _redundant(self, start, end, kind):
+        """รายการที่ไม่ใช่รายการล่าสุดของแปลงในแต่ละวัน/สัปดาห์/ช่วง"""
+        partition = [F('field_id')]
+        if kind:
+            partition.append(Trunc('created_at', kind))
+        return (
+            YieldEstimation.objects.filter(created_at__gte=start, created_at__lt=end)
+            .annotate(rank=Window(RowNumber(), partition_by=partition, order_by=[F('created_at').desc(), F('pk').desc()]))
+            .filter(rank__gt=1)
+        )
@@ -0,0 +1,46 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from agriculture.cache import invalidate_api_cache
+from agriculture.models import RiceField, SaleNotificationArchive
+
+
+class Command(BaseCommand):
+    help = 'ลบถาวรแปลงนาที่อยู่ในถังขยะนานเกินกำหนด ทีละชุด (ตั้ง cron ให้รันวันละครั้ง)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.FIELD_TRASH_RETENTION_DAYS,
+                            help='ลบแปลงที่ถูกย้ายลงถังขยะนานกว่ากี่วัน')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='แสดงจำนวนที่จะลบโดยไม่ลบจริง')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        # updated_at ของแปลงในถังขยะคือเวลาที่ถูกลบ (perform_destroy บันทึก updated_at ด้วย)
+        expired = RiceField.objects.filter(is_active=False, updated_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'🔎 แปลงที่จะถูกลบถาวร: {expired.count():,} แปลง (ก่อน {cutoff:%Y-%m-%d})')
+            return
+
+        total = archived = 0
+        while True:
+            # ลบทีละชุดใน transaction สั้นๆ เพื่อไม่ให้ล็อกตารางนาน
+            with transaction.atomic():
+                ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                archived += SaleNotificationArchive.archive_for_fields(ids)
+                RiceField.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+            self.stdout.write(f'  ... ลบแล้ว {total:,} แปลง')
+
+        if total:
+            invalidate_api_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f'🎉 ลบแปลงในถังขยะถาวร {total:,} แปลง (ย้ายรายการที่ขายแล้วไป archive {archived:,} รายการ)'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from agriculture import earth_engine
+
+
+class Command(BaseCommand):
+    help = 'ทดสอบการเชื่อมต่อ Google Earth Engine (ใช้ตรวจ credentials ก่อน deploy)'
+
+    def handle(self, *args, **options):
+        if earth_engine.warm_up(background=False):
+            self.stdout.write(self.style.SUCCESS(f'✅ Earth Engine พร้อมใช้งาน ({earth_engine.status()["source"]})'))
+        else:
+            self.stdout.write(self.style.ERROR(f'❌ Earth Engine ไม่พร้อม: {earth_engine.status()["error"]}'))
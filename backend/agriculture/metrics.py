@@ -0,0 +1,103 @@
+import os
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, REGISTRY,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# เมื่อรันหลาย gunicorn worker ต้องตั้ง PROMETHEUS_MULTIPROC_DIR (ดู gunicorn.conf.py)
+# ค่าจะถูกเขียนลงไฟล์ของแต่ละ process แล้วรวมกันตอน scrape
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+if MULTIPROCESS:
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+REQUEST_LATENCY = Histogram(
+    'rice_request_latency_seconds', 'เวลาตอบสนองของ request แยกตาม view',
+    ['view', 'method', 'status'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EE_CALL_LATENCY = Histogram(
+    'rice_ee_call_seconds', 'เวลาของแต่ละ Earth Engine call',
+    ['call'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60),
+)
+EE_CALL_ERRORS = Counter('rice_ee_call_errors_total', 'จำนวน Earth Engine call ที่ล้มเหลว', ['call'])
+EE_CALL_RETRIES = Counter('rice_ee_call_retries_total', 'จำนวนครั้งที่ลองเรียก Earth Engine ใหม่ (โควตา/ขัดข้องชั่วคราว)', ['call'])
+EE_CIRCUIT_OPENED = Counter('rice_ee_circuit_opened_total', 'จำนวนครั้งที่ circuit breaker ของ Earth Engine เปิด')
+EE_STALE_RESULTS = Counter('rice_ee_stale_results_total', 'จำนวนครั้งที่ตอบผลประเมินเดิมแทนเพราะ circuit เปิดอยู่')
+EE_LIMITER_WAIT = Histogram(
+    'rice_ee_limiter_wait_seconds', 'เวลารอคิว (slot + token) ก่อนได้เรียก Earth Engine',
+    ['call'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+YIELD_ESTIMATIONS = Counter('rice_yield_estimations_total', 'จำนวนผลการประเมินผลผลิตที่บันทึก')
+DB_REPLICA_FALLBACKS = Counter(
+    'rice_db_replica_fallbacks_total', 'จำนวนครั้งที่ข้าม read replica (lag เกินกำหนด / ต่อไม่ได้)', ['replica', 'reason'],
+)
+RESPONSE_BYTES = Counter(
+    'rice_response_bytes_total', 'ขนาด response API ก่อน (original) และหลังบีบอัด (sent) แยกตาม encoding', ['encoding', 'stage'],
+)
+SALE_TRANSITIONS = Counter('rice_sale_transitions_total', 'จำนวนการเปลี่ยนสถานะรายการขาย', ['status'])
+
+
+class DatabaseConnectionCollector:
+    """นับ connection ของฐานข้อมูลนี้จาก pg_stat_activity ตอน scrape (ค่ารวมทั้งระบบ ไม่ต้องรวมข้าม process)"""
+
+    def collect(self):
+        gauge = GaugeMetricFamily('rice_db_connections', 'จำนวน connection ของฐานข้อมูลแยกตามสถานะ', labels=['state'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COALESCE(state, 'unknown'), count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY 1"
+            )
+            for state, count in cursor.fetchall():
+                gauge.add_metric([state], count)
+        yield gauge
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (ถ้าตั้ง METRICS_TOKEN ต้องส่ง Authorization: Bearer <token>)"""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=403)
+
+    registry = CollectorRegistry()
+    if MULTIPROCESS:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+
+    db_registry = CollectorRegistry()
+    db_registry.register(DatabaseConnectionCollector())
+    output += generate_latest(db_registry)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
+
+
+def _observe(request, response, start):
+    match = request.resolver_match
+    view = match.view_name if match else 'unmatched'
+    if view != 'metrics':
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(perf_counter() - start)
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """เก็บ latency ของทุก request ตามชื่อ view (เช่น api_stats, ricefield-list, sales-request-buy)"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = perf_counter()
+            response = await get_response(request)
+            return _observe(request, response, start)
+    else:
+        def middleware(request):
+            start = perf_counter()
+            response = get_response(request)
+            return _observe(request, response, start)
+    return middleware
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 09:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0013_alter_salenotification_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ricefield',
+            name='centroid',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, help_text='จุดกึ่งกลางแปลง (GiST index สำหรับค้นหาตามระยะทาง)', null=True, srid=4326),
+        ),
+        migrations.RunSQL(
+            sql='UPDATE agriculture_ricefield SET centroid = ST_Centroid(boundary) WHERE boundary IS NOT NULL;',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=models.Index(fields=['is_active', 'variety'], name='field_active_variety_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salenotification',
+            index=models.Index(fields=['status', 'rice_field'], name='sale_status_field_idx'),
+        ),
+    ]
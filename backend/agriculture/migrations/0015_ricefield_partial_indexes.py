@@ -0,0 +1,78 @@
+# Generated by Django 5.2.9 on 2026-10-19 13:40
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def drop_full_gist_sql(column):
+    # ชื่อ spatial index ที่ Django สร้างให้ต่างกันตามเวอร์ชัน จึงค้นจาก pg_indexes แทน
+    return f"""
+        DO $$
+        DECLARE idx text;
+        BEGIN
+            FOR idx IN SELECT indexname FROM pg_indexes
+                       WHERE tablename = 'agriculture_ricefield' AND indexdef LIKE '%USING gist ({column})'
+            LOOP
+                EXECUTE format('DROP INDEX %I', idx);
+            END LOOP;
+        END $$;
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0014_ricefield_centroid_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=drop_full_gist_sql('boundary'),
+                    reverse_sql='CREATE INDEX agriculture_ricefield_boundary_id ON agriculture_ricefield USING gist (boundary);',
+                ),
+                migrations.RunSQL(
+                    sql=drop_full_gist_sql('centroid'),
+                    reverse_sql='CREATE INDEX agriculture_ricefield_centroid_id ON agriculture_ricefield USING gist (centroid);',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ricefield',
+                    name='boundary',
+                    field=django.contrib.gis.db.models.fields.PolygonField(help_text='ขอบเขตแปลงนา (Polygon)', spatial_index=False, srid=4326),
+                ),
+                migrations.AlterField(
+                    model_name='ricefield',
+                    name='centroid',
+                    field=django.contrib.gis.db.models.fields.PointField(blank=True, help_text='จุดกึ่งกลางแปลง (GiST index สำหรับค้นหาตามระยะทาง)', null=True, spatial_index=False, srid=4326),
+                ),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='ricefield',
+            name='field_active_variety_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['owner', '-created_at'], name='field_owner_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['variety'], name='field_variety_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('is_active', True)), fields=['boundary'], name='field_boundary_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('is_active', True)), fields=['centroid'], name='field_centroid_active_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='ricefield',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['updated_at'], name='field_trash_updated_idx'),
+        ),
+    ]
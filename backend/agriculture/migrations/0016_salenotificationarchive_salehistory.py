@@ -0,0 +1,96 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+SALE_HISTORY_VIEW = """
+CREATE OR REPLACE VIEW agriculture_salehistory AS
+SELECT s.id, s.farmer_id, s.rice_field_id, s.buyer_id,
+       f.name AS field_name, f.variety AS field_variety, f.area_rai AS field_area_rai,
+       s.quantity_ton, s.price_per_ton, s.negotiated_price, s.phone, s.buyer_contact,
+       s.created_at, s.sold_at, FALSE AS archived
+FROM agriculture_salenotification s
+JOIN agriculture_ricefield f ON f.id = s.rice_field_id
+WHERE s.status = 'SOLD'
+UNION ALL
+SELECT a.id, a.farmer_id, a.rice_field_id, a.buyer_id,
+       a.field_name, a.field_variety, a.field_area_rai,
+       a.quantity_ton, a.price_per_ton, a.negotiated_price, a.phone, a.buyer_contact,
+       a.created_at, a.sold_at, TRUE AS archived
+FROM agriculture_salenotificationarchive a;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0015_ricefield_partial_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleNotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('field_name', models.CharField(max_length=100)),
+                ('field_variety', models.CharField(choices=[('KDML105', 'หอมมะลิ 105'), ('RD6', 'กข 6 (ข้าวเหนียว)'), ('RD15', 'กข 15'), ('PATHUM1', 'ปทุมธานี 1'), ('OTHER', 'อื่นๆ')], max_length=20)),
+                ('field_area_rai', models.FloatField(default=0.0)),
+                ('quantity_ton', models.FloatField()),
+                ('price_per_ton', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('negotiated_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('phone', models.CharField(max_length=20)),
+                ('buyer_contact', models.CharField(blank=True, max_length=20, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('sold_at', models.DateTimeField()),
+                ('season', models.PositiveSmallIntegerField(help_text='ปีการผลิต')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('buyer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_purchases', to=settings.AUTH_USER_MODEL)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sales', to=settings.AUTH_USER_MODEL)),
+                ('rice_field', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='agriculture.ricefield')),
+            ],
+            options={
+                'ordering': ['-sold_at'],
+                'indexes': [
+                    models.Index(fields=['farmer', '-sold_at'], name='archive_farmer_sold_idx'),
+                    models.Index(fields=['buyer', '-sold_at'], name='archive_buyer_sold_idx'),
+                    models.Index(fields=['season'], name='archive_season_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaleHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('field_name', models.CharField(max_length=100)),
+                ('field_variety', models.CharField(choices=[('KDML105', 'หอมมะลิ 105'), ('RD6', 'กข 6 (ข้าวเหนียว)'), ('RD15', 'กข 15'), ('PATHUM1', 'ปทุมธานี 1'), ('OTHER', 'อื่นๆ')], max_length=20)),
+                ('field_area_rai', models.FloatField()),
+                ('quantity_ton', models.FloatField()),
+                ('price_per_ton', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('negotiated_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('phone', models.CharField(max_length=20)),
+                ('buyer_contact', models.CharField(max_length=20, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('sold_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+                ('buyer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('rice_field', models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='agriculture.ricefield')),
+            ],
+            options={
+                'db_table': 'agriculture_salehistory',
+                'ordering': ['-sold_at'],
+                'managed': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='salenotification',
+            index=models.Index(condition=models.Q(('status', 'SOLD')), fields=['sold_at'], name='sale_sold_at_idx'),
+        ),
+        migrations.RunSQL(
+            sql=SALE_HISTORY_VIEW,
+            reverse_sql='DROP VIEW IF EXISTS agriculture_salehistory;',
+        ),
+    ]
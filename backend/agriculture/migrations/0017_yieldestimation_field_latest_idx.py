@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0016_salenotificationarchive_salehistory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='yieldestimation',
+            index=models.Index(fields=['field', '-created_at'], name='yield_field_latest_idx'),
+        ),
+        migrations.AlterField(
+            model_name='yieldestimation',
+            name='field',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='agriculture.ricefield'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0017_yieldestimation_field_latest_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarthEngineQuota',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0018_earthenginequota'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('NEW_LISTING', 'ประกาศขายใหม่'), ('BUY_REQUESTED', 'มีคำขอซื้อ'), ('SALE_APPROVED', 'คำขอซื้อได้รับการอนุมัติ'), ('SALE_REJECTED', 'คำขอซื้อถูกปฏิเสธ'), ('LARGE_SALE', 'ธุรกรรมขนาดใหญ่')], max_length=20)),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('sale_id', models.BigIntegerField(blank=True, null=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [
+                    models.Index(fields=['recipient', '-created_at'], name='notif_recipient_latest_idx'),
+                    models.Index(condition=models.Q(('is_read', False)), fields=['recipient'], name='notif_unread_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
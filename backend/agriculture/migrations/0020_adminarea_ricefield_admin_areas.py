@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-19 20:30
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0019_notification_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('PROVINCE', 'จังหวัด'), ('AMPHOE', 'อำเภอ'), ('TAMBON', 'ตำบล')], max_length=10)),
+                ('code', models.CharField(help_text='รหัสเขตการปกครอง (เช่น TH5601)', max_length=20, unique=True)),
+                ('name_th', models.CharField(max_length=100)),
+                ('name_en', models.CharField(blank=True, max_length=100)),
+                ('boundary', django.contrib.gis.db.models.fields.MultiPolygonField(help_text='ขอบเขต (GiST index)', srid=4326)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='agriculture.adminarea')),
+            ],
+            options={
+                'ordering': ['level', 'code'],
+                'indexes': [models.Index(fields=['level', 'name_th'], name='adminarea_level_name_idx')],
+            },
+        ),
+        migrations.AlterField(
+            model_name='ricefield',
+            name='district',
+            field=models.CharField(default='Phayao', help_text='ชื่ออำเภอ (ตั้งจาก amphoe อัตโนมัติเมื่อมีข้อมูลเขตการปกครอง)', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='ricefield',
+            name='province',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agriculture.adminarea'),
+        ),
+        migrations.AddField(
+            model_name='ricefield',
+            name='amphoe',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agriculture.adminarea'),
+        ),
+        migrations.AddField(
+            model_name='ricefield',
+            name='tambon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agriculture.adminarea'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-19 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# แจ้งเตือน NEW_LISTING แบบแถวต่อโรงสีเดิมถูกแทนด้วย ListingAnnouncement: ลบทิ้งแล้วนับ unread ใหม่จากแถวที่เหลือ
+DROP_FANOUT_SQL = """
+DELETE FROM agriculture_notification WHERE kind = 'NEW_LISTING';
+UPDATE agriculture_notificationcounter c
+SET unread = (SELECT count(*) FROM agriculture_notification n WHERE n.recipient_id = c.user_id AND NOT n.is_read);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0020_adminarea_ricefield_admin_areas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingAnnouncement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('sale_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='listings_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(DROP_FANOUT_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('BUY_REQUESTED', 'มีคำขอซื้อ'), ('SALE_APPROVED', 'คำขอซื้อได้รับการอนุมัติ'), ('SALE_REJECTED', 'คำขอซื้อถูกปฏิเสธ'), ('LARGE_SALE', 'ธุรกรรมขนาดใหญ่')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agriculture', '0021_listingannouncement_listings_seen_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarthEngineCircuit',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('failures', models.IntegerField(default=0)),
+                ('window_started_at', models.DateTimeField(blank=True, null=True)),
+                ('open_until', models.DateTimeField(blank=True, null=True)),
+                ('probe_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
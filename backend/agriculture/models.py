@@ -1,5 +1,39 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GistIndex
 from django.conf import settings
+from .geometry import normalize_polygon, area_rai
+
+class ActiveFieldManager(models.Manager):
+    """เฉพาะแปลงที่ยังไม่ถูกลบ (is_active=True) ให้ตรงกับ partial index ของตาราง"""
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+class AdminArea(models.Model):
+    """เขตการปกครอง (จังหวัด/อำเภอ/ตำบล) จาก shapefile (load_admin_areas) ใช้กำหนดพื้นที่ของแปลงนาอัตโนมัติ"""
+    LEVEL_CHOICES = [
+        ('PROVINCE', 'จังหวัด'),
+        ('AMPHOE', 'อำเภอ'),
+        ('TAMBON', 'ตำบล'),
+    ]
+
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    code = models.CharField(max_length=20, unique=True, help_text="รหัสเขตการปกครอง (เช่น TH5601)")
+    name_th = models.CharField(max_length=100)
+    name_en = models.CharField(max_length=100, blank=True)
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
+    boundary = models.MultiPolygonField(help_text="ขอบเขต (GiST index)")
+
+    class Meta:
+        ordering = ['level', 'code']
+        indexes = [
+            models.Index(fields=['level', 'name_th'], name='adminarea_level_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_level_display()}{self.name_th}"
+
+# คอลัมน์ที่ได้จากเขตการปกครอง (บันทึกพร้อม boundary เสมอ)
+ADMIN_AREA_FIELDS = ('province', 'amphoe', 'tambon', 'district')
 
 class RiceField(models.Model):
     # --- 1. ความสัมพันธ์และข้อมูลหลัก ---
@@ -7,9 +41,14 @@ class RiceField(models.Model):
     name = models.CharField(max_length=100, help_text="ชื่อแปลงนา")
     
     # --- 2. ข้อมูลเชิงพื้นที่ (Spatial Data) ---
-    boundary = models.PolygonField(help_text="ขอบเขตแปลงนา (Polygon)")
+    boundary = models.PolygonField(spatial_index=False, help_text="ขอบเขตแปลงนา (Polygon)")  # ใช้ partial GiST ใน Meta.indexes
     area_rai = models.FloatField(default=0.0, help_text="พื้นที่ (ไร่)")
-    district = models.CharField(max_length=100, default='Phayao', help_text="จังหวัด/อำเภอ/ตำบล")
+    district = models.CharField(max_length=100, default='Phayao', help_text="ชื่ออำเภอ (ตั้งจาก amphoe อัตโนมัติเมื่อมีข้อมูลเขตการปกครอง)")
+    # เขตการปกครองที่ครอบจุดกึ่งกลางแปลง: สรุป/กรองรายพื้นที่ด้วย FK ที่มี index แทนการ join ทาง geometry
+    province = models.ForeignKey(AdminArea, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    amphoe = models.ForeignKey(AdminArea, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    tambon = models.ForeignKey(AdminArea, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    centroid = models.PointField(null=True, blank=True, spatial_index=False, help_text="จุดกึ่งกลางแปลง (GiST index สำหรับค้นหาตามระยะทาง)")
     
     # --- 3. ข้อมูลทางการเกษตร ---
     VARIETY_CHOICES = [
@@ -26,22 +65,65 @@ class RiceField(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True) # เพิ่มเพื่อดูการแก้ไขล่าสุด
 
+    objects = models.Manager()  # รวมแปลงในถังขยะ (ใช้กับ trash/restore/force_delete)
+    active = ActiveFieldManager()
+
     class Meta:
         # Enforce unique name per owner across all records (including soft-deleted)
         constraints = [
             models.UniqueConstraint(fields=['owner', 'name'], name='unique_owner_name')
         ]
+        # แปลงในถังขยะไม่อยู่ใน index ที่ query หลักใช้ (partial index WHERE is_active)
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='field_owner_active_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['variety'], name='field_variety_active_idx', condition=models.Q(is_active=True)),
+            GistIndex(fields=['boundary'], name='field_boundary_active_gist', condition=models.Q(is_active=True)),
+            GistIndex(fields=['centroid'], name='field_centroid_active_gist', condition=models.Q(is_active=True)),
+            models.Index(fields=['updated_at'], name='field_trash_updated_idx', condition=models.Q(is_active=False)),
+        ]
         ordering = ['-created_at']
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.boundary and (update_fields is None or 'boundary' in update_fields):
+            # ทำความสะอาดรูปแปลง แล้วคำนวณค่าที่ได้จากรูปแปลงใหม่ทุกครั้งที่บันทึก boundary
+            self.boundary = normalize_polygon(self.boundary)
+            self.area_rai = area_rai(self.boundary)
+            # เก็บ centroid ไว้ล่วงหน้า เพื่อให้ค้นหาแปลงใกล้เคียงด้วย KNN (<->) บน index ได้
+            self.centroid = self.boundary.centroid
+            self.assign_admin_areas()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'centroid', 'area_rai', *ADMIN_AREA_FIELDS}
+        super().save(*args, **kwargs)
+
+    def assign_admin_areas(self):
+        """กำหนดจังหวัด/อำเภอ/ตำบลจากเขตที่ครอบจุดกึ่งกลางแปลง (query เดียว ผ่าน GiST index ของ AdminArea)"""
+        areas = {
+            area.level: area
+            for area in AdminArea.objects.filter(boundary__intersects=self.centroid).only('id', 'level', 'name_th').order_by('-code')
+        }
+        self.province = areas.get('PROVINCE')
+        self.amphoe = areas.get('AMPHOE')
+        self.tambon = areas.get('TAMBON')
+        if self.amphoe:
+            self.district = self.amphoe.name_th
+
     def __str__(self):
         return f"{self.name} - {self.owner} ({'Active' if self.is_active else 'Deleted'})"
 
 class YieldEstimation(models.Model):
-    field = models.ForeignKey(RiceField, on_delete=models.CASCADE)
+    # index ของ FK ซ้ำซ้อนกับ yield_field_latest_idx (field_id เป็นคอลัมน์แรก) จึงปิดไว้
+    field = models.ForeignKey(RiceField, on_delete=models.CASCADE, db_index=False)
     ndvi_mean = models.FloatField()
     estimated_yield_ton = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # "ผลประเมินล่าสุดของแต่ละแปลง" อ่านจาก index โดยตรง ไม่ต้อง sort ประวัติทั้งหมดของแปลง
+            models.Index(fields=['field', '-created_at'], name='yield_field_latest_idx'),
+        ]
+
 class SaleNotification(models.Model):
     STATUS_CHOICES = [
         ('OPEN', 'รอรับซื้อ'),
@@ -70,7 +152,181 @@ class SaleNotification(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['farmer', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'rice_field'], name='sale_status_field_idx'),
+            models.Index(fields=['sold_at'], name='sale_sold_at_idx', condition=models.Q(status='SOLD')),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer} - {self.status}"
+
+def sale_season(moment):
+    """ปีการผลิตของวันที่ขาย (เช่น ขาย ม.ค. 2026 ยังนับเป็นฤดู 2025 ถ้าฤดูเริ่ม พ.ค.)"""
+    return moment.year if moment.month >= settings.SALE_SEASON_START_MONTH else moment.year - 1
+
+class SaleNotificationArchive(models.Model):
+    """รายการที่ขายแล้วของฤดูที่ปิดไปแล้ว ย้ายออกจากตารางหลักด้วยคำสั่ง archive_sales"""
+    id = models.BigIntegerField(primary_key=True)  # คง id เดิมของ SaleNotification
+    farmer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_sales')
+    rice_field = models.ForeignKey(RiceField, on_delete=models.SET_NULL, null=True, blank=True)
+    buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_purchases')
+
+    # เก็บข้อมูลแปลง ณ วันที่ขายไว้ด้วย เพราะแปลงอาจถูกลบถาวรภายหลัง
+    field_name = models.CharField(max_length=100)
+    field_variety = models.CharField(max_length=20, choices=RiceField.VARIETY_CHOICES)
+    field_area_rai = models.FloatField(default=0.0)
+
+    quantity_ton = models.FloatField()
+    price_per_ton = models.DecimalField(max_digits=10, decimal_places=2)
+    negotiated_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    phone = models.CharField(max_length=20)
+    buyer_contact = models.CharField(max_length=20, blank=True, null=True)
+    created_at = models.DateTimeField()
+    sold_at = models.DateTimeField()
+
+    season = models.PositiveSmallIntegerField(help_text="ปีการผลิต")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-sold_at']
+        indexes = [
+            models.Index(fields=['farmer', '-sold_at'], name='archive_farmer_sold_idx'),
+            models.Index(fields=['buyer', '-sold_at'], name='archive_buyer_sold_idx'),
+            models.Index(fields=['season'], name='archive_season_idx'),
         ]
 
     def __str__(self):
-        return f"{self.farmer} - {self.status}"
\ No newline at end of file
+        return f"{self.farmer} - {self.season} (archived)"
+
+    @classmethod
+    def archive(cls, sales):
+        """ย้ายรายการที่ขายแล้ว (ต้อง select_related('rice_field')) ไป archive แล้วลบออกจากตารางหลัก"""
+        cls.objects.bulk_create([
+            cls(
+                id=sale.id,
+                farmer_id=sale.farmer_id,
+                rice_field_id=sale.rice_field_id,
+                buyer_id=sale.buyer_id,
+                field_name=sale.rice_field.name,
+                field_variety=sale.rice_field.variety,
+                field_area_rai=sale.rice_field.area_rai,
+                quantity_ton=sale.quantity_ton,
+                price_per_ton=sale.price_per_ton,
+                negotiated_price=sale.negotiated_price,
+                phone=sale.phone,
+                buyer_contact=sale.buyer_contact,
+                created_at=sale.created_at,
+                sold_at=sale.sold_at,
+                season=sale_season(sale.sold_at),
+            )
+            for sale in sales
+        ])
+        SaleNotification.objects.filter(pk__in=[sale.pk for sale in sales]).delete()
+
+    @classmethod
+    def archive_for_fields(cls, field_ids):
+        """ย้ายรายการที่ขายแล้วของแปลงที่จะลบถาวรไป archive (ไม่งั้นจะถูก CASCADE หายจากประวัติและยอดขาย) คืนค่าจำนวน"""
+        sold = list(
+            SaleNotification.objects.filter(rice_field_id__in=field_ids, status='SOLD')
+            .select_related('rice_field').select_for_update(of=('self',))
+        )
+        if sold:
+            cls.archive(sold)
+        return len(sold)
+
+class SaleHistory(models.Model):
+    """รายการขายแล้วทั้งหมด (ตารางหลัก + archive) ผ่าน view agriculture_salehistory (อ่านอย่างเดียว)"""
+    id = models.BigIntegerField(primary_key=True)
+    farmer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name='+')
+    rice_field = models.ForeignKey(RiceField, on_delete=models.DO_NOTHING, null=True, related_name='+')
+    buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, null=True, related_name='+')
+    field_name = models.CharField(max_length=100)
+    field_variety = models.CharField(max_length=20, choices=RiceField.VARIETY_CHOICES)
+    field_area_rai = models.FloatField()
+    quantity_ton = models.FloatField()
+    price_per_ton = models.DecimalField(max_digits=10, decimal_places=2)
+    negotiated_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    phone = models.CharField(max_length=20)
+    buyer_contact = models.CharField(max_length=20, null=True)
+    created_at = models.DateTimeField()
+    sold_at = models.DateTimeField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'agriculture_salehistory'
+        ordering = ['-sold_at']
+
+class EarthEngineQuota(models.Model):
+    """token bucket ของ Earth Engine ที่ทุก worker/process ใช้ร่วมกัน (อัปเดตด้วย SQL ใน ee_limiter)"""
+    name = models.CharField(max_length=50, primary_key=True)
+    tokens = models.FloatField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} tokens"
+
+class EarthEngineCircuit(models.Model):
+    """สถานะ circuit breaker ของ Earth Engine ที่ทุก worker/process ใช้ร่วมกัน (อัปเดตด้วย SQL ใน ee_breaker)"""
+    name = models.CharField(max_length=50, primary_key=True)
+    failures = models.IntegerField(default=0)
+    window_started_at = models.DateTimeField(null=True, blank=True)
+    open_until = models.DateTimeField(null=True, blank=True)  # NULL = closed ; เลยเวลานี้แล้ว = half-open
+    probe_until = models.DateTimeField(null=True, blank=True)  # สิทธิ์ probe ของ half-open ที่จองไว้
+
+    def __str__(self):
+        return f"{self.name}: {'open' if self.open_until else 'closed'}"
+
+class Notification(models.Model):
+    """การแจ้งเตือนถึงผู้ใช้ 1 คน สร้างตอนรายการขายเปลี่ยนสถานะ (ดู agriculture/notifications.py)"""
+    KIND_CHOICES = [
+        ('BUY_REQUESTED', 'มีคำขอซื้อ'),
+        ('SALE_APPROVED', 'คำขอซื้อได้รับการอนุมัติ'),
+        ('SALE_REJECTED', 'คำขอซื้อถูกปฏิเสธ'),
+        ('LARGE_SALE', 'ธุรกรรมขนาดใหญ่'),
+    ]
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications',
+        db_index=False,  # ใช้ index (recipient, -created_at) ด้านล่างแทน
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    title = models.CharField(max_length=100)
+    message = models.CharField(max_length=255, blank=True)
+    # เก็บแค่ id: รายการขายอาจถูกย้ายไป archive (id เดิม) โดยไม่ต้องไล่แก้แจ้งเตือน
+    sale_id = models.BigIntegerField(null=True, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_latest_idx'),
+            models.Index(fields=['recipient'], name='notif_unread_idx', condition=models.Q(is_read=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.title}"
+
+class NotificationCounter(models.Model):
+    """จำนวนแจ้งเตือนที่ยังไม่อ่าน 1 แถวต่อผู้ใช้ (ไม่รวม feed ประกาศขายของโรงสี ซึ่งนับจาก listings_seen_at)"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    unread = models.PositiveIntegerField(default=0)
+    # โรงสีเห็นประกาศขายใหม่จาก ListingAnnouncement ที่ใหม่กว่าเวลานี้ (null = ตั้งแต่สมัครสมาชิก)
+    listings_seen_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+class ListingAnnouncement(models.Model):
+    """ประกาศขายใหม่ 1 แถวต่อการประกาศ 1 ครั้ง เป็น feed ที่โรงสีทุกรายอ่านร่วมกัน (ไม่กระจายแถวต่อผู้รับ)"""
+    farmer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=100)
+    message = models.CharField(max_length=255, blank=True)
+    sale_id = models.BigIntegerField(null=True, blank=True)  # ประกาศรายการเดียว
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.farmer} - {self.message}"
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ListingAnnouncement, Notification, NotificationCounter
+
+# แจ้งเตือนถูกเขียนพร้อมการเปลี่ยนสถานะรายการขาย (transaction เดียวกัน)
+# และเพิ่มตัวนับ unread ของผู้รับในคำสั่งเดียว กระดิ่งจึงอ่านแค่แถว NotificationCounter ของตัวเอง
+# ประกาศขายใหม่ (ถึงโรงสีทุกราย) ไม่กระจายแถวต่อผู้รับ: เขียน ListingAnnouncement แถวเดียว
+# แล้วโรงสีแต่ละรายนับส่วนที่ใหม่กว่า listings_seen_at ของตัวเอง
+# ข้อยกเว้นโดยตั้งใจ: unread ของโรงสีจึงไม่ได้มาจากแถวตัวนับอย่างเดียว แต่ = ตัวนับ + COUNT ของ feed หลัง watermark
+# (range scan บน index created_at จำกัด MAX_UNSEEN_LISTINGS แถว) แลกกับการไม่ต้องเขียนตัวนับของโรงสีทุกรายต่อประกาศ
+
+# นับประกาศขายใหม่ที่ยังไม่เห็นได้ไม่เกินนี้ (กระดิ่งแสดง 9+ อยู่แล้ว ไม่ต้องนับทั้งหมด)
+MAX_UNSEEN_LISTINGS = 100
+
+# เพิ่ม unread ของผู้รับหลายคนในคำสั่งเดียว (ยังไม่มีแถว = สร้างใหม่)
+INCREMENT_SQL = """
+INSERT INTO agriculture_notificationcounter (user_id, unread)
+SELECT user_id, unread FROM unnest(%s::bigint[], %s::int[]) AS t(user_id, unread)
+ON CONFLICT (user_id) DO UPDATE SET unread = agriculture_notificationcounter.unread + EXCLUDED.unread
+"""
+
+
+def display_name(user):
+    return (user.get_full_name() or user.username) if user else 'ไม่ระบุ'
+
+
+def notify(notifications):
+    """บันทึกแจ้งเตือน (list ของ Notification ที่ยังไม่ save) และเพิ่มตัวนับของผู้รับ"""
+    if not notifications:
+        return
+    counts = {}
+    for n in notifications:
+        counts[n.recipient_id] = counts.get(n.recipient_id, 0) + 1
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+        with connection.cursor() as cursor:
+            # เรียง user_id ก่อน upsert ให้ทุก transaction ล็อกแถวตามลำดับเดียวกัน (กัน deadlock)
+            user_ids = sorted(counts)
+            cursor.execute(INCREMENT_SQL, [user_ids, [counts[pk] for pk in user_ids]])
+
+
+def notify_sale_transition(sale, status, actor):
+    """แจ้งเตือนตามการเปลี่ยนสถานะ (sale = สถานะก่อนเปลี่ยน, actor = ผู้กด)"""
+    quantity = f'{sale.quantity_ton:g} ตัน'
+    notifications = []
+    if status == 'REQUESTED':
+        notifications.append(Notification(
+            recipient_id=sale.farmer_id, kind='BUY_REQUESTED', sale_id=sale.pk,
+            title='📢 มีคนขอซื้อข้าว!', message=f'คุณ {display_name(actor)} สนใจข้าวของคุณ {quantity}',
+        ))
+    elif status == 'SOLD' and sale.buyer_id:
+        notifications.append(Notification(
+            recipient_id=sale.buyer_id, kind='SALE_APPROVED', sale_id=sale.pk,
+            title='✅ คำขอซื้อได้รับการอนุมัติ', message=f'{display_name(actor)} ตกลงขายข้าว {quantity} ให้คุณแล้ว',
+        ))
+        if sale.quantity_ton > settings.NOTIFY_LARGE_SALE_TON:
+            govt_ids = get_user_model().objects.filter(role='GOVT', is_active=True).values_list('pk', flat=True)
+            notifications += [Notification(
+                recipient_id=pk, kind='LARGE_SALE', sale_id=sale.pk,
+                title='⚠️ ธุรกรรมขนาดใหญ่', message=f'ขายข้าว {quantity} โดย {display_name(actor)}',
+            ) for pk in govt_ids]
+    elif status == 'OPEN' and sale.buyer_id:
+        notifications.append(Notification(
+            recipient_id=sale.buyer_id, kind='SALE_REJECTED', sale_id=sale.pk,
+            title='❌ คำขอซื้อถูกปฏิเสธ', message=f'{display_name(actor)} ปฏิเสธคำขอซื้อ {quantity} รายการกลับสู่ตลาดแล้ว',
+        ))
+    notify(notifications)
+
+
+def notify_new_listings(farmer, sales):
+    """ประกาศขายใหม่ลง feed ของโรงสี (1 แถวต่อการประกาศ 1 ครั้ง ไม่ขึ้นกับจำนวนโรงสี)"""
+    if not sales:
+        return
+    total = sum(sale.quantity_ton for sale in sales)
+    ListingAnnouncement.objects.create(
+        farmer=farmer, sale_id=sales[0].pk if len(sales) == 1 else None,
+        title='🌾 มีประกาศขายข้าวใหม่', message=f'{len(sales)} รายการ รวม {total:g} ตัน โดย {display_name(farmer)}',
+    )
+
+
+def listings_seen_at(user):
+    seen_at = NotificationCounter.objects.filter(pk=user.pk).values_list('listings_seen_at', flat=True).first()
+    return seen_at or user.date_joined
+
+
+def listings_for(user):
+    """feed ประกาศขายใหม่ของโรงสี (ผู้ใช้ role อื่นไม่มี)"""
+    if getattr(user, 'role', None) != 'MILLER':
+        return ListingAnnouncement.objects.none()
+    return ListingAnnouncement.objects.all()
+
+
+def unread_count(user):
+    """จำนวนที่ยังไม่อ่าน: แถวตัวนับ (primary key) + ประกาศขายหลัง watermark สำหรับโรงสี (นับไม่เกิน MAX_UNSEEN_LISTINGS)"""
+    counter = NotificationCounter.objects.filter(pk=user.pk).values_list('unread', 'listings_seen_at').first()
+    unread, seen_at = counter or (0, None)
+    if getattr(user, 'role', None) == 'MILLER':
+        # range scan บน index created_at เฉพาะส่วนที่ใหม่กว่า watermark (จำกัดจำนวน)
+        unseen = listings_for(user).filter(created_at__gt=seen_at or user.date_joined)
+        unread += unseen[:MAX_UNSEEN_LISTINGS].count()
+    return unread
+
+
+def mark_listings_seen(user):
+    """เลื่อน watermark ของ feed ประกาศขายเป็นเวลาปัจจุบัน (แถวของผู้ใช้คนเดียว ไม่ชนกับคนอื่น)"""
+    NotificationCounter.objects.update_or_create(pk=user.pk, defaults={'listings_seen_at': timezone.now()})
+
+
+def mark_read(user, ids=None):
+    """ทำเครื่องหมายว่าอ่านแล้ว (ids=None = ทั้งหมด รวม feed ประกาศขาย) คืนค่าจำนวนแจ้งเตือนที่เปลี่ยน"""
+    if ids is None:
+        mark_listings_seen(user)
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient=user, is_read=False)
+        if ids is not None:
+            unread = unread.filter(pk__in=ids)
+        # UPDATE ... WHERE is_read=false: กดพร้อมกันหลายแท็บก็ลดตัวนับตามที่เปลี่ยนจริงเท่านั้น
+        marked = unread.update(is_read=True)
+        if marked:
+            NotificationCounter.objects.filter(pk=user.pk).update(unread=Greatest(F('unread') - marked, 0))
+    return marked
@@ -0,0 +1,73 @@
+import datetime
+import decimal
+import uuid
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+# JSON ของ API ผ่าน orjson (เร็วกว่า json ของ Python หลายเท่า) และฝัง GeoJSON ที่ PostGIS ทำมาแล้วได้โดยไม่ encode ซ้ำ
+
+
+class RawJSON:
+    """ข้อความ JSON ที่ถูกต้องแล้ว (เช่นผล ST_AsGeoJSON) ให้ renderer ฝังลงไปตรงๆ (pickle ได้ จึงเก็บใน API cache ได้)"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __getstate__(self):
+        return self.text
+
+    def __setstate__(self, state):
+        self.text = state
+
+
+def _default(obj):
+    # ชนิดที่ orjson ไม่รู้จัก (เทียบเท่า rest_framework.utils.encoders.JSONEncoder)
+    if isinstance(obj, RawJSON):
+        return orjson.Fragment(obj.text)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, (set, frozenset)) or hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None  # orjson ให้ UTF-8 เสมอ
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_NON_STR_KEYS
+        # Browsable API ขอแบบจัดย่อหน้า (indent) เพื่อให้อ่านง่าย
+        if renderer_context and renderer_context.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -1,31 +1,94 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import RiceField, YieldEstimation, SaleNotification
+from .models import RiceField, YieldEstimation, SaleNotification, Notification, ListingAnnouncement
+from .instrumentation import timed
+from .renderers import RawJSON
 
-class RiceFieldSerializer(serializers.ModelSerializer):
+def validate_thai_phone(value):
+    # Allow only digits and basic length check (Thai numbers typically 9-10 digits)
+    if not value:
+        raise serializers.ValidationError('กรุณากรอกเบอร์โทรศัพท์')
+    cleaned = ''.join(ch for ch in value if ch.isdigit())
+    if len(cleaned) < 9 or len(cleaned) > 10:
+        raise serializers.ValidationError('เบอร์โทรศัพท์ไม่ถูกต้อง')
+    return value
+
+def raw_geojson(obj, annotation, field_name):
+    """GeoJSON จาก annotation ST_AsGeoJSON ฝังเป็น JSON ดิบ (queryset ที่ไม่ได้ annotate ค่อยแปลงจาก GEOS)"""
+    if hasattr(obj, annotation):
+        text = getattr(obj, annotation)
+    else:
+        geometry = getattr(obj, field_name)
+        text = geometry.json if geometry else None
+    return RawJSON(text) if text is not None else None
+
+# จับเวลา serialize เข้า Server-Timing (รวมเวลา query แบบ lazy ที่เกิดระหว่าง serialize ด้วย)
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+class TimedSerializerMixin:
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+class RiceFieldSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     variety_display = serializers.CharField(source='get_variety_display', read_only=True)
     boundary = serializers.SerializerMethodField()
+    centroid = serializers.SerializerMethodField()
     latest_yield = serializers.SerializerMethodField()
 
     class Meta:
         model = RiceField
         fields = '__all__'
+        read_only_fields = ['province', 'amphoe', 'tambon', 'district']  # คำนวณจาก boundary ตอนบันทึก
+        list_serializer_class = TimedListSerializer
 
     def get_boundary(self, obj):
-        if obj.boundary: return obj.boundary.json
-        return None
+        return raw_geojson(obj, 'boundary_geojson', 'boundary')
+
+    def get_centroid(self, obj):
+        return raw_geojson(obj, 'centroid_geojson', 'centroid')
 
     def get_latest_yield(self, obj):
+        if hasattr(obj, 'latest_ndvi'):  # annotate มาแล้ว (with_latest_yield)
+            if obj.latest_ndvi is not None:
+                return {'ndvi': obj.latest_ndvi, 'yield': obj.latest_yield_ton}
+            return None
         estimation = obj.yieldestimation_set.order_by('-created_at').first()
         if estimation:
             return {'ndvi': estimation.ndvi_mean, 'yield': estimation.estimated_yield_ton}
         return None
 
-class YieldEstimationSerializer(serializers.ModelSerializer):
+class RiceFieldCompactSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """แปลงนาแบบย่อสำหรับหน้า dashboard (ต้องมาจาก queryset ที่ annotate latest_ndvi/latest_yield_ton แล้ว)"""
+    variety_display = serializers.CharField(source='get_variety_display', read_only=True)
+    boundary = serializers.SerializerMethodField()
+    latest_yield = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RiceField
+        fields = ['id', 'name', 'variety', 'variety_display', 'area_rai', 'boundary', 'latest_yield']
+        list_serializer_class = TimedListSerializer
+
+    def get_boundary(self, obj):
+        return raw_geojson(obj, 'boundary_geojson', 'boundary')
+
+    def get_latest_yield(self, obj):
+        if obj.latest_ndvi is not None:
+            return {'ndvi': obj.latest_ndvi, 'yield': obj.latest_yield_ton}
+        return None
+
+class YieldEstimationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = YieldEstimation
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
 
-class SaleNotificationSerializer(serializers.ModelSerializer):
+class SaleNotificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # --- ข้อมูลเกษตรกร (Seller) ---
     farmer_name = serializers.CharField(source='farmer.get_full_name', read_only=True)
     farmer_phone = serializers.CharField(source='farmer.phone', read_only=True)
@@ -34,6 +97,7 @@ class SaleNotificationSerializer(serializers.ModelSerializer):
     farmer_bio = serializers.CharField(source='farmer.about_me', read_only=True)
     
     # --- ข้อมูลแปลงนา ---
+    rice_field = serializers.PrimaryKeyRelatedField(queryset=RiceField.active.all())  # ห้ามประกาศขายแปลงในถังขยะ
     field_name = serializers.CharField(source='rice_field.name', read_only=True)
     field_area = serializers.FloatField(source='rice_field.area_rai', read_only=True)
     variety_display = serializers.CharField(source='rice_field.get_variety_display', read_only=True)
@@ -52,6 +116,7 @@ class SaleNotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SaleNotification
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'status', 'created_at', 'sold_at', 'quantity_ton', 'price_per_ton', 'negotiated_price',
             'rice_field', 'field_name', 'field_area', 'field_location', 'field_lat', 'field_lng', 'variety_display',
@@ -59,27 +124,60 @@ class SaleNotificationSerializer(serializers.ModelSerializer):
             'buyer', 'buyer_name', 'buyer_phone', 'buyer_contact', 'buyer_line', 'buyer_address', 'buyer_bio'
         ]
 
+    # queryset จาก with_field_geometry() มี GeoJSON/จุดกึ่งกลางที่ PostGIS คำนวณมาแล้ว
     def get_field_location(self, obj):
+        if hasattr(obj, 'field_geojson'):
+            return RawJSON(obj.field_geojson) if obj.field_geojson is not None else None
         if obj.rice_field and obj.rice_field.boundary:
-            return obj.rice_field.boundary.json
+            return RawJSON(obj.rice_field.boundary.json)
         return None
 
     # +++ ฟังก์ชันหาจุดกึ่งกลางแปลงนา +++
     def get_field_lat(self, obj):
+        if hasattr(obj, 'field_centroid_lat'):
+            return obj.field_centroid_lat
         if obj.rice_field and obj.rice_field.boundary:
             return obj.rice_field.boundary.centroid.y
         return None
 
     def get_field_lng(self, obj):
+        if hasattr(obj, 'field_centroid_lng'):
+            return obj.field_centroid_lng
         if obj.rice_field and obj.rice_field.boundary:
             return obj.rice_field.boundary.centroid.x
         return None
 
     def validate_phone(self, value):
-        # Allow only digits and basic length check (Thai numbers typically 9-10 digits)
-        if not value:
-            raise serializers.ValidationError('กรุณากรอกเบอร์โทรศัพท์')
-        cleaned = ''.join(ch for ch in value if ch.isdigit())
-        if len(cleaned) < 9 or len(cleaned) > 10:
-            raise serializers.ValidationError('เบอร์โทรศัพท์ไม่ถูกต้อง')
-        return value
\ No newline at end of file
+        return validate_thai_phone(value)
+
+class SaleListingSerializer(serializers.Serializer):
+    """1 แถวของการประกาศขายแบบกลุ่ม (ตรวจความเป็นเจ้าของแปลงใน view ด้วย query เดียวทั้งชุด)"""
+    rice_field = serializers.IntegerField()
+    quantity_ton = serializers.FloatField(min_value=0.01)
+    price_per_ton = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    phone = serializers.CharField(max_length=20)
+
+    def validate_phone(self, value):
+        return validate_thai_phone(value)
+
+class NotificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'kind', 'title', 'message', 'sale_id', 'is_read', 'created_at']
+        list_serializer_class = TimedListSerializer
+
+class ListingAnnouncementSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """ประกาศขายใหม่ในรูปแบบเดียวกับ Notification (is_read เทียบกับ watermark ใน context['seen_at'])"""
+    kind = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ListingAnnouncement
+        fields = ['id', 'kind', 'title', 'message', 'sale_id', 'is_read', 'created_at']
+        list_serializer_class = TimedListSerializer
+
+    def get_kind(self, obj):
+        return 'NEW_LISTING'
+
+    def get_is_read(self, obj):
+        return obj.created_at <= self.context['seen_at']
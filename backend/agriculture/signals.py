@@ -0,0 +1,48 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .cache import invalidate_api_cache
+from .instrumentation import record_sql
+from .metrics import YIELD_ESTIMATIONS, SALE_TRANSITIONS
+from .models import RiceField, YieldEstimation, SaleNotification
+from .notifications import notify_new_listings
+
+# ส่งครั้งเดียวต่อการประกาศขายแบบกลุ่ม (bulk_create ไม่ส่ง post_save) : sender=SaleNotification, farmer, sales
+sale_listings_created = Signal()
+
+
+@receiver(post_save, sender=RiceField)
+@receiver(post_delete, sender=RiceField)
+@receiver(post_save, sender=YieldEstimation)
+@receiver(post_delete, sender=YieldEstimation)
+@receiver(post_save, sender=SaleNotification)
+@receiver(post_delete, sender=SaleNotification)
+def invalidate_on_write(sender, **kwargs):
+    invalidate_api_cache()
+
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    # ติดตั้งครั้งเดียวต่อ connection จับเวลา query ให้ Server-Timing (ทำงานเฉพาะ request ที่ถูกสุ่มวัด)
+    connection.execute_wrappers.append(record_sql)
+
+
+@receiver(post_save, sender=YieldEstimation)
+def count_yield_estimation(sender, created, **kwargs):
+    if created:
+        YIELD_ESTIMATIONS.inc()
+
+
+@receiver(post_save, sender=SaleNotification)
+def count_sale_listing(sender, instance, created, **kwargs):
+    # การเปลี่ยนสถานะหลังจากนี้นับใน transition_sale (ใช้ .update() จึงไม่ผ่าน post_save)
+    if created:
+        SALE_TRANSITIONS.labels(instance.status).inc()
+
+
+@receiver(sale_listings_created)
+def on_sale_listings_created(sender, farmer, sales, **kwargs):
+    invalidate_api_cache()
+    SALE_TRANSITIONS.labels('OPEN').inc(len(sales))
+    notify_new_listings(farmer, sales)
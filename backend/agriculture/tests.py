@@ -0,0 +1,483 @@
+import datetime
+import io
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, force_authenticate
+
+from . import cache as api_cache
+from . import earth_engine, ee_breaker
+from .db_routing import PIN_COOKIE, ReplicaRouter, read_replica, replica_pin_middleware
+from .models import (
+    EarthEngineCircuit, ListingAnnouncement, Notification, NotificationCounter, RiceField, SaleHistory, SaleNotification,
+    YieldEstimation, sale_season,
+)
+from .notifications import mark_listings_seen, mark_read, notify, unread_count
+
+User = get_user_model()
+
+
+def square(lng, lat, size=0.001):
+    return Polygon(((lng, lat), (lng + size, lat), (lng + size, lat + size), (lng, lat + size), (lng, lat)), srid=4326)
+
+
+def run_concurrently(calls):
+    """เรียกทุกฟังก์ชันพร้อมกันคนละ thread (ปล่อยพร้อมกันด้วย Barrier) คืนค่าผลลัพธ์ตามลำดับ"""
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(index, call):
+        try:
+            barrier.wait()
+            results[index] = call()
+        finally:
+            connection.close()  # แต่ละ thread มี connection ของตัวเอง
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def post_as(user, url, data=None):
+    def call():
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(url, data or {}, format='json').status_code
+    return call
+
+
+class SaleTransitionRaceTests(TransactionTestCase):
+    """การเปลี่ยนสถานะรายการขายพร้อมกันหลาย request ต้องมีผู้ชนะคนเดียว (UPDATE ... WHERE status=...)"""
+    CONCURRENCY = 8
+
+    def setUp(self):
+        self.farmer = User.objects.create_user('farmer', password='x', role='FARMER', phone='0812345678')
+        self.millers = [
+            User.objects.create_user(f'miller{i}', password='x', role='MILLER', phone=f'08900000{i:02d}')
+            for i in range(self.CONCURRENCY)
+        ]
+        field = RiceField.objects.create(
+            owner=self.farmer, name='แปลงทดสอบ',
+            boundary=Polygon(((99.90, 19.16), (99.91, 19.16), (99.91, 19.17), (99.90, 19.17), (99.90, 19.16)), srid=4326),
+        )
+        self.sale = SaleNotification.objects.create(
+            farmer=self.farmer, rice_field=field, quantity_ton=10, price_per_ton=9000, phone='0812345678',
+        )
+
+    def test_concurrent_request_buy_has_single_winner(self):
+        url = f'/api/sales/{self.sale.pk}/request_buy/'
+        codes = run_concurrently([post_as(miller, url, {'contact': miller.phone}) for miller in self.millers])
+
+        self.assertEqual(codes.count(200), 1, codes)
+        self.assertEqual(codes.count(409), self.CONCURRENCY - 1, codes)
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.status, 'REQUESTED')
+        winner = self.millers[codes.index(200)]
+        self.assertEqual(self.sale.buyer_id, winner.pk)
+        self.assertEqual(self.sale.buyer_contact, winner.phone)
+
+    def test_concurrent_approve_and_reject_has_single_winner(self):
+        buyer = self.millers[0]
+        SaleNotification.objects.filter(pk=self.sale.pk).update(
+            status='REQUESTED', buyer=buyer, buyer_contact=buyer.phone,
+        )
+        approve = post_as(self.farmer, f'/api/sales/{self.sale.pk}/approve_sell/')
+        reject = post_as(self.farmer, f'/api/sales/{self.sale.pk}/reject_sell/')
+        calls = [approve, reject] * (self.CONCURRENCY // 2)
+        codes = run_concurrently(calls)
+
+        self.assertEqual(codes.count(200), 1, codes)
+        self.assertEqual(codes.count(409), len(calls) - 1, codes)
+        self.sale.refresh_from_db()
+        if calls[codes.index(200)] is approve:
+            self.assertEqual(self.sale.status, 'SOLD')
+            self.assertEqual(self.sale.buyer_id, buyer.pk)
+            self.assertIsNotNone(self.sale.sold_at)
+        else:
+            self.assertEqual(self.sale.status, 'OPEN')
+            self.assertIsNone(self.sale.buyer_id)
+            self.assertIsNone(self.sale.sold_at)
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG_SECONDS=5, REPLICA_LAG_CHECK_INTERVAL=2, REPLICA_PIN_SECONDS=10,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replica-tests'}},
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """การเลือก replica ตาม lag / การเขียน / cookie pin (ไม่ต่อฐานข้อมูลจริง: จำลอง lag)"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        lag = mock.patch('agriculture.db_routing.replica_lag', return_value=0.5)
+        self.replica_lag = lag.start()
+        self.addCleanup(lag.stop)
+
+    def read_alias(self, request, write_first=False):
+        @read_replica
+        def view(request):
+            if write_first:
+                self.router.db_for_write(RiceField)
+            return self.router.db_for_read(RiceField)
+        return view(request)
+
+    def test_reads_outside_decorated_views_use_primary(self):
+        self.assertEqual(self.router.db_for_read(RiceField), 'default')
+
+    def test_get_reads_from_healthy_replica(self):
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'replica1')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.replica_lag.return_value = 30
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.replica_lag.return_value = None
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+
+    def test_reads_after_write_in_same_request_use_primary(self):
+        self.assertEqual(self.read_alias(self.factory.get('/'), write_first=True), 'default')
+
+    def test_unsafe_method_uses_primary(self):
+        self.assertEqual(self.read_alias(self.factory.post('/')), 'default')
+
+    def test_pin_cookie_uses_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_alias(request), 'default')
+        self.replica_lag.assert_not_called()
+
+    def test_write_request_sets_pin_cookie(self):
+        middleware = replica_pin_middleware(lambda request: HttpResponse())
+        self.assertIn(PIN_COOKIE, middleware(self.factory.post('/')).cookies)
+        self.assertNotIn(PIN_COOKIE, middleware(self.factory.get('/')).cookies)
+
+    @override_settings(API_CACHE_TIMEOUT=30)
+    def test_replica_response_does_not_refill_cache_right_after_invalidation(self):
+        user = mock.Mock(is_authenticated=True, is_superuser=True, pk=1)
+        served = []
+
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        @read_replica
+        @api_cache.cache_per_scope('test-replica')
+        def view(request):
+            served.append(self.router.db_for_read(RiceField))
+            return Response({'n': len(served)})
+
+        def get():
+            request = self.factory.get('/')
+            force_authenticate(request, user)
+            return view(request).data
+
+        cache.clear()
+        api_cache.bump_generation()
+        self.assertEqual(get(), {'n': 1})
+        self.assertEqual(get(), {'n': 2})  # ยังอยู่ในช่วง lag: ไม่ cache ข้อมูลจาก replica
+        self.assertEqual(served, ['replica1', 'replica1'])
+
+        cache.set(api_cache.INVALIDATED_AT_KEY, time.time() - 60, None)
+        self.assertEqual(get(), {'n': 3})
+        self.assertEqual(get(), {'n': 3})  # พ้นช่วง lag แล้ว cache ได้ตามปกติ
+
+
+class NearbySalesOrderingTests(TransactionTestCase):
+    """/api/sales/nearby/ เรียงตามระยะจริง แม้ลำดับตามระยะบนระนาบ (<->) จะต่างกัน"""
+
+    def setUp(self):
+        farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        self.miller = User.objects.create_user('miller', password='x', role='MILLER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.miller)
+        # ที่ละติจูด 60 ลองจิจูด 1 องศายาวราวครึ่งหนึ่งของละติจูด 1 องศา
+        # แปลงทางเหนือใกล้กว่าบนระนาบ แต่แปลงทางตะวันออก (1.9 องศา) ใกล้กว่าจริง
+        self.sales = {}
+        for name, (dlng, dlat) in {'east': (1.9, 0), 'north1': (0, 1.0), 'north2': (0, 1.1), 'north3': (0, 1.2)}.items():
+            field = RiceField.objects.create(owner=farmer, name=name, boundary=square(dlng, 60 + dlat))
+            self.sales[name] = SaleNotification.objects.create(
+                farmer=farmer, rice_field=field, quantity_ton=5, price_per_ton=9000, phone='0812345678',
+            )
+
+    def nearby(self, limit):
+        response = self.client.get('/api/sales/nearby/', {'lng': 0, 'lat': 60, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_results_sorted_by_true_distance(self):
+        data = self.nearby(4)
+        distances = [item['distance_km'] for item in data]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(data[0]['id'], self.sales['east'].pk)
+
+    def test_true_nearest_found_beyond_planar_top_candidates(self):
+        # limit=1 ดึงผู้สมัคร 2 แถวแรกตามระนาบ (ทางเหนือทั้งคู่) ต้องขยายชุดจนเจอแปลงทางตะวันออก
+        self.assertEqual([item['id'] for item in self.nearby(1)], [self.sales['east'].pk])
+
+
+class CacheInvalidationTests(TransactionTestCase):
+    """การเขียนหลายแถวใน transaction เดียวล้าง API cache แค่ครั้งเดียวหลัง commit"""
+
+    def setUp(self):
+        patcher = mock.patch.object(api_cache, 'bump_generation')
+        self.bump = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bulk_delete_bumps_once(self):
+        farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        for i in range(5):
+            RiceField.objects.create(owner=farmer, name=f'แปลง {i}', boundary=square(99.9 + i * 0.01, 19.1))
+        self.bump.reset_mock()
+
+        RiceField.objects.filter(owner=farmer).delete()  # post_delete ทีละแถวใน transaction ของ Collector
+        self.assertEqual(self.bump.call_count, 1)
+
+    def test_each_transaction_bumps_once_and_rollback_discards(self):
+        with transaction.atomic():
+            api_cache.invalidate_api_cache()
+            api_cache.invalidate_api_cache()
+        self.assertEqual(self.bump.call_count, 1)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            api_cache.invalidate_api_cache()
+            raise RuntimeError
+        self.assertEqual(self.bump.call_count, 1)
+
+        with transaction.atomic():
+            api_cache.invalidate_api_cache()
+        self.assertEqual(self.bump.call_count, 2)
+
+
+class BulkForceDeleteTests(TestCase):
+    """ลบถาวรหลายแปลงจากถังขยะแล้ว รายการที่ขายแล้วต้องยังอยู่ในประวัติ (SaleHistory)"""
+
+    def test_sold_sales_survive_bulk_force_delete(self):
+        farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        fields = [
+            RiceField.objects.create(owner=farmer, name=f'แปลง {i}', boundary=square(99.9 + i * 0.01, 19.1), is_active=False)
+            for i in range(2)
+        ]
+        sold = [
+            SaleNotification.objects.create(
+                farmer=farmer, rice_field=field, quantity_ton=5, price_per_ton=9000, phone='0812345678',
+                status='SOLD', sold_at=timezone.now(),
+            )
+            for field in fields
+        ]
+        SaleNotification.objects.create(
+            farmer=farmer, rice_field=fields[0], quantity_ton=3, price_per_ton=9000, phone='0812345678',
+        )
+        client = APIClient()
+        client.force_authenticate(farmer)
+
+        response = client.post('/api/rice-fields/bulk_force_delete/', {'ids': [f.pk for f in fields]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertFalse(RiceField.objects.filter(pk__in=[f.pk for f in fields]).exists())
+        self.assertFalse(SaleNotification.objects.exists())  # รายการที่ยังไม่ขายลบตามแปลง
+        history = SaleHistory.objects.filter(pk__in=[s.pk for s in sold])
+        self.assertEqual(sorted(history.values_list('field_name', flat=True)), ['แปลง 0', 'แปลง 1'])
+        self.assertTrue(all(history.values_list('archived', flat=True)))
+
+
+class PruneYieldEstimationsTests(TestCase):
+    """prune_yield_estimations เหลือรายการล่าสุดต่อแปลงในแต่ละวัน/สัปดาห์/ฤดู"""
+
+    def setUp(self):
+        farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        self.fields = [
+            RiceField.objects.create(owner=farmer, name=f'แปลง {i}', boundary=square(99.9 + i * 0.01, 19.1))
+            for i in range(2)
+        ]
+
+    def estimate(self, field, at):
+        estimation = YieldEstimation.objects.create(field=field, ndvi_mean=0.5, estimated_yield_ton=3)
+        YieldEstimation.objects.filter(pk=estimation.pk).update(created_at=at)  # created_at เป็น auto_now_add
+        return estimation.pk
+
+    def at(self, day, hour):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour)))
+
+    def test_latest_per_tier_survives(self):
+        now = timezone.now()
+        today = timezone.localdate()
+        monday = today - datetime.timedelta(days=30 + today.weekday())
+        season = sale_season(now) - 2
+        season_start = datetime.date(season, settings.SALE_SEASON_START_MONTH, 1)
+        kept, pruned = [], []
+        for field in self.fields:
+            # ช่วงเก็บทั้งหมด (< 1 วัน)
+            kept += [self.estimate(field, now - datetime.timedelta(hours=2)), self.estimate(field, now - datetime.timedelta(hours=1))]
+            # รายวัน: วันเดียวกันเหลือรายการหลังสุด
+            pruned.append(self.estimate(field, self.at(today - datetime.timedelta(days=3), 8)))
+            kept.append(self.estimate(field, self.at(today - datetime.timedelta(days=3), 16)))
+            kept.append(self.estimate(field, self.at(today - datetime.timedelta(days=4), 8)))
+            # รายสัปดาห์: จันทร์กับพุธสัปดาห์เดียวกันเหลือพุธ
+            pruned.append(self.estimate(field, self.at(monday, 10)))
+            kept.append(self.estimate(field, self.at(monday + datetime.timedelta(days=2), 10)))
+            # รายฤดู: เหลือรายการหลังสุดของฤดู
+            pruned.append(self.estimate(field, self.at(season_start + datetime.timedelta(days=10), 10)))
+            pruned.append(self.estimate(field, self.at(season_start + datetime.timedelta(days=15), 10)))
+            kept.append(self.estimate(field, self.at(season_start + datetime.timedelta(days=20), 10)))
+
+        call_command(
+            'prune_yield_estimations', keep_all_days=1, daily_days=10, weekly_days=60,
+            batch_size=2, fields_per_batch=1, stdout=io.StringIO(),
+        )
+
+        self.assertEqual(sorted(YieldEstimation.objects.values_list('pk', flat=True)), sorted(kept))
+
+
+@override_settings(EE_BREAKER_THRESHOLD=2, EE_BREAKER_WINDOW=60, EE_BREAKER_COOLDOWN=30)
+class EarthEngineBreakerTests(TestCase):
+    """circuit breaker closed -> open -> half-open -> closed/open และการตอบผลเดิมตอน open"""
+
+    def setUp(self):
+        patcher = mock.patch.object(ee_breaker, '_seeded', False)  # แถวสถานะถูก rollback ทุก test
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_circuit(self):
+        ee_breaker.record_failure()
+        ee_breaker.record_failure()
+
+    def end_cooldown(self):
+        EarthEngineCircuit.objects.update(open_until=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_opens_after_threshold_within_window(self):
+        ee_breaker.record_failure()
+        self.assertEqual(ee_breaker.state(), {'state': 'closed', 'failures': 1})
+        self.assertTrue(ee_breaker.allow_request())
+
+        ee_breaker.record_failure()
+        self.assertEqual(ee_breaker.state()['state'], 'open')
+        self.assertFalse(ee_breaker.allow_request())
+
+    def test_failures_outside_window_start_over(self):
+        ee_breaker.record_failure()
+        EarthEngineCircuit.objects.update(window_started_at=timezone.now() - datetime.timedelta(seconds=61))
+        ee_breaker.record_failure()
+        self.assertEqual(ee_breaker.state(), {'state': 'closed', 'failures': 1})
+
+    def test_half_open_allows_one_probe_and_success_closes(self):
+        self.open_circuit()
+        self.end_cooldown()
+        self.assertEqual(ee_breaker.state(), {'state': 'half-open'})
+        self.assertTrue(ee_breaker.allow_request())
+        self.assertFalse(ee_breaker.allow_request())  # probe ค้างอยู่
+
+        ee_breaker.record_success()
+        self.assertEqual(ee_breaker.state(), {'state': 'closed', 'failures': 0})
+        self.assertTrue(ee_breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        self.open_circuit()
+        self.end_cooldown()
+        self.assertTrue(ee_breaker.allow_request())
+
+        ee_breaker.record_failure()
+        self.assertEqual(ee_breaker.state()['state'], 'open')
+        self.assertFalse(ee_breaker.allow_request())
+
+    def test_released_probe_goes_to_next_request(self):
+        self.open_circuit()
+        self.end_cooldown()
+        self.assertTrue(ee_breaker.allow_request())
+        ee_breaker.release_probe()
+        self.assertTrue(ee_breaker.allow_request())
+
+    def test_open_circuit_serves_last_estimation(self):
+        farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        field, empty = [
+            RiceField.objects.create(owner=farmer, name=f'แปลง {i}', boundary=square(99.9 + i * 0.01, 19.1))
+            for i in range(2)
+        ]
+        YieldEstimation.objects.create(field=field, ndvi_mean=0.6, estimated_yield_ton=4.2)
+        self.open_circuit()
+        client = APIClient()
+        client.force_authenticate(farmer)
+
+        with mock.patch.object(earth_engine, 'initialize', return_value=True):
+            response = client.post(f'/api/rice-fields/{field.pk}/calculate_yield/')
+            missing = client.post(f'/api/rice-fields/{empty.pk}/calculate_yield/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['stale'])
+        self.assertEqual(data['yield_ton'], 4.2)
+        self.assertIsNone(data['ndbi'])
+        self.assertEqual(missing.status_code, 503)  # ไม่มีผลเดิมให้ตอบแทน
+
+
+class NotificationCounterTests(TestCase):
+    """ตัวนับ unread ต่อผู้ใช้ และ watermark ของ feed ประกาศขายสำหรับโรงสี"""
+
+    def setUp(self):
+        self.farmer = User.objects.create_user('farmer', password='x', role='FARMER')
+        self.miller = User.objects.create_user('miller', password='x', role='MILLER')
+
+    def notification(self, user):
+        return Notification(recipient=user, kind='BUY_REQUESTED', title='📢 มีคนขอซื้อข้าว!')
+
+    def counter(self, user):
+        return NotificationCounter.objects.get(pk=user.pk).unread
+
+    def announce(self):
+        return ListingAnnouncement.objects.create(farmer=self.farmer, title='🌾 มีประกาศขายข้าวใหม่')
+
+    def test_notify_upserts_counter_per_recipient(self):
+        notify([self.notification(self.farmer), self.notification(self.farmer), self.notification(self.miller)])
+        self.assertEqual((self.counter(self.farmer), self.counter(self.miller)), (2, 1))
+
+        notify([self.notification(self.farmer)])
+        self.assertEqual(self.counter(self.farmer), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.farmer, is_read=False).count(), 3)
+
+    def test_mark_read_only_counts_changed_rows(self):
+        notify([self.notification(self.farmer) for _ in range(3)])
+        first = Notification.objects.filter(recipient=self.farmer).values_list('pk', flat=True)[0]
+
+        self.assertEqual(mark_read(self.farmer, [first]), 1)
+        self.assertEqual(mark_read(self.farmer, [first]), 0)  # อ่านซ้ำไม่ลดตัวนับอีก
+        self.assertEqual(unread_count(self.farmer), 2)
+
+        self.assertEqual(mark_read(self.farmer), 2)
+        self.assertEqual(unread_count(self.farmer), 0)
+        self.assertEqual(self.counter(self.farmer), 0)
+
+    def test_listing_feed_counts_after_watermark(self):
+        self.announce()
+        self.assertEqual(unread_count(self.miller), 1)
+        self.assertEqual(unread_count(self.farmer), 0)  # feed มีเฉพาะโรงสี
+
+        mark_listings_seen(self.miller)
+        self.assertEqual(unread_count(self.miller), 0)
+
+        self.announce()
+        notify([self.notification(self.miller)])
+        self.assertEqual(unread_count(self.miller), 2)
+
+        mark_read(self.miller)  # อ่านทั้งหมด = เลื่อน watermark ด้วย
+        self.assertEqual(unread_count(self.miller), 0)
+
+    def test_unseen_listings_count_is_capped(self):
+        for _ in range(3):
+            self.announce()
+        with mock.patch('agriculture.notifications.MAX_UNSEEN_LISTINGS', 2):
+            self.assertEqual(unread_count(self.miller), 2)
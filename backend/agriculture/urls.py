@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views, metrics
 
 router = DefaultRouter()
 router.register(r'rice-fields', views.RiceFieldViewSet, basename='ricefield')
 router.register(r'sales', views.SaleNotificationViewSet, basename='sales')
+router.register(r'notifications', views.NotificationViewSet, basename='notifications')
 
 urlpatterns = [
     path('dashboard/', views.dashboard_redirect, name='dashboard_router'),
@@ -13,5 +14,11 @@ urlpatterns = [
     path('govt/stats/', views.govt_stats, name='govt_stats'),
     path('history/', views.history_view, name='history'),
     path('api/stats/', views.dashboard_stats, name='api_stats'),
+    path('api/bootstrap/', views.bootstrap, name='api_bootstrap'),
+    path('api/map/aggregate/', views.map_aggregate, name='api_map_aggregate'),
+    path('api/health/', views.health_check, name='api_health'),
+    path('metrics', metrics.metrics_view, name='metrics'),
+    path('api/rice-fields/<int:pk>/calculate_yield_async/', async_views.calculate_yield, name='calculate_yield_async'),
+    path('api/rice-fields/calculate_yield_batch/', async_views.calculate_yield_batch, name='calculate_yield_batch'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
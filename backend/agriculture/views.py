@@ -1,22 +1,36 @@
-import os
 import json
-import datetime
-import ee
-from google.oauth2 import service_account
-import logging
+import math
+from contextlib import contextmanager
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.contrib.gis.geos import GEOSGeometry
-from django.db.models import Sum, Count, Q
+from django.contrib.gis.geos import GEOSGeometry, Point, Polygon
+from django.contrib.gis.db.models.functions import AsGeoJSON, Centroid, Distance, GeoFunc, SnapToGrid
+from django.db.models import Sum, Count, Avg, Q, F, Func, Case, When, Exists, OuterRef, Subquery, FloatField
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 from django.conf import settings
+from django.db import connection, connections, router, transaction
+from django.http import JsonResponse
 from rest_framework.pagination import PageNumberPagination
-from .models import RiceField, YieldEstimation, SaleNotification
-from .serializers import RiceFieldSerializer, YieldEstimationSerializer, SaleNotificationSerializer
+from .models import RiceField, YieldEstimation, SaleNotification, SaleNotificationArchive, SaleHistory, Notification
+from .serializers import (
+    RiceFieldSerializer, RiceFieldCompactSerializer, YieldEstimationSerializer, SaleNotificationSerializer,
+    SaleListingSerializer, NotificationSerializer, ListingAnnouncementSerializer,
+)
+from .signals import sale_listings_created
 from .decorators import farmer_required, miller_required, govt_required, not_govt_required
+from .cache import cache_per_scope, invalidate_api_cache
+from .db_routing import read_replica, replica_status
+from .notifications import (
+    notify_sale_transition, notify_new_listings, unread_count, mark_read, mark_listings_seen,
+    listings_for, listings_seen_at,
+)
+from . import earth_engine
+from .metrics import SALE_TRANSITIONS, EE_STALE_RESULTS
 
 # Pagination for API responses
 class StandardPagination(PageNumberPagination):
@@ -24,27 +38,91 @@ class StandardPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-# --- GEE Init ---
-EE_INITIALIZED = False
-try:
-    KEY_PATH = os.path.join(settings.BASE_DIR, 'gee-key.json')
-    if os.path.exists(KEY_PATH):
-        SCOPES = ['https://www.googleapis.com/auth/earthengine']
-        credentials = service_account.Credentials.from_service_account_file(KEY_PATH, scopes=SCOPES)
-        ee.Initialize(credentials=credentials)
-        EE_INITIALIZED = True
-        logging.info('Google Earth Engine initialized using service account key.')
-    else:
-        try:
-            ee.Initialize()
-            EE_INITIALIZED = True
-            logging.info('Google Earth Engine initialized using default credentials.')
-        except Exception as inner_e:
-            logging.warning('GEE default initialization failed: %s', inner_e)
-            EE_INITIALIZED = False
-except Exception as e:
-    logging.error('GEE Init Error: %s', e)
-    EE_INITIALIZED = False
+# จำนวนแปลงสูงสุดต่อคำสั่ง bulk 1 ครั้ง
+MAX_BULK_IDS = 1000
+
+# แผนที่ภาพรวม: แบ่ง 1 tile (360/2^zoom องศา) เป็นกี่ช่องกริดต่อด้าน
+MAP_GRID_DIVISIONS = 8
+
+# จำนวนทศนิยมของพิกัดใน GeoJSON ที่ส่งออก (6 ตำแหน่ง ≈ 11 ซม. เท่ากับที่ปัดตอนบันทึก)
+GEOJSON_PRECISION = 6
+
+# ระยะ 1 องศาละติจูดบนทรงกลมที่ ST_DistanceSphere ใช้ (รัศมี 6370986 ม.) เผื่อคลาดเคลื่อน 1%
+METERS_PER_DEGREE = 6370986 * math.pi / 180 * 0.99
+# ดึงผู้สมัคร KNN เพิ่มได้สูงสุดกี่เท่าของ limit ก่อนยอมตอบแบบประมาณ
+NEARBY_MAX_OVERFETCH = 16
+
+def min_sphere_distance_m(planar_deg, lat):
+    """ระยะจริงต่ำสุด (เมตร) ของจุดที่อยู่ห่างบนระนาบ (องศา) อย่างน้อย planar_deg จากจุดที่ละติจูด lat
+
+    ลองจิจูด 1 องศายาว cos(ละติจูด) เท่าของละติจูด 1 องศา จุดที่ไกลกว่าบนระนาบจึงใกล้กว่าจริงได้ไม่เกินอัตรานี้
+    """
+    worst_lat = min(abs(lat) + planar_deg, 89.0)
+    return planar_deg * METERS_PER_DEGREE * math.cos(math.radians(worst_lat))
+
+# KNN operator ของ PostGIS (<->) ใช้ GiST index เรียงตามระยะทางได้โดยตรง ไม่ต้องคำนวณทุกแถว
+class KNNDistance(GeoFunc):
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    geom_param_pos = (0, 1)
+    output_field = FloatField()
+
+# --- Querysets ที่ใช้ร่วมกันระหว่าง ViewSet และ /api/bootstrap/ ---
+def fields_for(user):
+    """แปลงนาที่ผู้ใช้เห็นได้: GOVT/superuser เห็นทั้งหมด เกษตรกรเห็นเฉพาะของตัวเอง (ไม่รวมถังขยะ)"""
+    if not user.is_authenticated:
+        return RiceField.objects.none()
+    if user.is_superuser or getattr(user, 'role', 'FARMER') == 'GOVT':
+        return RiceField.active.order_by('-created_at')
+    return RiceField.active.filter(owner=user).order_by('-created_at')
+
+def sales_for(user):
+    """รายการขายที่ผู้ใช้เห็นได้ตาม role"""
+    if not user.is_authenticated:
+        return SaleNotification.objects.none()
+    role = getattr(user, 'role', 'FARMER')
+    if user.is_superuser or role == 'GOVT':
+        return SaleNotification.objects.all().order_by('-created_at')
+    if role == 'FARMER':
+        return SaleNotification.objects.filter(farmer=user).order_by('-created_at')
+    return SaleNotification.objects.filter(Q(status='OPEN') | Q(buyer=user) | Q(status='SOLD')).order_by('-created_at')
+
+def with_latest_yield(fields):
+    """แนบผลประเมินล่าสุดของแต่ละแปลงเป็น subquery แทนการ query ทีละแปลงตอน serialize"""
+    latest = YieldEstimation.objects.filter(field=OuterRef('pk')).order_by('-created_at')
+    return fields.annotate(
+        latest_ndvi=Subquery(latest.values('ndvi_mean')[:1]),
+        latest_yield_ton=Subquery(latest.values('estimated_yield_ton')[:1]),
+    )
+
+def with_geojson(fields):
+    """ให้ PostGIS ทำ GeoJSON ของแปลงมาเลย (ไม่ต้องสร้าง GEOS แล้ว .json ทีละแถว) และไม่โหลด geometry ดิบ"""
+    return fields.annotate(
+        boundary_geojson=AsGeoJSON('boundary', precision=GEOJSON_PRECISION),
+        centroid_geojson=AsGeoJSON('centroid', precision=GEOJSON_PRECISION),
+    ).defer('boundary', 'centroid')
+
+def with_field_geometry(sales):
+    """GeoJSON และจุดกึ่งกลางของแปลงที่ประกาศขาย คำนวณใน PostGIS (คู่กับ SaleNotificationSerializer)"""
+    center = Centroid('rice_field__boundary')
+    return sales.select_related('farmer', 'buyer', 'rice_field').annotate(
+        field_geojson=AsGeoJSON('rice_field__boundary', precision=GEOJSON_PRECISION),
+        field_centroid_lng=Func(center, function='ST_X', output_field=FloatField()),
+        field_centroid_lat=Func(center, function='ST_Y', output_field=FloatField()),
+    ).defer('rice_field__boundary', 'rice_field__centroid')
+
+@contextmanager
+def snapshot():
+    """อ่านหลาย query จาก snapshot เดียวกัน (REPEATABLE READ, read-only) ตัวเลขทุกส่วนจึงตรงกัน"""
+    using = router.db_for_read(RiceField)  # replica เดียวกับที่ query ข้างในจะถูกส่งไป
+    conn = connections[using]
+    nested = conn.in_atomic_block
+    with transaction.atomic(using=using):
+        # SET TRANSACTION ต้องเป็นคำสั่งแรกของ transaction จึงข้ามเมื่ออยู่ใน atomic อื่นแล้ว
+        if not nested and conn.vendor == 'postgresql':
+            with conn.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        yield
 
 # --- Views & Dashboard ---
 @login_required
@@ -69,62 +147,160 @@ def miller_dashboard(request): return render(request, 'agriculture/miller_dashbo
 def govt_dashboard(request): return render(request, 'agriculture/govt_dashboard.html')
 
 # --- API ---
-@api_view(['GET'])
-@login_required
-def dashboard_stats(request):
+def compute_stats():
+    """สถิติภาพรวมของระบบ (ใช้ทั้ง /api/stats/ และ /api/bootstrap/)"""
     # 1. ข้อมูลพื้นฐานแปลงนา
-    all_fields = RiceField.objects.filter(is_active=True)
+    all_fields = RiceField.active.all()
     total_fields = all_fields.count()
     total_area = all_fields.aggregate(Sum('area_rai'))['area_rai__sum'] or 0
     total_farmers = all_fields.values('owner').distinct().count()
     
     # 2. คำนวณยอดเงิน และ ปริมาณผลผลิต (จากรายการขายจริง ไม่ใช่ดาวเทียม)
-    sales = SaleNotification.objects.all()
-    
-    total_yield = 0      # เก็บปริมาณตันรวม
-    sold_value = 0       # มูลค่าขายแล้ว
-    pending_value = 0    # มูลค่ารอขาย
-
-    for s in sales:
-        val = s.quantity_ton * float(s.price_per_ton)
-        
-        if s.status == 'SOLD': 
-            sold_value += val
-        elif s.status in ['OPEN', 'REQUESTED']: 
-            pending_value += val
-            
-        # นับรวมทุกสถานะที่เป็น active supply
-        if s.status in ['SOLD', 'OPEN', 'REQUESTED']:
-            total_yield += s.quantity_ton
+    # รายการขายแล้วนับจาก SaleHistory (ตารางหลัก + archive ของฤดูก่อนๆ)
+    sale_value = Sum(F('quantity_ton') * Cast('price_per_ton', FloatField()))
+    sold = SaleHistory.objects.aggregate(value=sale_value, qty=Sum('quantity_ton'))
+    pending = SaleNotification.objects.filter(status__in=['OPEN', 'REQUESTED']).aggregate(
+        value=sale_value, qty=Sum('quantity_ton')
+    )
+
+    sold_value = sold['value'] or 0        # มูลค่าขายแล้ว
+    pending_value = pending['value'] or 0  # มูลค่ารอขาย
+    # นับรวมทุกสถานะที่เป็น active supply
+    total_yield = (sold['qty'] or 0) + (pending['qty'] or 0)
 
     # 3. เตรียมข้อมูลกราฟ
-    variety_data = RiceField.objects.values('variety').annotate(total=Count('variety'))
+    variety_data = all_fields.values('variety').annotate(total=Count('variety'))
     variety_dict = dict(RiceField.VARIETY_CHOICES)
     v_labels = [variety_dict.get(item['variety'], item['variety']) for item in variety_data]
     v_data = [item['total'] for item in variety_data]
+    # สรุปรายอำเภอจาก FK ที่กำหนดตอนบันทึก (แปลงนอกเขตที่นำเข้าใช้ชื่อ district เดิม)
+    district_data = (
+        all_fields.annotate(area_name=Coalesce('amphoe__name_th', 'district'))
+        .values('area_name').annotate(total=Count('id'), area=Sum('area_rai')).order_by('-area')
+    )
 
-    return Response({
+    return {
         'total_fields': total_fields,
         'total_area': round(total_area, 2),
         'total_farmers': total_farmers,
         'total_yield': round(total_yield, 2),
         'sold_value': sold_value,
         'pending_value': pending_value,
-        'charts': {'variety': {'labels': v_labels, 'data': v_data}}
+        'charts': {
+            'variety': {'labels': v_labels, 'data': v_data},
+            'district': {
+                'labels': [item['area_name'] for item in district_data],
+                'data': [item['total'] for item in district_data],
+                'area': [round(item['area'] or 0, 2) for item in district_data],
+            },
+        }
+    }
+
+@api_view(['GET'])
+@login_required
+@read_replica
+@cache_per_scope('stats')
+def dashboard_stats(request):
+    return Response(compute_stats())
+
+@api_view(['GET'])
+@login_required
+@read_replica
+@cache_per_scope('bootstrap')
+def bootstrap(request):
+    """ข้อมูลตั้งต้นของหน้า dashboard (แปลงนา รายการขาย สถิติ) ใน request เดียว"""
+    limit = settings.BOOTSTRAP_MAX_ROWS
+    with snapshot():
+        fields = list(with_geojson(with_latest_yield(fields_for(request.user)))[:limit + 1])
+        sales = list(with_field_geometry(sales_for(request.user))[:limit + 1])
+        stats = compute_stats()
+
+    return Response({
+        'fields': RiceFieldCompactSerializer(fields[:limit], many=True).data,
+        'sales': SaleNotificationSerializer(sales[:limit], many=True).data,
+        'stats': stats,
+        # true = มีข้อมูลเกิน BOOTSTRAP_MAX_ROWS ให้ใช้ API แบบแบ่งหน้าแทน
+        'truncated': {'fields': len(fields) > limit, 'sales': len(sales) > limit},
+    })
+
+@api_view(['GET'])
+@login_required
+@read_replica
+@cache_per_scope('map-aggregate')
+def map_aggregate(request):
+    """ข้อมูลแผนที่ตามขอบเขตจอ: ซูมออกได้กลุ่มแปลงรายช่องกริด ซูมเข้าเกิน MAP_POLYGON_MIN_ZOOM ได้รูปแปลงจริง"""
+    try:
+        min_x, min_y, max_x, max_y = (float(v) for v in request.query_params['bbox'].split(','))
+        zoom = int(request.query_params['zoom'])
+    except (KeyError, ValueError):
+        return Response({'error': 'กรุณาระบุ bbox=minLng,minLat,maxLng,maxLat และ zoom'}, status=400)
+    if min_x >= max_x or min_y >= max_y or not 0 <= zoom <= 22:
+        return Response({'error': 'bbox หรือ zoom ไม่ถูกต้อง'}, status=400)
+
+    bbox = Polygon.from_bbox((min_x, min_y, max_x, max_y))
+    bbox.srid = 4326
+    fields = with_latest_yield(fields_for(request.user))
+
+    if zoom >= settings.MAP_POLYGON_MIN_ZOOM:
+        limit = settings.BOOTSTRAP_MAX_ROWS
+        polygons = list(with_geojson(fields.filter(boundary__bboverlaps=bbox))[:limit + 1])
+        return Response({
+            'mode': 'polygons', 'zoom': zoom,
+            'fields': RiceFieldCompactSerializer(polygons[:limit], many=True).data,
+            'truncated': len(polygons) > limit,
+        })
+
+    # จัดกลุ่มตามจุดศูนย์กลางแปลงที่ปัดเข้ากริด (ใช้ GiST index ของ centroid กรองตาม bbox ก่อน)
+    cell_size = 360 / 2 ** zoom / MAP_GRID_DIVISIONS
+    cells = (
+        fields.filter(centroid__contained=bbox)
+        .order_by()
+        .annotate(cell=SnapToGrid('centroid', cell_size))
+        .values('cell')
+        .annotate(
+            count=Count('id'),
+            area_rai=Sum('area_rai'),
+            yield_ton=Sum('latest_yield_ton'),
+            avg_ndvi=Avg('latest_ndvi'),
+        )
+    )
+    return Response({
+        'mode': 'cells', 'zoom': zoom, 'cell_size': cell_size,
+        'polygon_min_zoom': settings.MAP_POLYGON_MIN_ZOOM,
+        'cells': [{
+            'lng': c['cell'].x,
+            'lat': c['cell'].y,
+            'count': c['count'],
+            'area_rai': round(c['area_rai'] or 0, 2),
+            'yield_ton': round(c['yield_ton'] or 0, 2),
+            'avg_ndvi': round(c['avg_ndvi'], 3) if c['avg_ndvi'] is not None else None,
+        } for c in cells],
     })
 
 class RiceFieldViewSet(viewsets.ModelViewSet):
     serializer_class = RiceFieldSerializer
     pagination_class = StandardPagination
 
+    @read_replica
+    @cache_per_scope('rice-fields')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @read_replica
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
     def trash(self, request):
         """ดึงรายการที่ถูกลบไปแล้ว (Soft Deleted)"""
+        # ไม่ cache: ถังขยะเป็นของผู้ใช้แต่ละคน แต่ scope ของ GOVT/superuser คือ 'all' (ใช้ key ร่วมกัน)
         if not request.user.is_authenticated:
             return Response(status=401)
         
         # หาแปลงนาของฉัน ที่ is_active=False
-        deleted_fields = RiceField.objects.filter(owner=request.user, is_active=False).order_by('-updated_at')
+        deleted_fields = with_geojson(with_latest_yield(
+            RiceField.objects.filter(owner=request.user, is_active=False).order_by('-updated_at')
+        ))
         serializer = self.get_serializer(deleted_fields, many=True)
         return Response(serializer.data)
 
@@ -138,7 +314,7 @@ class RiceFieldViewSet(viewsets.ModelViewSet):
             if RiceField.objects.filter(owner=request.user, name=field.name, is_active=True).exists():
                 return Response({'error': f'มีแปลงนาชื่อ "{field.name}" อยู่แล้ว'}, status=400)
             field.is_active = True
-            field.save()
+            field.save(update_fields=['is_active', 'updated_at'])
             return Response({'status': 'restored', 'msg': f'กู้คืนแปลง "{field.name}" สำเร็จ'})
         except RiceField.DoesNotExist:
             return Response({'error': 'ไม่พบข้อมูลในถังขยะ'}, status=404)
@@ -148,28 +324,94 @@ class RiceFieldViewSet(viewsets.ModelViewSet):
         """ลบถาวร (Permanent Delete)"""
         try:
             field = RiceField.objects.get(pk=pk, owner=request.user, is_active=False)
-            
-            field.delete()
+            with transaction.atomic():
+                SaleNotificationArchive.archive_for_fields([field.pk])
+                field.delete()
             return Response({'status': 'deleted', 'msg': 'ลบข้อมูลถาวรเรียบร้อย'})
         except RiceField.DoesNotExist:
             return Response({'error': 'ไม่พบข้อมูล'}, status=404)
 
+    # --- Bulk operations: ทำงานเป็นชุดด้วย UPDATE/DELETE คำสั่งเดียว แทนการยิงทีละแปลง ---
+    def _bulk_ids(self, request):
+        """อ่าน ids จาก body คืนค่า (ids, error_response)"""
+        if not request.user.is_authenticated:
+            return None, Response(status=401)
+        ids = request.data.get('ids')
+        try:
+            if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS:
+                raise ValueError
+            return [int(pk) for pk in ids], None
+        except (TypeError, ValueError):
+            return None, Response({'error': f'กรุณาระบุ ids (ไม่เกิน {MAX_BULK_IDS} แปลง)'}, status=400)
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """ย้ายหลายแปลงลงถังขยะ (Soft Delete)"""
+        ids, error = self._bulk_ids(request)
+        if error:
+            return error
+        count = RiceField.active.filter(owner=request.user, pk__in=ids).update(is_active=False, updated_at=timezone.now())
+        invalidate_api_cache()  # .update() ไม่ส่ง post_save
+        return Response({'status': 'deleted', 'count': count, 'msg': f'ย้าย {count} แปลงลงถังขยะแล้ว'})
+
+    @action(detail=False, methods=['post'])
+    def bulk_restore(self, request):
+        """กู้คืนหลายแปลง ข้ามแปลงที่ชื่อซ้ำกับแปลงที่ใช้งานอยู่"""
+        ids, error = self._bulk_ids(request)
+        if error:
+            return error
+
+        trashed = RiceField.objects.filter(owner=request.user, is_active=False, pk__in=ids)
+        # ตรวจชื่อซ้ำทุกแปลงใน query เดียว
+        name_taken = Exists(RiceField.active.filter(owner=request.user, name=OuterRef('name')))
+        conflicts = list(trashed.filter(name_taken).values('id', 'name'))
+        count = trashed.exclude(pk__in=[c['id'] for c in conflicts]).update(is_active=True, updated_at=timezone.now())
+        invalidate_api_cache()
+        return Response({
+            'status': 'restored', 'count': count, 'conflicts': conflicts,
+            'msg': f'กู้คืน {count} แปลงสำเร็จ' + (f' (ชื่อซ้ำ {len(conflicts)} แปลง)' if conflicts else ''),
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk_force_delete(self, request):
+        """ลบถาวรหลายแปลงจากถังขยะ"""
+        ids, error = self._bulk_ids(request)
+        if error:
+            return error
+        with transaction.atomic():
+            trashed = RiceField.objects.filter(owner=request.user, is_active=False, pk__in=ids)
+            SaleNotificationArchive.archive_for_fields(list(trashed.values_list('pk', flat=True)))
+            count = trashed.delete()[1].get('agriculture.RiceField', 0)
+        return Response({'status': 'deleted', 'count': count, 'msg': f'ลบถาวร {count} แปลงเรียบร้อย'})
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_variety(self, request):
+        """เปลี่ยนพันธุ์ข้าวหลายแปลงพร้อมกัน"""
+        ids, error = self._bulk_ids(request)
+        if error:
+            return error
+        variety = request.data.get('variety')
+        if variety not in dict(RiceField.VARIETY_CHOICES):
+            return Response({'error': 'พันธุ์ข้าวไม่ถูกต้อง'}, status=400)
+        count = RiceField.active.filter(owner=request.user, pk__in=ids).update(variety=variety, updated_at=timezone.now())
+        invalidate_api_cache()
+        return Response({'status': 'updated', 'count': count, 'msg': f'เปลี่ยนพันธุ์ข้าว {count} แปลงเรียบร้อย'})
+
     def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return RiceField.objects.none()
-        
-        user = self.request.user
-        
-        # Superuser หรือ จนท.รัฐ เห็นทั้งหมด (รวมที่ลบไปแล้วได้ หรือจะกรองก็ได้)
-        if user.is_superuser or user.role == 'GOVT':
-            return RiceField.objects.filter(is_active=True).order_by('-created_at') # หรือจะเอาทั้งหมดก็ได้
-            
-        # เกษตรกรเห็นเฉพาะของตัวเองที่ "ยังไม่ถูกลบ"
-        return RiceField.objects.filter(owner=user, is_active=True).order_by('-created_at')
+        fields = fields_for(self.request.user)
+        if self.action == 'list':
+            # กรองตามเขตการปกครอง: ?province=<id>&amphoe=<id>&tambon=<id> (FK มี index ไม่ต้อง join geometry)
+            for level in ('province', 'amphoe', 'tambon'):
+                area_id = self.request.query_params.get(level)
+                if area_id and area_id.isdigit():
+                    fields = fields.filter(**{f'{level}_id': int(area_id)})
+        if self.action in ('list', 'retrieve'):
+            fields = with_geojson(with_latest_yield(fields))
+        return fields
 
     def perform_destroy(self, instance):
         instance.is_active = False
-        instance.save()
+        instance.save(update_fields=['is_active', 'updated_at'])
 
     def create(self, request, *args, **kwargs):
         try:
@@ -185,18 +427,15 @@ class RiceFieldViewSet(viewsets.ModelViewSet):
             if isinstance(geom_input, str): geom_input = json.loads(geom_input)
             poly = GEOSGeometry(json.dumps(geom_input))
 
-            area_sqm = poly.transform(32647, clone=True).area
-            area_rai = round(area_sqm / 1600, 2)
-
+            # save() ทำความสะอาดรูปแปลง และคำนวณพื้นที่/centroid จากรูปที่ทำความสะอาดแล้ว
             field = RiceField.objects.create(
                 owner=request.user,
                 name=field_name,
                 boundary=poly,
-                area_rai=area_rai,
                 variety=data.get('variety', 'KDML105'),
                 is_active=True
             )
-            return Response({'id': field.id, 'area': area_rai}, status=201)
+            return Response({'id': field.id, 'area': field.area_rai}, status=201)
 
         except Exception as e:
             return Response({'error': str(e)}, status=400)
@@ -205,161 +444,200 @@ class RiceFieldViewSet(viewsets.ModelViewSet):
     def calculate_yield(self, request, pk=None):
         rice_field = self.get_object()
         # Fail fast when EE is not initialized to give a clear error to caller
-        if not globals().get('EE_INITIALIZED', False):
+        if not earth_engine.initialize():
             return Response({
                 'error': 'Earth Engine client not initialized on server. Configure GEE credentials (see http://goo.gle/ee-auth)'
             }, status=503)
         try:
-            geom_json = json.loads(rice_field.boundary.json)
-            ee_geometry = ee.Geometry.Polygon(geom_json['coordinates'])
-            
-            end_date = datetime.date.today()
-            start_date = end_date - datetime.timedelta(days=60) 
-            
-            def mask_s2_scl(image):
-                scl = image.select('SCL')
-                mask = scl.neq(3).And(scl.neq(8)).And(scl.neq(9)).And(scl.neq(10)).And(scl.neq(11))
-                return image.updateMask(mask).divide(10000)
-
-            dataset = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                       .filterBounds(ee_geometry)
-                       .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-                       .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 80)) # ลดเมฆต่ำกว่า 80%
-                       .map(mask_s2_scl))
-
-            if dataset.size().getInfo() == 0:
-                return Response({'error': 'ไม่พบภาพดาวเทียมที่ไม่มีเมฆในช่วงนี้'}, status=400)
-
-            # ดึงค่าเมฆเฉลี่ยจากชุดข้อมูล
-            cloud_score = dataset.aggregate_mean('CLOUDY_PIXEL_PERCENTAGE').getInfo() or 0
-            
-            image = dataset.median()
-            vis_params = {'min': 0.0, 'max': 0.3, 'bands': ['B4', 'B3', 'B2'], 'gamma': 1.3}
-            map_id = image.getMapId(vis_params)
-            tile_url = map_id['tile_fetcher'].url_format
-
-            ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-            ndbi = image.normalizedDifference(['B11', 'B8']).rename('NDBI')
-
-            combined = ndvi.addBands(ndbi)
-            stats = combined.reduceRegion(
-                reducer=ee.Reducer.mean(), 
-                geometry=ee_geometry, 
-                scale=10, 
-                maxPixels=1e9
-            ).getInfo()
-            
-            val_ndvi = stats.get('NDVI') or 0
-            val_ndbi = stats.get('NDBI') or 0
-            
-            yield_ton = 0
-            revenue = 0
-            result_type = 'rice'
-            note = "พื้นที่เพาะปลูกข้าว"
-
-            # 1. แหล่งน้ำ: NDVI ติดลบ
-            if val_ndvi < 0:
-                result_type = 'water'
-                note = 'แหล่งน้ำ (Water Body)'
-                yield_ton = 0
-
-            # 2. สิ่งปลูกสร้าง: NDBI เป็นบวก และมากกว่า NDVI (ลักษณะเฉพาะของคอนกรีต)
-            elif val_ndbi > 0 and val_ndbi > val_ndvi:
-                result_type = 'building'
-                note = 'อาคารหรือสิ่งปลูกสร้าง'
-                yield_ton = 0
-
-            # 3. ดินโล่ง/ถนน: NDVI ต่ำ (0 - 0.3)
-            elif 0 <= val_ndvi < 0.3:
-                result_type = 'road'
-                note = 'ดินโล่ง/ถนน'
-                yield_ton = 0
-
-            # 4. ข้าวระยะเริ่มต้น: NDVI ปานกลาง (0.3 - 0.45)
-            elif 0.3 <= val_ndvi < 0.45:
-                result_type = 'young_rice'
-                note = 'ข้าวระยะแตกกอ (ยังไม่สามารถประเมินผลผลิตได้แม่นยำ)'
-                # อาจจะยังไม่คำนวณผลผลิต หรือคำนวณแบบขั้นต่ำ
-                yield_ton = 0
-            else:
-                a = 6.5
-                b = -1.2
-                divider = 6.25
-
-                predicted_yield_per_rai = (a * val_ndvi + b) / divider
-
-                if predicted_yield_per_rai < 0:
-                    predicted_yield_per_rai = 0
-
-                yield_ton = predicted_yield_per_rai * rice_field.area_rai
-
-                est_price = 14000 if rice_field.variety == 'KDML105' else 12000
-                revenue = yield_ton * est_price
-            
+            indices = earth_engine.fetch_indices(rice_field.boundary)
+            estimate = earth_engine.estimate_yield(rice_field, indices['ndvi'], indices['ndbi'])
+
             # เก็บลง Database และดึงวันที่วิเคราะห์จริงออกมา
             estimation = YieldEstimation.objects.create(
                 field=rice_field, 
-                ndvi_mean=val_ndvi, 
-                estimated_yield_ton=yield_ton
+                ndvi_mean=indices['ndvi'], 
+                estimated_yield_ton=estimate['yield_ton']
             )
             
             # ส่งข้อมูลกลับให้ครบตามที่หน้าบ้านต้องการ
-            return Response({
-                'ndvi': round(val_ndvi, 3),
-                'ndbi': round(val_ndbi, 3),
-                'yield_ton': round(yield_ton, 2), 
-                'revenue': round(revenue, 2),
-                'note': note,
-                'result_type': result_type,
-                'area': rice_field.area_rai,
-                'satellite_image': tile_url,
-                'cloud_cover': round(cloud_score, 1),
-                'created_at': estimation.created_at.isoformat() 
-            })
-
+            return Response(earth_engine.yield_payload(rice_field, indices, estimate, estimation))
+
+        except earth_engine.NoImageryError:
+            return Response({'error': 'ไม่พบภาพดาวเทียมที่ไม่มีเมฆในช่วงนี้'}, status=400)
+        except earth_engine.EarthEngineBusyError as e:
+            return Response({'error': str(e)}, status=503)
+        except earth_engine.CircuitOpenError as e:
+            # EE ขัดข้องต่อเนื่อง: ตอบผลประเมินล่าสุดที่มีทันทีแทนการรอ timeout
+            estimation = rice_field.yieldestimation_set.order_by('-created_at').first()
+            if estimation is None:
+                return Response({'error': str(e)}, status=503)
+            EE_STALE_RESULTS.inc()
+            return Response(earth_engine.stale_payload(rice_field, estimation, timezone.now()))
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+def transition_sale(sale, expected_status, actor, **changes):
+    """เปลี่ยนสถานะรายการขายแบบ atomic (UPDATE ... WHERE status=expected) พร้อมแจ้งเตือนผู้เกี่ยวข้อง คืนค่า True ถ้าสำเร็จ"""
+    changes['updated_at'] = timezone.now()  # .update() ไม่ผ่าน auto_now
+    with transaction.atomic():
+        updated = SaleNotification.objects.filter(pk=sale.pk, status=expected_status).update(**changes) == 1
+        if updated:
+            notify_sale_transition(sale, changes['status'], actor)
+    if updated:
+        invalidate_api_cache()  # .update() ไม่ส่ง post_save
+        SALE_TRANSITIONS.labels(changes['status']).inc()
+    return updated
+
 class SaleNotificationViewSet(viewsets.ModelViewSet):
     serializer_class = SaleNotificationSerializer
     pagination_class = StandardPagination
 
+    @read_replica
+    @cache_per_scope('sales')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @read_replica
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
-        if not self.request.user.is_authenticated: return SaleNotification.objects.none()
-        user = self.request.user
-        role = getattr(user, 'role', 'FARMER')
-        
-        if user.is_superuser or role == 'GOVT':
-            return SaleNotification.objects.all().order_by('-created_at')
-        
-        if role == 'FARMER':
-            return SaleNotification.objects.filter(farmer=user).order_by('-created_at')
-        return SaleNotification.objects.filter(Q(status='OPEN') | Q(buyer=user) | Q(status='SOLD')).order_by('-created_at')
+        sales = sales_for(self.request.user)
+        if self.action == 'request_buy' and getattr(self.request.user, 'role', None) == 'MILLER':
+            # รายการที่โรงสีอื่นขอซื้อไปแล้วหายจาก sales_for ต้องตอบ 409 (ชนกัน) ไม่ใช่ 404
+            sales = SaleNotification.objects.all()
+        if self.action == 'list' and self.request.query_params.get('status'):
+            # ?status=REQUESTED,SOLD (หน้าโรงสีดึงรายการที่เปิดอยู่จาก /nearby/ แยกต่างหาก)
+            sales = sales.filter(status__in=self.request.query_params['status'].upper().split(','))
+        if self.action in ('list', 'retrieve'):
+            sales = with_field_geometry(sales)
+        return sales
 
     def perform_create(self, serializer):
-        serializer.save(farmer=self.request.user)
+        with transaction.atomic():
+            sale = serializer.save(farmer=self.request.user)
+            notify_new_listings(self.request.user, [sale])
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """ประกาศขายหลายแปลงพร้อมกัน (สำเร็จทั้งชุดหรือไม่บันทึกเลย)"""
+        if not request.user.is_authenticated:
+            return Response(status=401)
+        rows = request.data.get('listings') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows or len(rows) > MAX_BULK_IDS:
+            return Response({'error': f'กรุณาระบุรายการขาย (ไม่เกิน {MAX_BULK_IDS} รายการ)'}, status=400)
+
+        serializer = SaleListingSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=400)
+
+        # ตรวจความเป็นเจ้าของแปลงทั้งชุดใน query เดียว
+        listings = serializer.validated_data
+        owned = set(RiceField.active.filter(
+            owner=request.user, pk__in={row['rice_field'] for row in listings}
+        ).values_list('pk', flat=True))
+        errors = [{} if row['rice_field'] in owned else {'rice_field': ['ไม่พบแปลงนาของคุณ']} for row in listings]
+        if any(errors):
+            return Response({'errors': errors}, status=400)
+
+        with transaction.atomic():
+            sales = SaleNotification.objects.bulk_create([
+                SaleNotification(
+                    farmer=request.user,
+                    rice_field_id=row['rice_field'],
+                    quantity_ton=row['quantity_ton'],
+                    price_per_ton=row['price_per_ton'],
+                    phone=row['phone'],
+                )
+                for row in listings
+            ])
+            sale_listings_created.send(sender=SaleNotification, farmer=request.user, sales=sales)
+
+        return Response({
+            'status': 'created', 'count': len(sales), 'ids': [sale.id for sale in sales],
+            'msg': f'ประกาศขาย {len(sales)} รายการเรียบร้อย',
+        }, status=201)
+
+    @action(detail=False, methods=['get'])
+    @read_replica
+    @cache_per_scope('sales-nearby')
+    def nearby(self, request):
+        """รายการขายที่เปิดอยู่ เรียงตามระยะทางจริงจากจุดที่ระบุ (KNN ผ่าน index แล้วเรียงใหม่)
+
+        เรียงตามระยะจริงถูกต้อง ยกเว้นเมื่อดึงผู้สมัครครบ limit * NEARBY_MAX_OVERFETCH แล้วยังยืนยันไม่ได้
+        (จุดกระจุกรอบขอบ limit มาก) รายการใกล้ขอบ limit จึงเป็นค่าประมาณ
+        """
+        if not request.user.is_authenticated:
+            return Response(status=401)
+
+        params = request.query_params
+        try:
+            point = Point(float(params['lng']), float(params['lat']), srid=4326)
+            limit = min(int(params.get('limit', StandardPagination.page_size)), StandardPagination.max_page_size)
+            min_qty = float(params['min_qty']) if params.get('min_qty') else None
+            max_price = float(params['max_price']) if params.get('max_price') else None
+        except (KeyError, ValueError):
+            return Response({'error': 'กรุณาระบุ lng, lat และตัวกรองให้ถูกต้อง'}, status=400)
+        if limit < 1:
+            return Response({'error': 'limit ต้องมากกว่า 0'}, status=400)
+
+        sales = with_field_geometry(SaleNotification.objects.filter(
+            status='OPEN', rice_field__is_active=True, rice_field__centroid__isnull=False
+        ))
+
+        variety = params.get('variety')
+        if variety:
+            sales = sales.filter(rice_field__variety=variety)
+        if min_qty is not None:
+            sales = sales.filter(quantity_ton__gte=min_qty)
+        if max_price is not None:
+            sales = sales.filter(price_per_ton__lte=max_price)
+
+        # <-> บน SRID 4326 เรียงด้วยระยะบนระนาบ (องศา) ไม่ใช่ระยะจริง (distance_km) จึงดึงผู้สมัครจาก index
+        # แล้วเรียงใหม่ด้วยระยะจริง ขยายชุดผู้สมัครจนกว่าแถวที่ limit จะใกล้กว่าระยะจริงต่ำสุดที่แถวนอกชุดเป็นได้
+        ranked = sales.annotate(
+            knn=KNNDistance('rice_field__centroid', point),
+            distance=Distance('rice_field__centroid', point),
+        ).order_by('knn')
+        fetch = limit * 2
+        while True:
+            candidates = list(ranked[:fetch])
+            sales = sorted(candidates, key=lambda sale: sale.distance.m)[:limit]
+            if len(candidates) < fetch or fetch >= limit * NEARBY_MAX_OVERFETCH:
+                break  # ครบทุกรายการแล้ว หรือถึงเพดาน (ผลใกล้ขอบ limit อาจเป็นค่าประมาณ)
+            if len(sales) == limit and sales[-1].distance.m <= min_sphere_distance_m(candidates[-1].knn, point.y):
+                break
+            fetch *= 2
+
+        data = self.get_serializer(sales, many=True).data
+        for item, sale in zip(data, sales):
+            item['distance_km'] = round(sale.distance.km, 2)
+        return Response(data)
 
     @action(detail=True, methods=['post'])
     def request_buy(self, request, pk=None):
         sale = self.get_object()
         if sale.status != 'OPEN': 
-            return Response({'error': 'รายการนี้ไม่ว่างหรือมีการขอซื้อแล้ว'}, status=400)
+            return Response({'error': 'รายการนี้ไม่ว่างหรือมีการขอซื้อแล้ว'}, status=409)
         # Validate buyer contact phone
         contact = request.data.get('contact', request.user.phone or '')
         cleaned = ''.join(ch for ch in contact if ch.isdigit())
         if not contact or len(cleaned) < 9 or len(cleaned) > 10:
             return Response({'error': 'เบอร์โทรติดต่อไม่ถูกต้อง'}, status=400)
 
-        sale.status = 'REQUESTED'
-        sale.buyer = request.user
-        sale.buyer_contact = contact
-        
+        changes = {'status': 'REQUESTED', 'buyer': request.user, 'buyer_contact': contact}
+
         # +++ รับค่าราคาต่อรอง +++
         negotiated_price = request.data.get('negotiated_price')
         if negotiated_price:
-            sale.negotiated_price = float(negotiated_price)
-            
-        sale.save()
+            try:
+                changes['negotiated_price'] = float(negotiated_price)
+            except (TypeError, ValueError):
+                return Response({'error': 'ราคาต่อรองไม่ถูกต้อง'}, status=400)
+
+        # UPDATE ... WHERE status='OPEN' ในคำสั่งเดียว: โรงสีที่มาช้ากว่าจะได้ 409 แทนการเขียนทับกัน
+        if not transition_sale(sale, 'OPEN', request.user, **changes):
+            return Response({'error': 'รายการนี้ถูกขอซื้อไปแล้ว'}, status=409)
         return Response({'status': 'requested', 'msg': 'ส่งคำขอซื้อและราคาต่อรองเรียบร้อย'})
 
     @action(detail=True, methods=['post'])
@@ -369,15 +647,17 @@ class SaleNotificationViewSet(viewsets.ModelViewSet):
             return Response({'error': 'คุณไม่ใช่เจ้าของรายการนี้'}, status=403)
         
         if sale.status != 'REQUESTED':
-            return Response({'error': 'สถานะรายการไม่ถูกต้อง'}, status=400)
-
-        # +++ ถ้ามีการต่อรองราคา ให้ใช้ราคานั้นเป็นราคาขายจริง +++
-        if sale.negotiated_price and sale.negotiated_price > 0:
-            sale.price_per_ton = sale.negotiated_price
-
-        sale.status = 'SOLD'
-        sale.sold_at = datetime.datetime.now()
-        sale.save()
+            return Response({'error': 'สถานะรายการไม่ถูกต้อง'}, status=409)
+
+        # +++ ถ้ามีการต่อรองราคา ให้ใช้ราคานั้นเป็นราคาขายจริง (คำนวณใน UPDATE เดียวกัน) +++
+        approved = transition_sale(
+            sale, 'REQUESTED', request.user,
+            status='SOLD',
+            sold_at=timezone.now(),
+            price_per_ton=Case(When(negotiated_price__gt=0, then=F('negotiated_price')), default=F('price_per_ton')),
+        )
+        if not approved:
+            return Response({'error': 'สถานะรายการเปลี่ยนไปแล้ว กรุณารีเฟรช'}, status=409)
         return Response({'status': 'sold', 'msg': 'ยืนยันการขายสำเร็จ'})
     
     @action(detail=True, methods=['post'])
@@ -386,28 +666,104 @@ class SaleNotificationViewSet(viewsets.ModelViewSet):
         if sale.farmer != request.user: 
             return Response({'error': 'คุณไม่ใช่เจ้าของรายการนี้'}, status=403)
         
-        sale.status = 'OPEN'
-        sale.buyer = None
-        sale.buyer_contact = None
-        sale.save()
+        if not transition_sale(sale, 'REQUESTED', request.user, status='OPEN', buyer=None, buyer_contact=None):
+            return Response({'error': 'สถานะรายการเปลี่ยนไปแล้ว กรุณารีเฟรช'}, status=409)
         return Response({'status': 'open', 'msg': 'ปฏิเสธคำขอแล้ว รายการกลับสู่ตลาด'})
     
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """กล่องแจ้งเตือนของผู้ใช้ (ใหม่สุดก่อน) ; ?unread=1 เฉพาะที่ยังไม่อ่าน"""
+    serializer_class = NotificationSerializer
+    pagination_class = StandardPagination
+
+    def get_queryset(self):
+        if not self.request.user.is_authenticated:
+            return Notification.objects.none()
+        notifications = Notification.objects.filter(recipient=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(is_read=False)
+        return notifications
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """จำนวนที่ยังไม่อ่าน: แถวตัวนับด้วย primary key (+ นับ feed ประกาศขายแบบจำกัดสำหรับโรงสี) กระดิ่งเรียกทุก 5 วินาที"""
+        if not request.user.is_authenticated:
+            return Response(status=401)
+        return Response({'unread': unread_count(request.user)})
+
+    @action(detail=False, methods=['get'])
+    def listings(self, request):
+        """feed ประกาศขายใหม่ของโรงสี (อ่านร่วมกันทุกราย is_read เทียบกับ watermark ของผู้ใช้)"""
+        if not request.user.is_authenticated:
+            return Response(status=401)
+        page = self.paginate_queryset(listings_for(request.user))
+        serializer = ListingAnnouncementSerializer(page, many=True, context={'seen_at': listings_seen_at(request.user)})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """ทำเครื่องหมายว่าอ่านแล้ว: {"ids": [...]}, {"listings": true} (feed ประกาศขาย) หรือ {"all": true}"""
+        if not request.user.is_authenticated:
+            return Response(status=401)
+        if request.data.get('listings') is True:
+            mark_listings_seen(request.user)
+            return Response({'marked': 0, 'unread': unread_count(request.user)})
+        if request.data.get('all') is True:
+            ids = None
+        else:
+            ids = request.data.get('ids')
+            try:
+                if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS:
+                    raise ValueError
+                ids = [int(pk) for pk in ids]
+            except (TypeError, ValueError):
+                return Response({'error': f'กรุณาระบุ ids (ไม่เกิน {MAX_BULK_IDS} รายการ) หรือ all'}, status=400)
+        marked = mark_read(request.user, ids)
+        return Response({'marked': marked, 'unread': unread_count(request.user)})
+
 @login_required
+@read_replica
 def history_view(request):
     user = request.user
     role = getattr(user, 'role', 'FARMER')
     
+    # SaleHistory รวมรายการที่ขายแล้วทั้งในตารางหลักและ archive
+    history = SaleHistory.objects.select_related('farmer', 'buyer').order_by('-sold_at')
     if role == 'FARMER':
-        transactions = SaleNotification.objects.filter(farmer=user, status='SOLD').order_by('-sold_at')
+        transactions = history.filter(farmer=user)
     elif role == 'MILLER':
-        transactions = SaleNotification.objects.filter(buyer=user, status='SOLD').order_by('-sold_at')
+        transactions = history.filter(buyer=user)
     elif role == 'GOVT':
-        transactions = SaleNotification.objects.filter(status='SOLD').order_by('-sold_at')
+        transactions = history
     else:
         transactions = [] 
 
     return render(request, 'agriculture/history.html', {'transactions': transactions, 'role': role})
 
+def health_check(request):
+    """สถานะระบบสำหรับ load balancer / monitoring (ไม่ต้อง login)
+
+    สาธารณะเห็นแค่สถานะรายส่วน รายละเอียด (ข้อความ error, lag) เฉพาะ staff หรือ Bearer METRICS_TOKEN
+    """
+    database_error = None
+    try:
+        connection.ensure_connection()
+    except Exception as e:
+        database_error = str(e)
+    replicas = replica_status()
+    ee_status = earth_engine.status()
+    data = {
+        'database': 'ok' if database_error is None else 'error',
+        'replicas': {
+            alias: 'ok' if lag != 'unavailable' and lag <= settings.REPLICA_MAX_LAG_SECONDS else 'degraded'
+            for alias, lag in replicas.items()
+        },
+        'earth_engine': ee_status['status'],
+    }
+    token = settings.METRICS_TOKEN
+    if request.user.is_staff or (token and request.headers.get('Authorization') == f'Bearer {token}'):
+        data['details'] = {'database': database_error, 'replicas': replicas, 'earth_engine': ee_status}
+    return JsonResponse(data, status=200 if database_error is None else 503)
+
 @login_required
 def govt_stats(request):
     if not request.user.is_superuser and getattr(request.user, 'role', '') != 'GOVT':
@@ -0,0 +1,18 @@
+# gunicorn อ่านไฟล์นี้อัตโนมัติเมื่อรันจากโฟลเดอร์ backend/
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # ล้างไฟล์ metrics ของรอบก่อน เพื่อไม่ให้ counter ของ process เก่าค้าง
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,13 @@
+import os
+from django.core.asgi import get_asgi_application
+
+# ต้องชี้ไปที่ settings ของเรา
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rice_core.settings')
+
+application = get_asgi_application()
+
+# ตอนพัฒนา (DEBUG) ให้ ASGI server เสิร์ฟไฟล์ static เองเหมือน runserver
+from django.conf import settings  # noqa: E402
+if settings.DEBUG:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    application = ASGIStaticFilesHandler(application)
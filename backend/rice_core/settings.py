@@ -22,11 +22,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'agriculture.metrics.metrics_middleware',  # Prometheus latency ต่อ view
+    'agriculture.instrumentation.server_timing_middleware',  # วัดเวลา DB / serializer / EE ต่อ request
+    'agriculture.compression.compression_middleware',  # บีบอัด JSON/GeoJSON ด้วย br/gzip (อยู่ใน server timing เพื่อวัดเวลา compress)
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # เสิร์ฟ static (ไฟล์ที่มี hash ได้ cache-control ระยะยาว + .br/.gz)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware', # <--- สำคัญสำหรับ Form
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'agriculture.db_routing.replica_pin_middleware',  # หลังเขียนข้อมูล อ่านจาก primary ต่อชั่วคราว
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -50,6 +55,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rice_core.wsgi.application'
+ASGI_APPLICATION = 'rice_core.asgi.application'
 
 # Database เชื่อมกับ Docker - ใช้ environment variables
 DATABASES = {
@@ -63,13 +69,111 @@ DATABASES = {
     }
 }
 
+# Read replica: DATABASE_REPLICA_HOSTS=host1:5432,host2:5432 (ผู้ใช้/รหัสผ่าน/ชื่อฐานเดียวกับ primary)
+# view ที่ติด @read_replica จะอ่านจาก replica ที่ lag ไม่เกิน REPLICA_MAX_LAG_SECONDS (ไม่มีตัวไหนผ่าน = primary)
+DATABASE_REPLICAS = []
+for _index, _address in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    _host, _, _port = _address.strip().partition(':')
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'], 'HOST': _host, 'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+DATABASE_ROUTERS = ['agriculture.db_routing.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', '2'))  # วินาที (cache ต่อ process)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))  # อ่านจาก primary ต่อหลังผู้ใช้เขียนข้อมูล
+
+# Cache สำหรับ API (dashboard_stats / list endpoints) - ค่าเริ่มต้นเป็น file (ใช้ร่วมกันทุก worker ในเครื่องเดียวกัน)
+# การล้าง cache (เลื่อน generation) ต้องเห็นทุก process ไม่งั้น worker อื่นจะตอบข้อมูลเก่าจนหมดอายุ
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'file')
+if CACHE_BACKEND == 'redis':
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    }}
+elif CACHE_BACKEND == 'file':
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', '/tmp/rice_api_cache'),
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rice-api',
+    }}
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', '30'))  # วินาที (0 = ปิด API cache)
+if CACHE_BACKEND not in ('redis', 'file') and int(os.environ.get('WEB_CONCURRENCY', '1')) > 1:
+    API_CACHE_TIMEOUT = 0  # locmem แยกตาม process: หลาย worker ล้าง cache ข้ามกันไม่ได้ จึงปิดไปเลย
+BOOTSTRAP_MAX_ROWS = int(os.environ.get('BOOTSTRAP_MAX_ROWS', '2000'))  # จำนวนแปลง/รายการขายสูงสุดใน /api/bootstrap/
+
+# ทำความสะอาดรูปแปลงตอนบันทึก: ปัดพิกัดเข้ากริด (องศา, 0.000001 ≈ 11 ซม.) และจำนวนจุดสูงสุด (0 = ไม่จำกัด)
+GEOMETRY_PRECISION = float(os.environ.get('GEOMETRY_PRECISION', '0.000001'))
+GEOMETRY_MAX_VERTICES = int(os.environ.get('GEOMETRY_MAX_VERTICES', '500'))
+
+# แผนที่ GOVT: ซูมตั้งแต่ระดับนี้ขึ้นไป /api/map/aggregate/ จะส่งรูปแปลงจริงแทนกลุ่มกริด
+MAP_POLYGON_MIN_ZOOM = int(os.environ.get('MAP_POLYGON_MIN_ZOOM', '14'))
+
+# Google Earth Engine: จำนวน thread สูงสุดต่อ process ที่ใช้รอ getInfo()
+EE_MAX_WORKERS = int(os.environ.get('EE_MAX_WORKERS', '8'))
+EE_WARMUP = os.environ.get('EE_WARMUP', 'False').lower() == 'true'  # เริ่มต้น EE เบื้องหลังตอน worker boot
+EE_INIT_RETRY_SECONDS = int(os.environ.get('EE_INIT_RETRY_SECONDS', '60'))  # เว้นระยะก่อนลองใหม่เมื่อ init ล้มเหลว
+# จำกัดการเรียก EE ร่วมกันทุก process (ee_limiter): งานพร้อมกันสูงสุด, อัตรา token/วินาที, burst และเวลารอคิวสูงสุด
+EE_MAX_IN_FLIGHT = int(os.environ.get('EE_MAX_IN_FLIGHT', '10'))
+EE_RATE_PER_SECOND = float(os.environ.get('EE_RATE_PER_SECOND', '5'))
+EE_RATE_BURST = float(os.environ.get('EE_RATE_BURST', '20'))
+EE_LIMIT_MAX_WAIT = float(os.environ.get('EE_LIMIT_MAX_WAIT', '30'))
+# ลองใหม่เมื่อติดโควตา/ขัดข้องชั่วคราว (exponential backoff แบบสุ่ม เริ่ม EE_BACKOFF_BASE วินาที ไม่เกิน EE_BACKOFF_MAX)
+EE_MAX_RETRIES = int(os.environ.get('EE_MAX_RETRIES', '3'))
+EE_BACKOFF_BASE = float(os.environ.get('EE_BACKOFF_BASE', '0.5'))
+EE_BACKOFF_MAX = float(os.environ.get('EE_BACKOFF_MAX', '8'))
+# circuit breaker: ล้มเหลวกี่ครั้งภายในกี่วินาทีจึงเปิด และเปิดนานเท่าใดก่อนปล่อย probe (half-open)
+EE_BREAKER_THRESHOLD = int(os.environ.get('EE_BREAKER_THRESHOLD', '5'))
+EE_BREAKER_WINDOW = int(os.environ.get('EE_BREAKER_WINDOW', '60'))
+EE_BREAKER_COOLDOWN = int(os.environ.get('EE_BREAKER_COOLDOWN', '30'))
+
+# แปลงนาในถังขยะเกินกี่วันจะถูกลบถาวรโดย purge_trashed_fields
+FIELD_TRASH_RETENTION_DAYS = int(os.environ.get('FIELD_TRASH_RETENTION_DAYS', '90'))
+
+# ประวัติผลประเมินผลผลิต (prune_yield_estimations): เก็บทุกรายการ N วันล่าสุด
+# จากนั้นเหลือวันละ 1 รายการ/แปลง, สัปดาห์ละ 1 รายการ/แปลง และเก่ากว่านั้นฤดูละ 1 รายการ/แปลง
+YIELD_KEEP_ALL_DAYS = int(os.environ.get('YIELD_KEEP_ALL_DAYS', '14'))
+YIELD_KEEP_DAILY_DAYS = int(os.environ.get('YIELD_KEEP_DAILY_DAYS', '90'))
+YIELD_KEEP_WEEKLY_DAYS = int(os.environ.get('YIELD_KEEP_WEEKLY_DAYS', '365'))
+
+# รายการขายที่ปิดการขายเกินกี่ตันจะแจ้งเตือนเจ้าหน้าที่ (GOVT) ทุกคน
+NOTIFY_LARGE_SALE_TON = float(os.environ.get('NOTIFY_LARGE_SALE_TON', '50'))
+
+# เดือนเริ่มต้นปีการผลิต (ใช้แบ่งฤดูตอน archive รายการขาย) 5 = พฤษภาคม
+SALE_SEASON_START_MONTH = int(os.environ.get('SALE_SEASON_START_MONTH', '5'))
 
 AUTH_USER_MODEL = 'users.User'
 
+# API ใช้ orjson ทั้งขาออกและขาเข้า (ฝัง GeoJSON จาก PostGIS ได้โดยไม่ encode ซ้ำ)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'agriculture.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'agriculture.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # collectstatic: ย่อ JS/CSS -> ใส่ hash ในชื่อไฟล์ -> ทำ .gz/.br ล่วงหน้า (ตอน DEBUG ใช้ชื่อไฟล์เดิม ไม่ต้อง collectstatic)
+    'staticfiles': {'BACKEND': 'rice_core.storage.MinifiedManifestStaticFilesStorage'},
+}
+WHITENOISE_USE_FINDERS = DEBUG
+WHITENOISE_AUTOREFRESH = DEBUG
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -91,6 +195,18 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Request timing (Server-Timing header + log ผ่าน logger 'agriculture')
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '1.0' if DEBUG else '0.1'))
+REQUEST_TIMING_SLOW_MS = int(os.environ.get('REQUEST_TIMING_SLOW_MS', '1000'))  # request ที่ช้ากว่านี้ log เป็น WARNING เสมอ
+
+# บีบอัด response API (JSON/GeoJSON) ที่ใหญ่กว่า MIN_BYTES ; gzip 1-9, brotli 0-11 (สูง = เล็กลงแต่ใช้ CPU มากขึ้น)
+API_COMPRESSION_MIN_BYTES = int(os.environ.get('API_COMPRESSION_MIN_BYTES', '1024'))
+API_COMPRESSION_GZIP_LEVEL = int(os.environ.get('API_COMPRESSION_GZIP_LEVEL', '6'))
+API_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('API_COMPRESSION_BROTLI_QUALITY', '5'))
+
+# Prometheus /metrics (ว่าง = ไม่ต้องใช้ token)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
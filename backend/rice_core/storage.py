@@ -0,0 +1,37 @@
+import rcssmin
+import rjsmin
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# ย่อไฟล์ JS/CSS ของโปรเจกต์ก่อนใส่ hash ในชื่อไฟล์ (collectstatic)
+# จากนั้น WhiteNoise ทำไฟล์ .gz/.br ไว้ล่วงหน้า และเสิร์ฟชื่อที่มี hash พร้อม cache-control ระยะยาว
+MINIFIERS = {
+    '.js': rjsmin.jsmin,
+    '.css': rcssmin.cssmin,
+}
+MINIFY_DIRS = ('js/', 'css/')  # เฉพาะไฟล์ของเรา (ไม่แตะ admin / rest_framework)
+
+
+class MinifiedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            for path in list(paths):
+                minify = self._minifier(path)
+                if minify is None:
+                    continue
+                storage, source_path = paths[path]
+                with storage.open(source_path) as f:
+                    content = f.read().decode('utf-8')
+                # เขียนทับสำเนาใน STATIC_ROOT แล้วให้ขั้นใส่ hash อ่านจากสำเนานี้แทนต้นฉบับ
+                self.delete(path)
+                self._save(path, ContentFile(minify(content).encode('utf-8')))
+                paths[path] = (self, path)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    @staticmethod
+    def _minifier(path):
+        if not path.startswith(MINIFY_DIRS) or '.min.' in path:
+            return None
+        return MINIFIERS.get(path[path.rfind('.'):])
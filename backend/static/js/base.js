@@ -0,0 +1,197 @@
+// ค่าจาก template อ่านผ่าน data-* / meta เพื่อให้ไฟล์นี้เป็น static (cache ได้ยาวตาม hash ของชื่อไฟล์)
+const CURRENT_USER_ROLE = document.body.dataset.userRole || 'GUEST';
+const CSRF_TOKEN = document.querySelector('meta[name="csrf-token"]').content;
+const USER_PHONE = document.body.dataset.userPhone || '';
+
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+}
+
+// กระดิ่ง: ถามแค่จำนวนที่ยังไม่อ่านทุก 5 วินาที แล้วค่อยโหลดรายการเมื่อจำนวนเปลี่ยน
+const NOTIF_STYLES = {
+    NEW_LISTING: { icon: 'fa-bullhorn', color: 'bg-blue-100 text-blue-600' },
+    BUY_REQUESTED: { icon: 'fa-bell', color: 'bg-yellow-100 text-yellow-600' },
+    SALE_APPROVED: { icon: 'fa-handshake', color: 'bg-green-100 text-green-600' },
+    SALE_REJECTED: { icon: 'fa-circle-xmark', color: 'bg-red-100 text-red-600' },
+    LARGE_SALE: { icon: 'fa-triangle-exclamation', color: 'bg-purple-100 text-purple-600' },
+};
+let lastUnreadCount = null;
+
+function toggleMobileMenu() {
+    const menu = document.getElementById('mobile-menu');
+    menu.classList.toggle('hidden');
+}
+
+function toggleGlobalNotif() {
+    const dd = document.getElementById('base-notif-dropdown');
+    if (dd) dd.classList.toggle('hidden');
+}
+
+function toggleGlobalNotifMobile() {
+    const list = document.getElementById('mobile-notif-list');
+    list.classList.toggle('hidden');
+}
+
+document.addEventListener('click', function (e) {
+    const notifDd = document.getElementById('base-notif-dropdown');
+    if (notifDd && !notifDd.contains(e.target) && !e.target.closest('button[onclick="toggleGlobalNotif()"]')) {
+        notifDd.classList.add('hidden');
+    }
+
+    const userDd = document.getElementById('user-dropdown-desktop');
+    const userBtn = document.getElementById('user-dropdown-button');
+    if (userDd && !userDd.contains(e.target) && !(userBtn && userBtn.contains(e.target))) {
+        userDd.classList.add('hidden');
+    }
+});
+
+function confirmLogout(formId) {
+    Swal.fire({
+        title: 'ยืนยันการออก?', text: "คุณต้องการออกจากระบบใช่หรือไม่", icon: 'warning',
+        showCancelButton: true, confirmButtonColor: '#ef4444', cancelButtonColor: '#e5e7eb',
+        confirmButtonText: 'ใช่, ออกเลย', cancelButtonText: '<span class="text-gray-600">ยกเลิก</span>',
+        reverseButtons: true, width: '320px',
+        customClass: { popup: 'rounded-2xl shadow-xl border border-gray-100 pb-8', confirmButton: 'rounded-xl px-6 py-2.5 shadow-lg shadow-red-200 text-sm font-bold', cancelButton: 'rounded-xl px-6 py-2.5 hover:bg-gray-200 text-sm font-bold', title: 'text-xl font-bold text-gray-800', htmlContainer: 'text-sm text-gray-500' }
+    }).then((result) => { if (result.isConfirmed) { hideUserDropdown(); document.getElementById(formId).submit(); } })
+}
+
+function toggleUserDropdown(e) {
+    if (e && e.stopPropagation) e.stopPropagation();
+    const dd = document.getElementById('user-dropdown-desktop');
+    if (dd) dd.classList.toggle('hidden');
+}
+
+function hideUserDropdown() {
+    const dd = document.getElementById('user-dropdown-desktop');
+    if (dd) dd.classList.add('hidden');
+}
+
+function renderUnreadBadges(unreadCount) {
+    const badge = document.getElementById('base-notif-badge');
+    const mobileMenuBadge = document.getElementById('mobile-menu-badge');
+    const mobileInnerBadge = document.getElementById('mobile-inner-badge');
+    const mobileCountText = document.getElementById('mobile-count-text');
+
+    const hasUnread = unreadCount > 0;
+    const countStr = unreadCount > 9 ? '9+' : unreadCount;
+
+    if (badge) { badge.innerText = countStr; hasUnread ? badge.classList.remove('hidden') : badge.classList.add('hidden'); }
+    if (mobileMenuBadge) hasUnread ? mobileMenuBadge.classList.remove('hidden') : mobileMenuBadge.classList.add('hidden');
+    if (mobileInnerBadge) hasUnread ? mobileInnerBadge.classList.remove('hidden') : mobileInnerBadge.classList.add('hidden');
+    if (mobileCountText) { if (hasUnread) { mobileCountText.innerText = `${countStr} ใหม่`; mobileCountText.classList.remove('hidden'); } else { mobileCountText.classList.add('hidden'); } }
+}
+
+async function loadGlobalNotifications() {
+    if (CURRENT_USER_ROLE === 'GUEST') return;
+    try {
+        const requests = [fetch('/api/notifications/?page_size=20')];
+        // โรงสี: ประกาศขายใหม่มาจาก feed ที่ใช้ร่วมกัน รวมกับแจ้งเตือนส่วนตัวแล้วเรียงตามเวลา
+        if (CURRENT_USER_ROLE === 'MILLER') requests.push(fetch('/api/notifications/listings/?page_size=20'));
+        const responses = await Promise.all(requests);
+        if (responses.some(res => !res.ok)) return;
+        const notifications = (await Promise.all(responses.map(res => res.json())))
+            .flatMap(data => data.results)
+            .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
+            .slice(0, 20);
+
+        const listDiv = document.getElementById('base-notif-list');
+        const mobileListDiv = document.getElementById('mobile-notif-list');
+
+        let itemsHTML = notifications.map(n => {
+            const style = NOTIF_STYLES[n.kind] || NOTIF_STYLES.BUY_REQUESTED;
+            const isNew = !n.is_read;
+            return `
+            <div onclick="${n.kind === 'NEW_LISTING' ? 'markListingsRead()' : `markOneRead(${n.id})`}" class="px-4 py-3 border-b border-gray-50 ${isNew ? 'bg-white' : 'bg-gray-50 opacity-60'} hover:bg-gray-100 transition cursor-pointer flex gap-3 items-start relative group">
+                <div class="w-9 h-9 rounded-full ${style.color} flex items-center justify-center shrink-0 mt-0.5 shadow-sm"><i class="fa-solid ${style.icon}"></i></div>
+                <div class="flex-grow">
+                    <p class="text-sm font-bold text-gray-800 leading-tight">${escapeHtml(n.title)}</p>
+                    <p class="text-xs text-gray-500 mt-0.5">${escapeHtml(n.message)}</p>
+                    <p class="text-[10px] text-gray-400 mt-1"><i class="fa-regular fa-clock"></i> ${new Date(n.created_at).toLocaleDateString('th-TH', { hour: '2-digit', minute: '2-digit' })}</p>
+                </div>
+                ${isNew ? '<span class="absolute top-4 right-4 w-2 h-2 bg-red-500 rounded-full shrink-0 shadow-sm animate-pulse"></span>' : ''}
+            </div>`;
+        }).join('');
+
+        if (!itemsHTML) itemsHTML = `<div class="p-8 text-center text-gray-400 text-sm"><i class="fa-regular fa-bell-slash text-2xl mb-2 opacity-50"></i><br>ไม่มีการแจ้งเตือน</div>`;
+
+        if (listDiv) listDiv.innerHTML = itemsHTML;
+        if (mobileListDiv) mobileListDiv.innerHTML = itemsHTML;
+    } catch (e) { console.error("Notif Error:", e); }
+}
+
+async function pollUnreadCount() {
+    try {
+        const res = await fetch('/api/notifications/unread_count/');
+        if (!res.ok) return;
+        const { unread } = await res.json();
+        renderUnreadBadges(unread);
+        if (unread !== lastUnreadCount) {
+            lastUnreadCount = unread;
+            loadGlobalNotifications();
+        }
+    } catch (e) { console.error("Notif Error:", e); }
+}
+
+async function markNotificationsRead(body) {
+    const res = await fetch('/api/notifications/mark_read/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': CSRF_TOKEN },
+        body: JSON.stringify(body),
+    });
+    if (!res.ok) return;
+    const { unread } = await res.json();
+    lastUnreadCount = unread;
+    renderUnreadBadges(unread);
+    loadGlobalNotifications();
+}
+
+window.markOneRead = function (id) {
+    markNotificationsRead({ ids: [id] }).catch(() => { });
+}
+
+window.markListingsRead = function () {
+    markNotificationsRead({ listings: true }).catch(() => { });
+}
+
+window.markAllGlobalRead = async function () {
+    try {
+        await markNotificationsRead({ all: true });
+        document.getElementById('base-notif-dropdown').classList.add('hidden');
+    } catch (e) { }
+}
+
+window.showManual = function () {
+    let title = "คู่มือการใช้งาน";
+    let content = "";
+
+    if (CURRENT_USER_ROLE === 'FARMER') {
+        title += "<br><span class='text-base font-normal text-gray-800'>(สำหรับเกษตรกร)</span>";
+
+        content = `<ul class="text-left space-y-3 text-sm text-gray-600"><li><i class="fa-solid fa-1 text-green-500 w-5"></i> <b>วาดแปลงนา:</b> ใช้เครื่องมือขวาบนวาดพื้นที่นาของคุณบนแผนที่</li><li><i class="fa-solid fa-2 text-green-500 w-5"></i> <b>วิเคราะห์ผลผลิต:</b> กดปุ่ม 'วิเคราะห์' เพื่อดูค่า NDVI และปริมาณคาดการณ์</li><li><i class="fa-solid fa-3 text-green-500 w-5"></i> <b>ประกาศขาย:</b> เมื่อพร้อมขาย กดปุ่ม 'ประกาศขาย' และระบุราคา</li><li><i class="fa-solid fa-4 text-green-500 w-5"></i> <b>ต่อรองราคา:</b> หากโรงสีกดซื้อ คุณสามารถกด 'ยอมรับ' หรือ 'ต่อราคา' ได้</li></ul>`;
+
+    } else if (CURRENT_USER_ROLE === 'MILLER') {
+        title += "<br><span class='text-base font-normal text-gray-800'>(สำหรับโรงสี)</span>";
+
+        content = `<ul class="text-left space-y-3 text-sm text-gray-600"><li><i class="fa-solid fa-1 text-blue-500 w-5"></i> <b>ค้นหาข้าว:</b> ดูรายการประกาศขายทางด้านซ้าย หรือบนแผนที่</li><li><i class="fa-solid fa-2 text-blue-500 w-5"></i> <b>ขอซื้อ:</b> กดปุ่ม 'ส่งคำขอซื้อ' และระบุราคาที่ต้องการ</li><li><i class="fa-solid fa-3 text-blue-500 w-5"></i> <b>เจรจา:</b> รอเกษตรกรตอบกลับ หากเขาต่อราคามา คุณสามารถตกลงหรือต่อกลับได้</li><li><i class="fa-solid fa-4 text-blue-500 w-5"></i> <b>นำทาง:</b> กดปุ่ม 'นำทาง' ในรายละเอียดเพื่อเปิด Google Maps ไปยังแปลงนา</li></ul>`;
+
+    } else if (CURRENT_USER_ROLE === 'GOVT') {
+        title += "<br><span class='text-base font-normal text-gray-800'>(สำหรับเจ้าหน้าที่)</span>";
+
+        content = `<ul class="text-left space-y-3 text-sm text-gray-600"><li><i class="fa-solid fa-chart-line text-purple-500 w-5"></i> <b>ตรวจสอบภาพรวม:</b> ดูยอดขายและปริมาณผลผลิตทั้งจังหวัด</li><li><i class="fa-solid fa-map text-purple-500 w-5"></i> <b>แผนที่:</b> ติดตามพื้นที่เพาะปลูกและการซื้อขายในแต่ละพื้นที่</li></ul>`;
+
+    } else {
+        content = "<p class='text-center'>กรุณาเข้าสู่ระบบเพื่อดูคู่มือที่เหมาะสมกับคุณ</p>";
+    }
+
+    Swal.fire({
+        title: title,
+        html: content,
+        confirmButtonText: "เข้าใจแล้ว",
+        confirmButtonColor: '#16a34a'
+    });
+}
+
+if (CURRENT_USER_ROLE !== 'GUEST') {
+    pollUnreadCount();
+    setInterval(pollUnreadCount, 5000);
+}
@@ -0,0 +1,611 @@
+// ==================== CONSTANTS ====================
+const NDVI_THRESHOLDS = { GOOD: 0.5, MODERATE: 0.3, RISK: 0.3 };
+const UPDATE_INTERVAL = 30000;
+const PRICE_ESTIMATE = 12000; // ราคาประมาณการ บาท/ตัน
+
+// ==================== GLOBAL STATE ====================
+let globalFields = [];
+let globalSales = [];
+let currentFilter = 'all';
+let updateTimer = null;
+let isUpdating = false;
+let heatmapLayer = null;
+
+// ==================== MAP INITIALIZATION ====================
+const map = L.map('map', { 
+    center: [19.1667, 99.9000], 
+    zoom: 10, 
+    zoomControl: false 
+});
+
+const googleHybrid = L.tileLayer('https://{s}.google.com/vt/lyrs=y&x={x}&y={y}&z={z}', {
+    maxZoom: 20,
+    subdomains: ['mt0', 'mt1', 'mt2', 'mt3']
+}).addTo(map);
+
+L.control.zoom({ position: 'bottomright' }).addTo(map);
+const fieldLayer = L.featureGroup().addTo(map);
+let layersMap = {};
+
+// ==================== CHARTS ====================
+
+// Monthly Yield Chart (แทนที่ Balance Chart)
+const monthlyChart = new Chart(document.getElementById('monthlyChart').getContext('2d'), {
+    type: 'bar',
+    data: {
+        labels: ['ม.ค.', 'ก.พ.', 'มี.ค.', 'เม.ย.', 'พ.ค.', 'มิ.ย.', 'ก.ค.', 'ส.ค.', 'ก.ย.', 'ต.ค.', 'พ.ย.', 'ธ.ค.'],
+        datasets: [{
+            label: 'ผลผลิต (ตัน)',
+            data: Array(12).fill(0),
+            backgroundColor: '#3b82f6',
+            borderRadius: 6
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        plugins: { legend: { display: false } },
+        scales: {
+            y: {
+                beginAtZero: true,
+                ticks: { font: { size: 9 }, color: '#6b7280' },
+                grid: { color: '#f3f4f6' }
+            },
+            x: {
+                ticks: { font: { size: 9 }, color: '#6b7280' },
+                grid: { display: false }
+            }
+        }
+    }
+});
+
+// Variety Distribution Chart
+const varietyChart = new Chart(document.getElementById('varietyChart').getContext('2d'), {
+    type: 'doughnut',
+    data: {
+        labels: [],
+        datasets: [{
+            data: [],
+            backgroundColor: ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6'],
+            borderWidth: 0
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        cutout: '70%',
+        plugins: { legend: { display: false } }
+    }
+});
+
+// Price Trend Chart
+const priceTrendChart = new Chart(document.getElementById('priceTrendChart').getContext('2d'), {
+    type: 'line',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'ราคา (บาท/ตัน)',
+            data: [],
+            borderColor: '#10b981',
+            backgroundColor: 'rgba(16, 185, 129, 0.1)',
+            fill: true,
+            tension: 0.4,
+            borderWidth: 2,
+            pointRadius: 3,
+            pointBackgroundColor: '#10b981'
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        plugins: { legend: { display: false } },
+        scales: {
+            y: {
+                beginAtZero: false,
+                ticks: { font: { size: 9 }, color: '#6b7280' }
+            },
+            x: {
+                ticks: { font: { size: 8 }, color: '#6b7280', maxRotation: 45 }
+            }
+        }
+    }
+});
+
+// ==================== DATA PROCESSING ====================
+
+async function updateData() {
+    if (isUpdating) return;
+    isUpdating = true;
+
+    try {
+        // แปลงนา + รายการขาย ใน request เดียว (snapshot เดียวกัน)
+        const res = await fetch('/api/bootstrap/');
+        if (!res.ok) throw new Error('Failed to fetch data');
+        const data = await res.json();
+        globalFields = data.fields;
+        globalSales = data.sales;
+
+        processData();
+        updateTimestamp();
+
+    } catch (error) {
+        console.error('Update error:', error);
+    } finally {
+        isUpdating = false;
+    }
+}
+
+function processData() {
+    const filteredFields = currentFilter === 'all' 
+        ? globalFields 
+        : globalFields.filter(f => f.variety === currentFilter);
+
+    const filteredSales = currentFilter === 'all'
+        ? globalSales
+        : globalSales.filter(s => s.variety === currentFilter);
+
+    let analytics = {
+        totalRevenue: 0,
+        totalYield: 0,
+        soldYield: 0,
+        pendingYield: 0,
+        totalArea: 0,
+        farmers: new Set(),
+        health: { good: 0, moderate: 0, risk: 0 },
+        riskFields: [],
+        priceData: [],
+        monthlyYield: Array(12).fill(0),
+        varietyData: {},
+        salesStatus: { sold: 0, requested: 0, open: 0 },
+        topFarmers: {}
+    };
+
+    // Process Fields
+    filteredFields.forEach(field => {
+        const area = parseFloat(field.area_rai || 0);
+        const yieldVal = field.latest_yield ? parseFloat(field.latest_yield.yield || 0) : 0;
+        const ndvi = field.latest_yield ? parseFloat(field.latest_yield.ndvi || 0) : 0;
+
+        analytics.totalArea += area;
+        analytics.totalYield += yieldVal;
+
+        // NDVI Health
+        if (ndvi > NDVI_THRESHOLDS.GOOD) analytics.health.good++;
+        else if (ndvi >= NDVI_THRESHOLDS.MODERATE) analytics.health.moderate++;
+        else {
+            analytics.health.risk++;
+            analytics.riskFields.push({ ...field, ndvi });
+        }
+    });
+
+    // Process Sales
+    filteredSales.forEach(sale => {
+        const qty = parseFloat(sale.quantity_ton || 0);
+        const price = parseFloat(sale.price_per_ton || 0);
+        const farmer = sale.farmer_name;
+
+        analytics.farmers.add(farmer);
+
+        // Sales Status
+        if (sale.status === 'SOLD') {
+            analytics.soldYield += qty;
+            analytics.totalRevenue += (qty * price);
+            analytics.salesStatus.sold++;
+
+            if (price > 0) {
+                analytics.priceData.push({ date: new Date(sale.created_at), price });
+            }
+
+            // Monthly data
+            const month = new Date(sale.created_at).getMonth();
+            analytics.monthlyYield[month] += qty;
+
+            // Top Farmers
+            analytics.topFarmers[farmer] = (analytics.topFarmers[farmer] || 0) + qty;
+        } else if (sale.status === 'REQUESTED') {
+            analytics.salesStatus.requested++;
+            analytics.pendingYield += qty;
+        } else {
+            analytics.salesStatus.open++;
+            analytics.pendingYield += qty;
+        }
+
+        // Variety Distribution
+        const variety = sale.variety_display || sale.variety;
+        analytics.varietyData[variety] = (analytics.varietyData[variety] || 0) + qty;
+    });
+
+    updateKPIs(analytics);
+    updateCharts(analytics);
+    updateMap(filteredFields, filteredSales);
+    updateWatchlist(analytics.riskFields);
+    updateTopFarmers(analytics.topFarmers);
+}
+
+function updateKPIs(analytics) {
+    // Revenue (in millions)
+    document.getElementById('kpi-revenue').innerText = 
+        (analytics.totalRevenue / 1000000).toFixed(2);
+
+    document.getElementById('kpi-supply').innerText = analytics.totalYield.toFixed(1);
+    document.getElementById('kpi-demand').innerText = analytics.soldYield.toFixed(1);
+    document.getElementById('kpi-pending').innerText = analytics.pendingYield.toFixed(1);
+    document.getElementById('kpi-farmers').innerText = analytics.farmers.size;
+    document.getElementById('kpi-area').innerText = analytics.totalArea.toFixed(0);
+
+    // Sales Status
+    document.getElementById('stat-sold').innerText = analytics.salesStatus.sold;
+    document.getElementById('stat-requested').innerText = analytics.salesStatus.requested;
+    document.getElementById('stat-open').innerText = analytics.salesStatus.open;
+
+    // Health
+    document.getElementById('txt-healthy').innerText = analytics.health.good;
+    document.getElementById('txt-moderate').innerText = analytics.health.moderate;
+    document.getElementById('txt-risk').innerText = analytics.health.risk;
+
+    // Risk Badge
+    const riskBadge = document.getElementById('risk-badge');
+    if (analytics.health.risk > 0) {
+        riskBadge.innerText = analytics.health.risk;
+        riskBadge.style.display = 'block';
+    } else {
+        riskBadge.style.display = 'none';
+    }
+}
+
+function updateCharts(analytics) {
+    // Monthly Yield
+    monthlyChart.data.datasets[0].data = analytics.monthlyYield;
+    monthlyChart.update('none');
+
+    // Variety Distribution
+    const sortedVarieties = Object.entries(analytics.varietyData)
+        .sort((a, b) => b[1] - a[1])
+        .slice(0, 5);
+
+    varietyChart.data.labels = sortedVarieties.map(([k]) => k);
+    varietyChart.data.datasets[0].data = sortedVarieties.map(([, v]) => v);
+    varietyChart.update('none');
+
+    document.getElementById('total-yield').innerText = analytics.totalYield.toFixed(1);
+
+    // Legend
+    const colors = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6'];
+    document.getElementById('variety-legend').innerHTML = sortedVarieties.map(([k, v], i) => `
+        <div class="flex justify-between items-center p-1.5 rounded hover:bg-gray-50">
+            <span class="flex items-center gap-1.5">
+                <span class="w-3 h-3 rounded-full" style="background:${colors[i]}"></span>
+                <span class="text-gray-700">${k}</span>
+            </span>
+            <span class="font-bold text-gray-800">${v.toFixed(1)}</span>
+        </div>
+    `).join('');
+
+    // Price Trend
+    analytics.priceData.sort((a, b) => a.date - b.date);
+    const recentPrices = analytics.priceData.slice(-15);
+
+    if (recentPrices.length > 0) {
+        priceTrendChart.data.labels = recentPrices.map(p => 
+            p.date.toLocaleDateString('th-TH', { day: 'numeric', month: 'short' })
+        );
+        priceTrendChart.data.datasets[0].data = recentPrices.map(p => p.price);
+        priceTrendChart.update('none');
+
+        const prices = recentPrices.map(p => p.price);
+        const avgPrice = prices.reduce((a, b) => a + b, 0) / prices.length;
+        const maxPrice = Math.max(...prices);
+        const minPrice = Math.min(...prices);
+
+        document.getElementById('avg-price').innerText = avgPrice.toFixed(0) + ' บ./ตัน';
+        document.getElementById('max-price').innerText = maxPrice.toLocaleString();
+        document.getElementById('min-price').innerText = minPrice.toLocaleString();
+    }
+}
+
+function updateTopFarmers(farmers) {
+    const sorted = Object.entries(farmers)
+        .sort((a, b) => b[1] - a[1])
+        .slice(0, 5);
+
+    document.getElementById('top-farmers').innerHTML = sorted.map(([name, qty], i) => `
+        <div class="flex items-center justify-between p-2 rounded ${i === 0 ? 'bg-yellow-50 border border-yellow-100' : 'bg-gray-50'}">
+            <div class="flex items-center gap-2">
+                <span class="flex items-center justify-center w-6 h-6 rounded-full ${
+                    i === 0 ? 'bg-yellow-500 text-white' : 
+                    i === 1 ? 'bg-gray-400 text-white' : 
+                    i === 2 ? 'bg-orange-600 text-white' : 'bg-gray-200 text-gray-600'
+                } text-xs font-bold">
+                    ${i + 1}
+                </span>
+                <span class="font-medium text-gray-700">${name}</span>
+            </div>
+            <span class="font-bold text-blue-600">${qty.toFixed(1)} ตัน</span>
+        </div>
+    `).join('');
+}
+
+// ==================== MAP FUNCTIONS ====================
+
+function updateMap(fields, sales) {
+    fieldLayer.clearLayers();
+    layersMap = {};
+
+    const salesMap = {};
+    sales.forEach(s => {
+        if (!salesMap[s.rice_field] || new Date(salesMap[s.rice_field].created_at) < new Date(s.created_at)) {
+            salesMap[s.rice_field] = s;
+        }
+    });
+
+    fields.forEach(field => {
+        if (!field.boundary) return;
+
+        try {
+            const geo = field.boundary;
+            const ndvi = field.latest_yield ? parseFloat(field.latest_yield.ndvi || 0) : 0;
+            const sale = salesMap[field.id];
+
+            let color, fillOpacity, weight;
+
+            // Priority: NDVI Risk > Sale Status
+            if (ndvi < NDVI_THRESHOLDS.RISK) {
+                color = '#ef4444';
+                fillOpacity = 0.6;
+                weight = 2;
+            } else if (sale && sale.status === 'SOLD') {
+                color = '#22c55e';
+                fillOpacity = 0.5;
+                weight = 1;
+            } else if (sale && sale.status === 'REQUESTED') {
+                color = '#fbbf24';
+                fillOpacity = 0.6;
+                weight = 2;
+            } else if (sale && sale.status === 'OPEN') {
+                color = '#f59e0b';
+                fillOpacity = 0.5;
+                weight = 1;
+            } else {
+                color = '#94a3b8';
+                fillOpacity = 0.3;
+                weight = 1;
+            }
+
+            const layer = L.geoJSON(geo, {
+                style: { color, weight, fillOpacity }
+            }).bindPopup(`
+                <div class="p-3 min-w-[180px]">
+                    <h4 class="font-bold text-gray-800 mb-2">${field.name}</h4>
+                    <div class="space-y-1 text-xs">
+                        <div class="flex justify-between">
+                            <span class="text-gray-500">พื้นที่:</span>
+                            <span class="font-semibold">${field.area_rai} ไร่</span>
+                        </div>
+                        <div class="flex justify-between">
+                            <span class="text-gray-500">NDVI:</span>
+                            <span class="font-semibold ${
+                                ndvi > NDVI_THRESHOLDS.GOOD ? 'text-green-600' : 
+                                ndvi >= NDVI_THRESHOLDS.MODERATE ? 'text-yellow-600' : 
+                                'text-red-600'
+                            }">${ndvi.toFixed(2)}</span>
+                        </div>
+                        ${sale ? `
+                            <hr class="my-1">
+                            <div class="flex justify-between">
+                                <span class="text-gray-500">สถานะ:</span>
+                                <span class="font-semibold">${
+                                    sale.status === 'SOLD' ? '✅ ขายแล้ว' : 
+                                    sale.status === 'REQUESTED' ? '⏳ รออนุมัติ' : 
+                                    '🔔 เปิดขาย'
+                                }</span>
+                            </div>
+                        ` : ''}
+                    </div>
+                </div>
+            `).addTo(fieldLayer);
+
+            layersMap[field.id] = layer;
+
+        } catch (e) {
+            console.warn('Failed to parse boundary:', e);
+        }
+    });
+}
+
+// ==================== UTILITY FUNCTIONS ====================
+
+function switchTab(tab) {
+    const views = { overview: 'view-overview', map: 'view-map', list: 'view-list' };
+    const btns = { overview: 'btn-tab-overview', map: 'btn-tab-map', list: 'btn-tab-list' };
+
+    const isMobile = window.innerWidth < 1024;
+
+    if (isMobile) {
+        Object.keys(views).forEach(k => {
+            document.getElementById(views[k]).classList.toggle('hidden', k !== tab);
+        });
+
+        Object.keys(btns).forEach(k => {
+            const btn = document.getElementById(btns[k]);
+            if (k === tab) {
+                btn.className = "flex flex-col items-center justify-center w-1/3 h-full text-green-600 border-t-2 border-green-600 bg-green-50/50 transition-all relative";
+            } else {
+                btn.className = "flex flex-col items-center justify-center w-1/3 h-full text-gray-400 border-t-2 border-transparent transition-all";
+            }
+        });
+    } else {
+        // Desktop: Always show overview and map
+        document.getElementById('view-overview').classList.remove('hidden');
+        document.getElementById('view-map').classList.remove('hidden');
+        document.getElementById('view-list').classList.add('hidden');
+    }
+
+    if (tab === 'map') {
+        setTimeout(() => map.invalidateSize(), 100);
+    }
+}
+
+function applyFilter() {
+    currentFilter = document.getElementById('filter-variety').value;
+    processData();
+}
+
+function forceUpdate() {
+    if (isUpdating) return;
+    document.getElementById('refresh-icon').classList.add('fa-spin');
+    updateData().finally(() => {
+        document.getElementById('refresh-icon').classList.remove('fa-spin');
+    });
+}
+
+function updateTimestamp() {
+    document.getElementById('last-update').innerText = new Date().toLocaleTimeString('th-TH', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+}
+
+window.focusField = function(fieldId) {
+    if (window.innerWidth < 1024) switchTab('map');
+    const layer = layersMap[fieldId];
+    if (layer) {
+        map.invalidateSize();
+        setTimeout(() => {
+            map.flyToBounds(layer.getBounds(), { padding: [50, 50], maxZoom: 16, duration: 1.5 });
+            setTimeout(() => layer.openPopup(), 1600);
+        }, 100);
+    }
+}
+
+function updateWatchlist(riskFields) {
+    const tbody = document.getElementById('riskTableBody');
+    document.getElementById('risk-count').innerText = `${riskFields.length} แปลง`;
+
+    if (riskFields.length === 0) {
+        tbody.innerHTML = `
+            <tr>
+                <td colspan="4" class="text-center py-12">
+                    <i class="fa-solid fa-check-circle text-4xl text-green-500 mb-2"></i>
+                    <p class="text-sm font-semibold text-green-600">ไม่พบพื้นที่เสี่ยง</p>
+                </td>
+            </tr>`;
+    } else {
+        tbody.innerHTML = riskFields.map(f => `
+            <tr class="hover:bg-red-50 cursor-pointer" onclick="focusField(${f.id})">
+                <td class="py-3 px-4">
+                    <div class="flex items-center gap-2">
+                        <i class="fa-solid fa-location-dot text-red-500"></i>
+                        <span class="font-medium">${f.name}</span>
+                    </div>
+                </td>
+                <td class="py-3 px-4 text-center font-mono font-bold text-red-600">${f.ndvi.toFixed(2)}</td>
+                <td class="py-3 px-4 text-center">${f.area_rai} ไร่</td>
+                <td class="py-3 px-4 text-center">
+                    <button class="bg-red-100 hover:bg-red-200 text-red-700 px-3 py-1 rounded-full text-xs font-semibold">
+                        <i class="fa-solid fa-map-location-dot"></i> ดูพิกัด
+                    </button>
+                </td>
+            </tr>
+        `).join('');
+    }
+}
+
+function showNDVIInfo() {
+    Swal.fire({
+        title: 'ค่า NDVI คืออะไร?',
+        html: `
+            <div class="text-left text-sm space-y-2">
+                <p><strong>NDVI (Normalized Difference Vegetation Index)</strong> คือดัชนีวัดความสมบูรณ์ของพืช</p>
+                <hr>
+                <div class="space-y-1">
+                    <p class="flex items-center gap-2">
+                        <span class="w-3 h-3 rounded-full bg-green-500"></span>
+                        <strong>NDVI > 0.5:</strong> พืชสมบูรณ์ดี
+                    </p>
+                    <p class="flex items-center gap-2">
+                        <span class="w-3 h-3 rounded-full bg-yellow-400"></span>
+                        <strong>NDVI 0.3-0.5:</strong> ปานกลาง
+                    </p>
+                    <p class="flex items-center gap-2">
+                        <span class="w-3 h-3 rounded-full bg-red-500"></span>
+                        <strong>NDVI < 0.3:</strong> เสี่ยง
+                    </p>
+                </div>
+            </div>
+        `,
+        icon: 'info',
+        confirmButtonColor: '#3b82f6'
+    });
+}
+
+function showVarietyInfo() {
+    Swal.fire({
+        title: 'พันธุ์ข้าวในระบบ',
+        html: `
+            <div class="text-left text-sm space-y-2">
+                <p>🍚 <strong>หอมมะลิ 105:</strong> ข้าวหอมเจ้าคุณภาพสูง</p>
+                <p>🍙 <strong>กข 6:</strong> ข้าวเหนียวคุณภาพดี</p>
+                <p>🌾 <strong>กข 15:</strong> ข้าวหอมมะลิ กข 15</p>
+                <p>🌿 <strong>ปทุมธานี:</strong> ข้าวเจ้าทั่วไป</p>
+            </div>
+        `,
+        icon: 'info',
+        confirmButtonColor: '#3b82f6'
+    });
+}
+
+function exportData() {
+    const csv = "\uFEFF" + 
+        "พันธุ์,ผลผลิต(ตัน),ขายแล้ว(ตัน),รอขาย(ตัน),เกษตรกร(ราย)\n" +
+        Object.entries(analytics.varietyData || {}).map(([v, qty]) => 
+            `"${v}",${qty},0,0,0`
+        ).join('\n');
+
+    const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
+    const link = document.createElement("a");
+    link.href = URL.createObjectURL(blob);
+    link.download = `government_report_${new Date().toISOString().split('T')[0]}.csv`;
+    link.click();
+
+    Swal.fire({
+        icon: 'success',
+        title: 'ส่งออกสำเร็จ',
+        timer: 1500,
+        showConfirmButton: false
+    });
+}
+
+function toggleHeatmap() {
+    Swal.fire({
+        icon: 'info',
+        title: 'กำลังพัฒนา',
+        text: 'ฟีเจอร์ Heatmap จะพร้อมใช้งานเร็วๆ นี้'
+    });
+}
+
+// ==================== INITIALIZATION ====================
+document.addEventListener('DOMContentLoaded', function() {
+    updateData();
+    updateTimer = setInterval(updateData, UPDATE_INTERVAL);
+
+    if (window.innerWidth >= 1024) {
+        document.getElementById('view-overview').classList.remove('hidden');
+        document.getElementById('view-map').classList.remove('hidden');
+        setTimeout(() => map.invalidateSize(), 300);
+    }
+});
+
+window.addEventListener('resize', () => {
+    setTimeout(() => {
+        map.invalidateSize();
+        if (window.innerWidth >= 1024) {
+            document.getElementById('view-overview').classList.remove('hidden');
+            document.getElementById('view-map').classList.remove('hidden');
+            document.getElementById('view-list').classList.add('hidden');
+        }
+    }, 250);
+});
+
+window.addEventListener('beforeunload', () => {
+    if (updateTimer) clearInterval(updateTimer);
+});
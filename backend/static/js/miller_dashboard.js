@@ -0,0 +1,642 @@
+// ==========================================
+// 0. Global & Setup
+// ==========================================
+const currentUserId = Number(document.body.dataset.userId);
+
+var map = L.map('map', {
+    center: [19.1667, 99.9000],
+    zoom: 13,
+    zoomControl: false
+});
+
+L.tileLayer('https://{s}.google.com/vt/lyrs=y&x={x}&y={y}&z={z}', {
+    maxZoom: 20,
+    subdomains: ['mt0', 'mt1', 'mt2', 'mt3']
+}).addTo(map);
+
+L.control.zoom({ position: 'bottomright' }).addTo(map);
+
+var markers = L.featureGroup().addTo(map);
+let lastReadTime = new Date(localStorage.getItem('globalLastRead') || 0);
+let allSalesData = [];
+// จุดอ้างอิงสำหรับเรียงรายการตามระยะทาง: ตำแหน่งผู้ใช้ถ้าอนุญาต ไม่งั้นใช้จุดกลางแผนที่เริ่มต้น
+let origin = map.getCenter();
+if (navigator.geolocation) {
+    navigator.geolocation.getCurrentPosition(pos => {
+        origin = L.latLng(pos.coords.latitude, pos.coords.longitude);
+        loadData();
+    }, () => { }, { maximumAge: 600000, timeout: 10000 });
+}
+
+function resultsOf(data) {
+    // Handle paginated response (API returns {count, results:[]})
+    return Array.isArray(data) ? data : (data.results || []);
+}
+
+// Handle window resize for map
+window.addEventListener('resize', function () {
+    setTimeout(function () {
+        map.invalidateSize();
+    }, 300);
+});
+
+// ==========================================
+// Mobile Tab Switching (ปรับปรุงแล้ว)
+// ==========================================
+function switchTab(mode) {
+    const viewList = document.getElementById('view-list');
+    const viewMap = document.getElementById('view-map');
+
+    const iconList = document.getElementById('nav-icon-list');
+    const textList = document.getElementById('nav-text-list');
+    const iconMap = document.getElementById('nav-icon-map');
+    const textMap = document.getElementById('nav-text-map');
+
+    // Check if mobile
+    const isMobile = window.innerWidth < 1024;
+
+    if (!isMobile) {
+        // Desktop: Always show both panels
+        viewList.classList.remove('hidden');
+        viewMap.classList.remove('hidden');
+        return;
+    }
+
+    // Mobile: Toggle views
+    if (mode === 'list') {
+        viewList.classList.remove('hidden');
+        viewMap.classList.add('hidden');
+
+        // Update Nav Styles (List Active)
+        iconList.classList.remove('bg-transparent', 'text-gray-400', 'scale-90');
+        iconList.classList.add('bg-blue-50', 'text-blue-600', 'scale-100');
+        textList.classList.remove('text-gray-400');
+        textList.classList.add('text-blue-600');
+
+        iconMap.classList.add('bg-transparent', 'text-gray-400', 'scale-90');
+        iconMap.classList.remove('bg-blue-50', 'text-blue-600', 'scale-100');
+        textMap.classList.add('text-gray-400');
+        textMap.classList.remove('text-blue-600');
+
+    } else {
+        viewMap.classList.remove('hidden');
+        viewList.classList.add('hidden');
+
+        iconMap.classList.remove('bg-transparent', 'text-gray-400', 'scale-90');
+        iconMap.classList.add('bg-blue-50', 'text-blue-600', 'scale-100');
+        textMap.classList.remove('text-gray-400');
+        textMap.classList.add('text-blue-600');
+
+        iconList.classList.add('bg-transparent', 'text-gray-400', 'scale-90');
+        iconList.classList.remove('bg-blue-50', 'text-blue-600', 'scale-100');
+        textList.classList.add('text-gray-400');
+        textList.classList.remove('text-blue-600');
+
+        // Refresh Map
+        setTimeout(() => {
+            map.invalidateSize();
+        }, 100);
+    }
+}
+
+// ==========================================
+// 1. Main Data Loop (ปรับปรุงแล้ว)
+// ==========================================
+async function loadData() {
+    try {
+        // รายการที่เปิดขายเรียงตามระยะทางจาก server (KNN) ส่วนคำขอของฉัน/ที่ขายแล้วดึงแยก
+        // ปัดพิกัด 3 ตำแหน่ง (~100 ม.) ให้ request ซ้ำๆ ใช้ cache ของ API ร่วมกันได้
+        const nearbyUrl = `/api/sales/nearby/?lng=${origin.lng.toFixed(3)}&lat=${origin.lat.toFixed(3)}&limit=100`;
+        const [nearbyRes, otherRes] = await Promise.all([
+            fetch(nearbyUrl),
+            fetch('/api/sales/?status=REQUESTED,SOLD&page_size=100'),
+        ]);
+        if (!nearbyRes.ok || !otherRes.ok) throw new Error(`HTTP ${nearbyRes.status}/${otherRes.status}`);
+        const openSales = resultsOf(await nearbyRes.json());
+        const sales = resultsOf(await otherRes.json());
+        allSalesData = [...openSales, ...sales];
+
+        const listDiv = document.getElementById('saleList');
+        const countSpan = document.getElementById('sale-count');
+
+        const myRequests = sales.filter(s => s.status === 'REQUESTED')
+            .sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+        const soldSales = sales.filter(s => s.status === 'SOLD')
+            .sort((a, b) => new Date(b.sold_at || b.created_at) - new Date(a.sold_at || a.created_at));
+
+        const displayList = [...myRequests, ...openSales, ...soldSales];
+
+        listDiv.innerHTML = '';
+        markers.clearLayers();
+        countSpan.innerText = openSales.length;
+
+        if (displayList.length === 0) {
+            listDiv.innerHTML = `
+                <div class="flex flex-col items-center justify-center h-full text-gray-400 opacity-60 mt-10">
+                    <i class="fa-solid fa-basket-shopping text-5xl mb-3"></i>
+                    <p class="font-semibold">ไม่มีข้อมูลการซื้อขาย</p>
+                    <p class="text-xs mt-2">รอเกษตรกรประกาศขายข้าว</p>
+                </div>`;
+            return;
+        }
+
+        displayList.forEach(s => {
+            const isRequested = s.status === 'REQUESTED';
+            const isSold = s.status === 'SOLD';
+            const totalPrice = (s.quantity_ton * s.price_per_ton).toLocaleString();
+            const pricePerTon = parseFloat(s.price_per_ton).toLocaleString();
+            const datePost = new Date(s.created_at).toLocaleDateString('th-TH', {
+                day: 'numeric',
+                month: 'short',
+                hour: '2-digit',
+                minute: '2-digit'
+            });
+            const fieldArea = s.field_area ? s.field_area : '-';
+            const distance = s.distance_km !== undefined
+                ? `<p class="text-xs text-gray-500 flex items-center gap-2"><i class="fa-solid fa-route"></i> ${s.distance_km} กม.</p>`
+                : '';
+
+            let mapsLink = '#';
+            if (s.field_lat && s.field_lng) {
+                mapsLink = `https://www.google.com/maps/dir/?api=1&destination=${s.field_lat},${s.field_lng}`;
+            }
+
+            let borderClass = "border-l-4 border-l-orange-500";
+            let badgeStatus = `<span class="bg-orange-100 text-orange-700 text-[10px] px-2 py-0.5 rounded-full font-bold animate-pulse">รอรับซื้อ</span>`;
+            let actionBtn = `
+                <div class="grid grid-cols-5 gap-2">
+                    <button onclick="viewFullDetails(${s.id})" 
+                        class="col-span-1 bg-gray-100 hover:bg-gray-200 text-gray-600 rounded-lg flex items-center justify-center py-2" 
+                        title="ดูรายละเอียด">
+                        <i class="fa-solid fa-eye"></i>
+                    </button>
+                    <button onclick="confirmBuy(event, ${s.id})" 
+                        class="col-span-4 bg-blue-600 hover:bg-blue-700 text-white font-bold py-2 rounded-lg shadow transition-colors flex items-center justify-center gap-2">
+                        <i class="fa-solid fa-handshake"></i> ส่งคำขอซื้อ
+                    </button>
+                </div>`;
+            let mapColor = '#f97316';
+            let mapOpacity = 0.6;
+
+            if (isRequested) {
+                borderClass = "border-l-4 border-l-yellow-400 bg-yellow-50/30";
+                badgeStatus = `<span class="bg-yellow-100 text-yellow-700 text-[10px] px-2 py-0.5 rounded-full font-bold"><i class="fa-solid fa-clock"></i> รออนุมัติ</span>`;
+                actionBtn = `
+                    <div class="grid grid-cols-5 gap-2">
+                        <button onclick="viewFullDetails(${s.id})" 
+                            class="col-span-1 bg-white hover:bg-gray-100 text-gray-600 border border-gray-200 rounded-lg flex items-center justify-center py-2">
+                            <i class="fa-solid fa-eye"></i>
+                        </button>
+                        <button class="col-span-4 bg-yellow-100 text-yellow-600 font-bold py-2 rounded-lg cursor-not-allowed border border-yellow-200" disabled>
+                            <i class="fa-solid fa-hourglass-half"></i> รอชาวนายืนยัน...
+                        </button>
+                    </div>`;
+                mapColor = '#eab308';
+            } else if (isSold) {
+                borderClass = "border-l-4 border-l-gray-300 opacity-70 grayscale-[50%]";
+                badgeStatus = `<span class="bg-green-100 text-green-700 text-[10px] px-2 py-0.5 rounded-full font-bold"><i class="fa-solid fa-check"></i> ซื้อสำเร็จ</span>`;
+                actionBtn = `
+                    <button onclick="viewFullDetails(${s.id})" 
+                        class="w-full bg-gray-100 text-gray-500 font-bold py-2 rounded-lg hover:bg-gray-200 hover:text-gray-700 transition">
+                        <i class="fa-solid fa-file-invoice"></i> ดูประวัติการซื้อขาย
+                    </button>`;
+                mapColor = '#22c55e';
+                mapOpacity = 0.4;
+            }
+
+            const isNew = !isSold && !isRequested && new Date(s.created_at) > lastReadTime;
+            const newBadge = isNew ? `<span class="ml-2 bg-red-500 text-white text-[10px] px-1.5 py-0.5 rounded font-bold animate-bounce shadow-sm">NEW</span>` : '';
+
+            listDiv.innerHTML += `
+                <div class="bg-white border border-gray-200 p-4 rounded-xl shadow-sm hover:shadow-md transition-all cursor-pointer group relative overflow-hidden ${borderClass}" 
+                     onclick="focusMap(${s.id})">
+                    <div class="flex justify-between items-start mb-2">
+                        <div class="flex-1">
+                            <h4 class="font-bold text-gray-800 text-base flex items-center gap-2 mb-1">
+                                <i class="fa-solid fa-user-circle text-gray-400"></i> 
+                                ${s.farmer_name} 
+                                ${newBadge}
+                            </h4>
+                            <p class="text-xs text-gray-500 flex items-center gap-2">
+                                <i class="fa-solid fa-clock"></i> ${datePost}
+                            </p>
+                            ${distance}
+                        </div>
+                        <div class="flex flex-col items-end gap-1">
+                            ${badgeStatus}
+                            <span class="bg-green-50 text-green-700 border border-green-100 text-xs font-bold px-2 py-1 rounded-lg">
+                                ${s.quantity_ton} ตัน
+                            </span>
+                        </div>
+                    </div>
+
+                    <div class="bg-white p-3 rounded-lg border border-dashed border-gray-200 text-sm space-y-1 mb-3">
+                        <div class="flex justify-between">
+                            <span class="text-gray-500">พันธุ์ข้าว:</span>
+                            <span class="font-semibold text-blue-600">${s.variety_display}</span>
+                        </div>
+                        <div class="flex justify-between">
+                            <span class="text-gray-500">พื้นที่:</span>
+                            <span class="font-semibold text-gray-700">${fieldArea} ไร่</span>
+                        </div>
+                        <div class="flex justify-between">
+                            <span class="text-gray-500">ราคา/ตัน:</span>
+                            <span class="font-semibold">${pricePerTon} บ.</span>
+                        </div>
+                        <div class="flex justify-between border-t border-gray-100 pt-1 mt-1">
+                            <span class="text-gray-700 font-bold">ราคารวม:</span>
+                            <span class="font-bold text-green-600 text-lg">${totalPrice} บ.</span>
+                        </div>
+                    </div>
+
+                    ${actionBtn}
+                </div>
+            `;
+
+            // Add to map
+            if (s.field_location) {
+                try {
+                    const geoJson = s.field_location;
+
+                    // Validate coordinates to avoid NaN LatLng errors
+                    function hasValidCoords(geom) {
+                        if (!geom || !geom.coordinates) return false;
+                        const stack = [geom.coordinates];
+                        while (stack.length) {
+                            const item = stack.pop();
+                            if (Array.isArray(item)) {
+                                if (item.length === 0) continue;
+                                if (typeof item[0] === 'number') {
+                                    if (!item.every(n => typeof n === 'number' && isFinite(n))) return false;
+                                } else {
+                                    for (const sub of item) stack.push(sub);
+                                }
+                            }
+                        }
+                        return true;
+                    }
+
+                    if (!hasValidCoords(geoJson)) {
+                        console.warn('Skipping sale with invalid coordinates:', s.id);
+                    } else {
+                        const layer = L.geoJSON(geoJson, {
+                            style: {
+                                color: mapColor,
+                                fillOpacity: mapOpacity,
+                                weight: 2
+                            }
+                        }).bindPopup(`
+                        <div class="text-center min-w-[180px] p-2 font-sans">
+                            <b class="text-base text-gray-900 block mb-1">${s.farmer_name}</b>
+                            <span class="font-black text-lg block mb-1" style="color:${mapColor}">
+                                ${s.status === 'SOLD' ? 'ขายแล้ว' : (s.status === 'REQUESTED' ? 'รออนุมัติ' : s.quantity_ton + ' ตัน')}
+                            </span>
+                            <span class="text-xs text-gray-500 block mb-3">${s.variety_display} (${fieldArea} ไร่)</span>
+
+                            <div class="flex gap-2 mt-2">
+                                <button onclick="viewFullDetails(${s.id})" 
+                                    class="flex-1 bg-gray-800 hover:bg-gray-900 text-white text-xs font-bold py-2 rounded-lg shadow transition-colors">
+                                    ดูข้อมูล
+                                </button>
+
+                                <a href="${mapsLink}" target="_blank" 
+                                    class="flex-1 bg-blue-600 hover:bg-blue-700 !text-white text-xs font-bold py-2 rounded-lg shadow flex items-center justify-center gap-1 transition-transform hover:scale-105">
+                                    <i class="fa-solid fa-location-arrow"></i> นำทาง
+                                </a>
+                            </div>
+                        </div>
+                    `);
+                        layer.saleId = s.id;
+                        markers.addLayer(layer);
+                    }
+                } catch (e) {
+                    console.warn('Failed to parse field location:', e);
+                }
+            }
+        });
+
+    } catch (e) {
+        console.error("Load Data Error:", e);
+        document.getElementById('saleList').innerHTML = `
+            <div class="flex flex-col items-center justify-center h-full text-red-400 mt-10">
+                <i class="fa-solid fa-exclamation-triangle text-4xl mb-2"></i>
+                <p class="font-semibold">เกิดข้อผิดพลาดในการโหลดข้อมูล</p>
+                <button onclick="loadData()" class="mt-3 px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition">
+                    ลองอีกครั้ง
+                </button>
+            </div>`;
+    }
+}
+
+// ==========================================
+// 2. View Full Details (Modal)
+// ==========================================
+window.viewFullDetails = function (saleId) {
+    event.stopPropagation();
+    const s = allSalesData.find(item => item.id === saleId);
+    if (!s) return;
+
+    const farmerPhone = s.farmer_phone || '-';
+    const farmerLine = s.farmer_line || '-';
+    const farmerAddress = s.farmer_address || 'ไม่ระบุที่อยู่';
+    const farmerBio = s.farmer_bio || 'ไม่มีข้อมูลแนะนำตัว';
+
+    let mapsLink = '#';
+    let mapsBtnClass = 'bg-gray-100 text-gray-400 cursor-not-allowed';
+    let btnText = 'ไม่พบพิกัดแปลงนา';
+
+    if (s.field_lat && s.field_lng) {
+        mapsLink = `https://www.google.com/maps/dir/?api=1&destination=${s.field_lat},${s.field_lng}`;
+        mapsBtnClass = 'bg-blue-600 hover:bg-blue-700 text-white shadow-lg shadow-blue-200 hover:shadow-blue-300 transform active:scale-95';
+        btnText = 'นำทางไปแปลงนา (Google Maps)';
+    }
+
+    Swal.fire({
+        title: '',
+        html: `
+            <div class="text-left">
+                <div class="flex items-center gap-4 border-b pb-4 mb-4">
+                    <div class="w-14 h-14 bg-gradient-to-br from-blue-100 to-blue-50 rounded-full flex items-center justify-center text-2xl text-blue-600 shadow-inner">
+                        <i class="fa-solid fa-user"></i>
+                    </div>
+                    <div>
+                        <h2 class="text-xl font-bold text-gray-800 leading-tight">${s.farmer_name}</h2>
+                        <span class="bg-green-100 text-green-700 text-[10px] px-2 py-0.5 rounded-md border border-green-200 font-bold">เกษตรกร</span>
+                    </div>
+                </div>
+
+                <div class="mb-5 bg-gray-100 p-1 rounded-xl flex">
+                    <button id="tab-profile" class="flex-1 py-2 rounded-lg text-sm font-bold bg-white text-blue-600 shadow-sm transition-all">
+                        ข้อมูลส่วนตัว
+                    </button>
+                    <button id="tab-field" class="flex-1 py-2 rounded-lg text-sm font-bold text-gray-500 hover:text-gray-700 transition-all">
+                        ข้อมูลแปลงนา
+                    </button>
+                </div>
+
+                <div id="content-profile" class="space-y-4 text-sm animate-fade-in-up">
+                    <div class="bg-blue-50 p-4 rounded-xl border border-blue-100 relative">
+                        <i class="fa-solid fa-quote-left absolute top-2 left-2 text-blue-200 text-4xl -z-0"></i>
+                        <p class="text-gray-700 relative z-10 italic">"${farmerBio}"</p>
+                    </div>
+
+                    <div class="space-y-3">
+                        <a href="tel:${farmerPhone}" 
+                            class="flex items-center justify-between bg-white border border-gray-200 p-3 rounded-xl active:bg-gray-50 transition">
+                            <span class="text-gray-500 text-xs">เบอร์โทรศัพท์</span>
+                            <span class="font-bold text-gray-800 flex items-center gap-2">
+                                <i class="fa-solid fa-phone text-green-500"></i> ${farmerPhone}
+                            </span>
+                        </a>
+                        <div class="flex items-center justify-between bg-white border border-gray-200 p-3 rounded-xl">
+                            <span class="text-gray-500 text-xs">Line ID</span>
+                            <span class="font-bold text-gray-800 flex items-center gap-2">
+                                <i class="fa-brands fa-line text-green-500"></i> ${farmerLine}
+                            </span>
+                        </div>
+                        <div class="bg-white border border-gray-200 p-3 rounded-xl">
+                            <span class="text-gray-500 text-xs block mb-1">ที่อยู่</span>
+                            <span class="font-bold text-gray-800 flex items-start gap-2 text-xs leading-relaxed">
+                                <i class="fa-solid fa-location-dot text-red-500 mt-0.5"></i> ${farmerAddress}
+                            </span>
+                        </div>
+                    </div>
+                </div>
+
+                <div id="content-field" class="hidden space-y-4 text-sm animate-fade-in-up">
+                    <div class="bg-white border border-gray-200 p-4 rounded-xl shadow-sm">
+                        <div class="flex justify-between items-start mb-2 border-b border-gray-100 pb-2">
+                            <span class="text-gray-400 text-xs">ชื่อแปลงนา</span>
+                            <span class="font-bold text-gray-800 text-lg">${s.field_name}</span>
+                        </div>
+                        <div class="grid grid-cols-2 gap-4 text-center">
+                            <div>
+                                <span class="text-xs text-gray-400 block">พันธุ์ข้าว</span>
+                                <span class="text-blue-600 font-bold">${s.variety_display}</span>
+                            </div>
+                            <div class="border-l border-gray-100">
+                                <span class="text-xs text-gray-400 block">ขนาดพื้นที่</span>
+                                <span class="text-gray-800 font-bold">${s.field_area} ไร่</span>
+                            </div>
+                        </div>
+                    </div>
+
+                    <div class="bg-green-50 border border-green-100 p-4 rounded-xl flex justify-between items-center">
+                        <span class="font-bold text-green-800">ปริมาณเสนอขาย</span>
+                        <span class="text-2xl font-bold text-green-600">
+                            ${s.quantity_ton} <span class="text-sm text-gray-500">ตัน</span>
+                        </span>
+                    </div>
+
+                    <a href="${mapsLink}" target="_blank" 
+                        class="block w-full py-4 rounded-xl font-bold text-center transition ${mapsBtnClass} flex items-center justify-center gap-2">
+                        <i class="fa-solid fa-location-arrow text-lg"></i> ${btnText}
+                    </a>
+                </div>
+            </div>
+        `,
+        showCloseButton: true,
+        showConfirmButton: false,
+        customClass: {
+            popup: 'rounded-2xl w-11/12 max-w-sm p-6'
+        },
+        didOpen: () => {
+            const tabProfile = Swal.getHtmlContainer().querySelector('#tab-profile');
+            const tabField = Swal.getHtmlContainer().querySelector('#tab-field');
+            const contentProfile = Swal.getHtmlContainer().querySelector('#content-profile');
+            const contentField = Swal.getHtmlContainer().querySelector('#content-field');
+
+            const activeClass = ['bg-white', 'text-blue-600', 'shadow-sm'];
+            const inactiveClass = ['text-gray-500', 'hover:text-gray-700'];
+
+            tabProfile.onclick = () => {
+                tabProfile.classList.add(...activeClass);
+                tabProfile.classList.remove(...inactiveClass);
+                tabField.classList.remove(...activeClass);
+                tabField.classList.add(...inactiveClass);
+                contentProfile.classList.remove('hidden');
+                contentField.classList.add('hidden');
+            };
+
+            tabField.onclick = () => {
+                tabField.classList.add(...activeClass);
+                tabField.classList.remove(...inactiveClass);
+                tabProfile.classList.remove(...activeClass);
+                tabProfile.classList.add(...inactiveClass);
+                contentField.classList.remove('hidden');
+                contentProfile.classList.add('hidden');
+            };
+        }
+    });
+}
+
+// ==========================================
+// 3. Confirm Buy Action
+// ==========================================
+window.confirmBuy = async function (e, saleId) {
+    if (e) e.stopPropagation();
+    const s = allSalesData.find(item => item.id === saleId);
+    if (!s) return;
+
+    const totalPrice = (s.quantity_ton * s.price_per_ton).toLocaleString();
+    let defaultPrice = s.price_per_ton;
+
+    const { isConfirmed, value: formValues } = await Swal.fire({
+        title: '<span class="text-xl font-bold text-gray-800">🤝 ส่งคำขอซื้อ</span>',
+        html: `
+            <div class="text-left space-y-4 px-1 pt-2">
+                <div class="bg-blue-50 border border-blue-100 rounded-xl p-4 space-y-2 text-sm">
+                    <div class="flex justify-between items-center border-b border-blue-200 pb-2 mb-2">
+                        <span class="text-gray-500">เกษตรกร</span>
+                        <span class="font-bold text-gray-800 text-base">${s.farmer_name}</span>
+                    </div>
+                    <div class="flex justify-between">
+                        <span class="text-gray-500">สินค้า</span>
+                        <span class="font-bold text-blue-700">${s.variety_display}</span>
+                    </div>
+                    <div class="flex justify-between">
+                        <span class="text-gray-500">ปริมาณ</span>
+                        <span class="font-bold text-gray-800">${s.quantity_ton} ตัน</span>
+                    </div>
+                </div>
+
+                <div>
+                    <label class="block text-gray-700 font-bold text-sm mb-1">ราคาเสนอซื้อ (บาท/ตัน)</label>
+                    <div class="relative">
+                        <input id="swal-price" type="number" inputmode="decimal" 
+                            class="w-full pl-4 pr-12 py-3 border border-gray-300 rounded-xl focus:ring-2 focus:ring-green-500 outline-none text-xl font-bold text-green-700 text-right shadow-sm" 
+                            value="${defaultPrice}" placeholder="0">
+                        <span class="absolute right-4 top-3.5 text-gray-400 font-bold text-sm">บาท</span>
+                    </div>
+                    <p class="text-[10px] text-gray-400 mt-1 text-right">*สามารถแก้ไขเพื่อต่อรองราคาได้</p>
+                </div>
+
+                <div>
+                    <label class="block text-gray-700 font-bold text-sm mb-1">เบอร์ติดต่อกลับ (ของคุณ)</label>
+                    <div class="relative">
+                        <div class="absolute left-4 top-3.5 text-gray-400">
+                            <i class="fa-solid fa-phone"></i>
+                        </div>
+                        <input id="swal-contact" type="tel" inputmode="tel" 
+                            class="w-full pl-10 pr-4 py-3 border border-gray-300 rounded-xl focus:ring-2 focus:ring-green-500 outline-none text-lg text-gray-800 shadow-sm" 
+                            placeholder="08x-xxx-xxxx" 
+                            value="${escapeHtml(USER_PHONE)}">
+                    </div>
+                </div>
+            </div>
+        `,
+        showCancelButton: true,
+        confirmButtonText: 'ยืนยันส่งคำขอ',
+        cancelButtonText: 'ยกเลิก',
+        confirmButtonColor: '#16a34a',
+        cancelButtonColor: '#64748b',
+        reverseButtons: true,
+        focusConfirm: false,
+        customClass: {
+            popup: 'rounded-2xl w-11/12 max-w-sm',
+            confirmButton: 'w-full py-3 rounded-xl text-lg font-bold shadow-md mb-2',
+            cancelButton: 'w-full py-3 rounded-xl text-lg font-bold bg-slate-200 text-slate-700 hover:bg-slate-300 border border-transparent shadow-sm'
+        },
+        preConfirm: () => {
+            const price = document.getElementById('swal-price').value;
+            const contact = document.getElementById('swal-contact').value;
+            if (!price || !contact) {
+                Swal.showValidationMessage('กรุณากรอกข้อมูลให้ครบถ้วน');
+                return false;
+            }
+
+            const cleaned = contact.replace(/\D/g, '');
+            if (cleaned.length < 9 || cleaned.length > 10) {
+                Swal.showValidationMessage('เบอร์ติดต่อไม่ถูกต้อง');
+                return false;
+            }
+
+            return { price, contact };
+        }
+    });
+
+    if (!isConfirmed) return;
+
+    Swal.fire({
+        title: 'กำลังส่งข้อมูล...',
+        text: 'กรุณารอสักครู่',
+        allowOutsideClick: false,
+        didOpen: () => Swal.showLoading()
+    });
+
+    try {
+        const res = await fetch(`/api/sales/${saleId}/request_buy/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': CSRF_TOKEN
+            },
+            body: JSON.stringify({
+                contact: formValues.contact,
+                negotiated_price: formValues.price
+            })
+        });
+
+        if (res.ok) {
+            Swal.fire({
+                icon: 'success',
+                title: 'ส่งคำขอเรียบร้อย',
+                text: 'ระบบได้แจ้งเตือนไปยังเกษตรกรแล้ว',
+                timer: 2000,
+                showConfirmButton: false
+            });
+            loadData();
+        } else {
+            const data = await res.json();
+            Swal.fire('เกิดข้อผิดพลาด', data.error || 'ไม่สามารถทำรายการได้', 'error');
+        }
+    } catch {
+        Swal.fire('Error', 'การเชื่อมต่อขัดข้อง', 'error');
+    }
+};
+
+// ==========================================
+// 4. Focus Map Function
+// ==========================================
+window.focusMap = function (saleId) {
+    // Auto-switch to map on mobile
+    if (window.innerWidth < 1024) {
+        switchTab('map');
+    }
+
+    markers.eachLayer(function (layer) {
+        if (layer.saleId === saleId) {
+            try {
+                const bounds = layer.getBounds();
+                // Validate bounds to avoid NaN LatLng errors
+                if (bounds && bounds.isValid()) {
+                    map.flyToBounds(bounds.pad(1.5), { duration: 1 });
+                    setTimeout(() => {
+                        layer.openPopup();
+                    }, 1000);
+                } else {
+                    console.warn('Invalid bounds for sale:', saleId);
+                    layer.openPopup();
+                }
+            } catch (e) {
+                console.warn('Error focusing on map:', e);
+                // Fallback: just open popup without flying
+                try { layer.openPopup(); } catch (e2) { }
+            }
+        }
+    });
+}
+
+// ==========================================
+// 5. Initialize
+// ==========================================
+// Set initial tab for mobile
+if (window.innerWidth < 1024) {
+    switchTab('list');
+}
+
+// Load initial data
+loadData();
+
+// Auto-refresh every 5 seconds
+setInterval(loadData, 5000);